@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark: how long a fresh process takes from importing src.main to
+sending its first response.
+
+Every run starts a new interpreter and reports, in milliseconds:
+
+  import       import src.main in a clean interpreter (no moto loaded)
+  startup      app lifespan start-up, where the optional AWS warm-up runs
+  first        the first GET /api/timestamps/{id}, a DynamoDB read on moto
+  total        import + startup + first, measured under moto
+
+Under moto, boto3 and botocore are already imported by moto itself before the
+clock starts, so "total" leaves out the boto3 module import; the "import"
+column, measured without moto, includes it.
+
+    python -m benchmarks.cold_start --runs 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SEED_TIMESTAMP_ID = "log-cold-start"
+ENVIRONMENT = {
+    "AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing", "AWS_REGION": "us-east-1",
+    "S3_BUCKET_NAME": "cold-start", "DYNAMODB_WORKERS_TABLE": "cold-start-workers",
+    "DYNAMODB_TIMESTAMPS_TABLE": "cold-start-timestamps",
+}
+
+
+async def asgi_get(app, path: str) -> int:
+    """Sends one GET straight to the ASGI app, so no HTTP client is imported or timed."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80),
+    }, receive, send)
+    return messages[0]["status"]
+
+
+def measure_import() -> dict:
+    started = time.perf_counter()
+    import src.main  # noqa: F401
+    return {"import": (time.perf_counter() - started) * 1000}
+
+
+def measure_first_response() -> dict:
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+
+        # A separate session, so the app's own clients still load their service models
+        table = boto3.session.Session().resource("dynamodb", region_name=ENVIRONMENT["AWS_REGION"]).create_table(
+            TableName=ENVIRONMENT["DYNAMODB_TIMESTAMPS_TABLE"],
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        table.put_item(Item={
+            "id": SEED_TIMESTAMP_ID, "worker_id": "worker-1", "event_type": "entry", "timestamp": "2025-01-24T08:00:00"
+        })
+
+        async def start_and_serve():
+            marks = [time.perf_counter()]
+            from src.main import app
+            marks.append(time.perf_counter())
+            async with app.router.lifespan_context(app):
+                marks.append(time.perf_counter())
+                status = await asgi_get(app, f"/api/timestamps/{SEED_TIMESTAMP_ID}")
+                marks.append(time.perf_counter())
+            if status != 200:
+                raise RuntimeError(f"First request failed with status {status}")
+            return marks
+
+        marks = asyncio.run(start_and_serve())
+        return {
+            "startup": (marks[2] - marks[1]) * 1000,
+            "first": (marks[3] - marks[2]) * 1000,
+            "total": (marks[3] - marks[0]) * 1000,
+        }
+
+
+def run_child(mode: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", mode],
+        env={**os.environ, **ENVIRONMENT}, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start for each measurement")
+    parser.add_argument("--output", help="Write the medians as JSON to this file")
+    parser.add_argument("--child", choices=["import", "first-response"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        result = measure_import() if args.child == "import" else measure_first_response()
+        print(json.dumps(result))
+        return
+
+    samples = {}
+    for _ in range(args.runs):
+        for mode in ("import", "first-response"):
+            for name, value in run_child(mode).items():
+                samples.setdefault(name, []).append(value)
+
+    medians = {name: round(statistics.median(values), 1) for name, values in samples.items()}
+    for name, value in medians.items():
+        print(f"{name:>8}  {value:>8} ms  (median of {args.runs})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(medians, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
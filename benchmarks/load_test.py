@@ -0,0 +1,213 @@
+"""
+Closed-loop load test: N concurrent clients send requests back to back and the
+achieved requests/sec and latency percentiles are reported per concurrency level.
+
+By default the API is started locally under uvicorn against moto, in a child process, with an artificial
+delay added to every AWS call to stand in for the network round trip to DynamoDB.
+Pass --url to drive an already running server instead.
+
+    python -m benchmarks.load_test --concurrency 1 10 100 --duration 10 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+from urllib.parse import urlsplit
+
+import httpx
+
+SEED_TIMESTAMP_ID = "log-load-test"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def http_request(host: str, port: int, method: str, path: str, body: bytes = b"", content_type: str = None,
+                 extra_headers: Dict[str, str] = None) -> bytes:
+    """Encodes one HTTP/1.1 request for send_requests."""
+    headers = f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+    if body or method != "GET":
+        headers += f"Content-Length: {len(body)}\r\n"
+    if content_type:
+        headers += f"Content-Type: {content_type}\r\n"
+    for name, value in (extra_headers or {}).items():
+        headers += f"{name}: {value}\r\n"
+    return (headers + "\r\n").encode() + body
+
+
+async def send_requests(host: str, port: int, next_request: Callable[[str, int], bytes], deadline: float, latencies: list) -> int:
+    """
+    One keep-alive HTTP/1.1 connection sending requests back to back. A minimal client
+    is used on purpose: a full-featured one costs more CPU per request than the
+    endpoints under test, which skews results when both share a machine.
+    """
+    errors = 0
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            request = next_request(host, port)
+            started = time.perf_counter()
+            try:
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+                status = int(head.split(b" ", 2)[1])
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server dropped the connection (e.g. an unhandled error); count it and reconnect
+                errors += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+    finally:
+        writer.close()
+    return errors
+
+
+async def run_level(base_url: str, next_request: Callable[[str, int], bytes], concurrency: int, duration: float) -> dict:
+    url = urlsplit(base_url)
+    latencies = []
+    started = time.perf_counter()
+    errors = await asyncio.gather(*(
+        send_requests(url.hostname, url.port or 80, next_request, started + duration, latencies)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(port: int, latency_ms: float):
+    """Serves src.main:app on a local port with moto standing in for AWS."""
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing", "AWS_REGION": "us-east-1",
+        "S3_BUCKET_NAME": "load-test", "DYNAMODB_WORKERS_TABLE": "load-test-workers",
+        "DYNAMODB_TIMESTAMPS_TABLE": "load-test-timestamps",
+    }.items():
+        os.environ.setdefault(name, value)
+
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+        import uvicorn
+        from src.core.config import settings
+
+        dynamodb = boto3.resource("dynamodb", region_name=settings.AWS_REGION)
+        table = dynamodb.create_table(
+            TableName=settings.DYNAMODB_TIMESTAMPS_TABLE,
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        table.put_item(Item={
+            "id": SEED_TIMESTAMP_ID, "worker_id": "worker-1", "event_type": "entry", "timestamp": "2025-01-24T08:00:00"
+        })
+
+        from src.main import app
+        from src.services.aws_service import aws_service
+
+        def simulate_round_trip(**kwargs):
+            time.sleep(latency_ms / 1000)
+
+        if latency_ms:
+            aws_service.storage.dynamodb.meta.client.meta.events.register("before-call.dynamodb.*", simulate_round_trip)
+
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+@contextmanager
+def in_process_server(module: str, args: List[str]):
+    """Starts a moto-backed server (`python -m <module> --serve PORT ...`) in a child process so it does not share the client's GIL."""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", module, "--serve", str(port), *args])
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                httpx.get(f"{base_url}/health")
+                break
+            except httpx.TransportError:
+                if process.poll() is not None:
+                    raise RuntimeError("Benchmark server exited during startup")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def run_levels(base_url, path, levels, duration):
+    results = []
+    for concurrency in levels:
+        result = await run_level(base_url, lambda host, port: http_request(host, port, "GET", path), concurrency, duration)
+        print(
+            f"{concurrency:>5} clients  {result['requests_per_second']:>8} req/s  "
+            f"p50 {result['p50_ms']:>7} ms  p99 {result['p99_ms']:>7} ms  errors {result['errors']}"
+        )
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: start one in-process on moto)")
+    parser.add_argument("--path", default=f"/api/timestamps/{SEED_TIMESTAMP_ID}", help="Path to request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated AWS round trip for the in-process server")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args.serve, args.latency_ms)
+    # httpx logs every request at INFO, which would dominate the client's CPU time
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.url:
+        results = asyncio.run(run_levels(args.url, args.path, args.concurrency, args.duration))
+    else:
+        with in_process_server("benchmarks.load_test", ["--latency-ms", str(args.latency_ms)]) as base_url:
+            results = asyncio.run(run_levels(base_url, args.path, args.concurrency, args.duration))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
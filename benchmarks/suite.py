@@ -0,0 +1,347 @@
+"""
+Endpoint benchmark suite: seeds moto with realistic data volumes, then measures
+throughput and latency percentiles for every scenario of the workers, timestamps
+and devices routers, one scenario after another.
+
+Results are written as JSON and can be compared against a stored baseline; the
+run fails if a scenario got slower than the baseline by more than --tolerance.
+
+    python -m benchmarks.suite --output results.json --compare benchmarks/baseline.json
+    python -m benchmarks.suite --workers 1000 --time-logs 50000 --duration 5 --save-baseline benchmarks/baseline.json
+
+The API runs under uvicorn in a child process, with items seeded straight into
+moto's backend so that a million time logs take about a minute instead of an hour
+of PutItem calls. moto answers GSI queries by scanning the whole table, so at
+large volumes the timestamps.by_worker and timestamps.range scenarios mostly measure
+moto itself.
+moto also deep-copies every table of the region on each TransactWriteItems call
+(and is not thread-safe while doing so), so devices.register runs against a
+second server seeded only with activation codes, with transactions serialized.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Tuple
+
+from benchmarks.load_test import http_request, in_process_server, run_level
+
+# Enrollment images are 640x800 JPEGs of upscaled noise, about 50 KB like real face captures (30–100 KB)
+ENROLLMENT_IMAGE_SIZE = (640, 800)
+ENROLLMENT_IMAGES = 7
+TENANT_ID = "BENCH"
+# With fewer requests than this, p95 is mostly noise and is not compared
+MIN_REQUESTS_FOR_P95 = 100
+
+
+def worker_id(n: int) -> str:
+    return f"worker-{n:06d}"
+
+
+def time_log_id(n: int) -> str:
+    return f"log-{n:08d}"
+
+
+def time_log_timestamp(n: int, workers: int) -> str:
+    """Spreads each worker's logs over three months, one per day, so range scenarios span month partitions."""
+    day = n // workers
+    return f"2025-{1 + day // 28 % 3:02d}-{1 + day % 28:02d}T{8 + day % 10:02d}:00:00"
+
+
+def enrollment_image(rng: random.Random) -> bytes:
+    """A decodable JPEG, since enrollment images are normalized by the API."""
+    import io
+    from PIL import Image
+
+    width, height = ENROLLMENT_IMAGE_SIZE
+    noise = Image.frombytes("RGB", (width // 40, height // 40), rng.randbytes(width // 40 * height // 40 * 3))
+    output = io.BytesIO()
+    noise.resize(ENROLLMENT_IMAGE_SIZE, Image.Resampling.BICUBIC).save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def seed(workers: int, time_logs: int, activation_codes: int):
+    """Creates the tables and bucket and fills them through moto's backend, bypassing the HTTP layer."""
+    import boto3
+    from moto.core import DEFAULT_ACCOUNT_ID
+    from moto.dynamodb.models import dynamodb_backends
+    from src.core.config import settings
+    from src.services.partitions import time_log_index_attributes
+
+    boto3.client("s3", region_name=settings.AWS_REGION).create_bucket(Bucket=settings.S3_BUCKET_NAME)
+    dynamodb = boto3.client("dynamodb", region_name=settings.AWS_REGION)
+    time_log_indexes = {
+        "worker_id-index": (("worker_id", "S"), None),
+        "worker_month-timestamp_ms-index": (("worker_month", "S"), ("timestamp_ms", "N")),
+        "tenant_month-timestamp_ms-index": (("tenant_month", "S"), ("timestamp_ms", "N")),
+    }
+    for table_name, key, range_key, indexes in [
+        (settings.DYNAMODB_WORKERS_TABLE, ("id", "S"), None, {}),
+        (settings.DYNAMODB_TIMESTAMPS_TABLE, ("id", "S"), None, time_log_indexes),
+        (settings.DYNAMODB_DEVICES_TABLE, ("device_id", "S"), None, {}),
+        (settings.DYNAMODB_ACTIVATION_CODES_TABLE, ("code", "S"), None, {}),
+        (settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE, ("tenant_id", "S"), ("change_key", "S"), {}),
+        (settings.DYNAMODB_ROSTER_TABLE, ("tenant_id", "S"), ("version", "N"), {}),
+        (settings.DYNAMODB_AUDIT_LOGS_TABLE, ("tenant_id#attendance_id", "S"), ("timestamp#audit_id", "S"), {}),
+    ]:
+        key_schema = lambda key, range_key: [{"AttributeName": key[0], "KeyType": "HASH"}] + (
+            [{"AttributeName": range_key[0], "KeyType": "RANGE"}] if range_key else [])
+        attributes = ({key, range_key} | {attribute for keys in indexes.values() for attribute in keys}) - {None}
+        extra = {}
+        if indexes:
+            extra["GlobalSecondaryIndexes"] = [
+                {"IndexName": name, "KeySchema": key_schema(*keys), "Projection": {"ProjectionType": "ALL"}}
+                for name, keys in indexes.items()
+            ]
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=key_schema(key, range_key),
+            AttributeDefinitions=[{"AttributeName": name, "AttributeType": attr_type} for name, attr_type in attributes],
+            BillingMode="PAY_PER_REQUEST",
+            **extra
+        )
+
+    backend = dynamodb_backends[DEFAULT_ACCOUNT_ID][settings.AWS_REGION]
+    # moto snapshots the tables for rollback without a lock; concurrent transactions would corrupt the copy
+    transact_write_items, transaction_lock = backend.transact_write_items, threading.Lock()
+
+    def serialized_transact_write_items(*args, **kwargs):
+        with transaction_lock:
+            return transact_write_items(*args, **kwargs)
+
+    backend.transact_write_items = serialized_transact_write_items
+    for n in range(workers):
+        backend.put_item(settings.DYNAMODB_WORKERS_TABLE, {
+            "id": {"S": worker_id(n)},
+            "document_id": {"S": str(10_000_000 + n)},
+            "first_name": {"S": "Ana"},
+            "last_name": {"S": f"Worker {n}"},
+            "email": {"S": f"worker{n}@example.com"},
+            "image_urls": {"L": [
+                {"S": f"https://{settings.S3_BUCKET_NAME}.s3.amazonaws.com/workers/{worker_id(n)}/image_{i}.jpg"}
+                for i in range(ENROLLMENT_IMAGES)
+            ]},
+            "created_at": {"S": "2025-01-01T08:00:00"},
+        })
+    for n in range(time_logs if workers else 0):
+        time_log = {
+            "id": time_log_id(n),
+            "worker_id": worker_id(n % workers),
+            "event_type": "entry" if n // workers % 2 == 0 else "exit",
+            "timestamp": time_log_timestamp(n, workers),
+            "tenant_id": TENANT_ID,
+        }
+        time_log.update(time_log_index_attributes(time_log))
+        backend.put_item(settings.DYNAMODB_TIMESTAMPS_TABLE, {
+            name: {"N": str(value)} if isinstance(value, int) else {"S": value} for name, value in time_log.items()
+        })
+    expires_at = int((time.time() + 365 * 86400) * 1000)
+    for n in range(activation_codes):
+        backend.put_item(settings.DYNAMODB_ACTIVATION_CODES_TABLE, {
+            "code": {"S": f"{TENANT_ID}-{n:06d}"},
+            "status": {"S": "pending"},
+            "expires_at": {"N": str(expires_at)},
+        })
+
+
+def serve(port: int, workers: int, time_logs: int, activation_codes: int):
+    """Serves src.main:app on a local port with seeded moto standing in for AWS."""
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing", "AWS_REGION": "us-east-1",
+        "S3_BUCKET_NAME": "bench", "DYNAMODB_WORKERS_TABLE": "bench-workers",
+        "DYNAMODB_TIMESTAMPS_TABLE": "bench-timestamps", "DYNAMODB_DEVICES_TABLE": "bench-devices",
+        "DYNAMODB_ACTIVATION_CODES_TABLE": "bench-activation-codes",
+        # Every benchmark request comes from the same address
+        "RATE_LIMIT_ENABLED": "false",
+    }.items():
+        os.environ.setdefault(name, value)
+
+    from moto import mock_aws
+
+    with mock_aws():
+        import uvicorn
+
+        started = time.perf_counter()
+        seed(workers, time_logs, activation_codes)
+        print(f"Seeded {workers} workers, {time_logs} time logs and {activation_codes} activation codes "
+              f"in {time.perf_counter() - started:.1f} s", flush=True)
+
+        from src.main import app
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def multipart_body(fields: Dict[str, str], files: Dict[str, bytes], boundary: str) -> bytes:
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for filename, content in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="images"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + content + b"\r\n"
+        )
+    return b"".join(parts) + f"--{boundary}--\r\n".encode()
+
+
+def scenarios(workers: int, time_logs: int) -> Dict[str, Tuple[str, Callable[[str, int], bytes]]]:
+    """
+    Request factories, one per scenario, with the dataset their server is seeded
+    with ("records" or "devices"); each call builds the next request to send.
+    """
+    rng = random.Random(42)
+    images = {f"face_{i}.jpg": enrollment_image(rng) for i in range(ENROLLMENT_IMAGES)}
+    boundary = uuid.uuid4().hex
+    activation_codes = itertools.count()
+
+    def enroll(host, port):
+        n = rng.randrange(10 ** 9)
+        personal_data = {
+            "document_id": str(n), "first_name": "Bench", "last_name": f"Worker {n}", "email": f"bench{n}@example.com"
+        }
+        body = multipart_body({"personal_data_json": json.dumps(personal_data)}, images, boundary)
+        return http_request(host, port, "POST", "/api/workers", body, f"multipart/form-data; boundary={boundary}")
+
+    def register_device(host, port):
+        body = json.dumps({
+            "activation_code": f"{TENANT_ID}-{next(activation_codes):06d}",
+            "device_id": str(uuid.uuid4()),
+            "device_name": "Bench tablet",
+            "device_model": "Galaxy Tab A7",
+            "device_manufacturer": "Samsung",
+            "android_version": "13",
+        }).encode()
+        return http_request(host, port, "POST", "/api/devices/register", body, "application/json")
+
+    def record_timestamp(host, port):
+        body = json.dumps({"worker_id": worker_id(rng.randrange(workers)), "event_type": "entry"}).encode()
+        return http_request(host, port, "POST", "/api/timestamps", body, "application/json")
+
+    return {
+        "workers.get": ("records", lambda host, port: http_request(
+            host, port, "GET", f"/api/workers/{worker_id(rng.randrange(workers))}"
+        )),
+        "workers.list_page": ("records", lambda host, port: http_request(host, port, "GET", "/api/workers?limit=100")),
+        "workers.enroll": ("records", enroll),
+        # Seeded workers have no tenant and no roster changes: the default tenant's roster is at version 0
+        "workers.roster": ("records", lambda host, port: http_request(
+            host, port, "GET", "/api/workers/roster", extra_headers={"X-Tenant-ID": "default", "Accept-Encoding": "gzip"}
+        )),
+        "workers.roster_unchanged": ("records", lambda host, port: http_request(
+            host, port, "GET", "/api/workers/roster?since=0",
+            extra_headers={"X-Tenant-ID": "default", "Accept-Encoding": "gzip", "If-None-Match": '"0"'}
+        )),
+        "timestamps.get": ("records", lambda host, port: http_request(
+            host, port, "GET", f"/api/timestamps/{time_log_id(rng.randrange(time_logs))}"
+        )),
+        "timestamps.by_worker": ("records", lambda host, port: http_request(
+            host, port, "GET", f"/api/timestamps?worker_id={worker_id(rng.randrange(workers))}&limit=100"
+        )),
+        "timestamps.range": ("records", lambda host, port: http_request(
+            host, port, "GET", f"/api/timestamps?worker_id={worker_id(rng.randrange(workers))}"
+                               f"&from=2025-01-15T00:00:00&to=2025-02-14T23:59:59"
+        )),
+        "timestamps.record": ("records", record_timestamp),
+        "devices.register": ("devices", register_device),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Returns the regressions of results against baseline: scenarios whose
+    throughput dropped, or whose median or p95 latency grew, by more than
+    tolerance (a fraction). Scenarios missing from either side are ignored, and
+    p95 is only compared when both runs sent enough requests for it to be stable.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        if current["requests_per_second"] < previous["requests_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['requests_per_second']} req/s, baseline {previous['requests_per_second']}")
+        metrics = ["p50_ms"]
+        if min(current["requests"], previous["requests"]) >= MIN_REQUESTS_FOR_P95:
+            metrics.append("p95_ms")
+        for metric in metrics:
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]}, baseline {previous[metric]}")
+        if current["errors"] and not previous["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors, baseline had none")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=10_000, help="Workers to seed")
+    parser.add_argument("--time-logs", type=int, default=1_000_000, help="Time logs to seed")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent keep-alive clients per scenario")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--scenario", action="append", help="Only run these scenarios (repeatable)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Fail if results regressed against this baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression as a fraction (default 0.25)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as the new baseline")
+    parser.add_argument("--activation-codes", type=int, default=1_000,
+                        help="Activation codes to seed; devices.register uses one per request")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args.serve, args.workers, args.time_logs, args.activation_codes)
+
+    factories = scenarios(args.workers, args.time_logs)
+    selected = args.scenario or list(factories)
+    unknown = set(selected) - set(factories)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}; available: {', '.join(factories)}")
+
+    results = {
+        "parameters": {
+            "workers": args.workers, "time_logs": args.time_logs,
+            "activation_codes": args.activation_codes, "concurrency": args.concurrency, "duration": args.duration,
+        },
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "scenarios": {},
+    }
+    datasets = {
+        "records": ["--workers", str(args.workers), "--time-logs", str(args.time_logs), "--activation-codes", "0"],
+        "devices": ["--workers", "0", "--time-logs", "0", "--activation-codes", str(args.activation_codes)],
+    }
+    for dataset, server_args in datasets.items():
+        names = [name for name in selected if factories[name][0] == dataset]
+        if not names:
+            continue
+        with in_process_server("benchmarks.suite", server_args) as base_url:
+            for name in names:
+                result = asyncio.run(run_level(base_url, factories[name][1], args.concurrency, args.duration))
+                results["scenarios"][name] = result
+                print(
+                    f"{name:<22} {result['requests_per_second']:>8} req/s  p50 {result['p50_ms']:>7} ms  "
+                    f"p95 {result['p95_ms']:>7} ms  p99 {result['p99_ms']:>7} ms  errors {result['errors']}"
+                )
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["parameters"] != results["parameters"]:
+            print(f"Warning: baseline was recorded with {baseline['parameters']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
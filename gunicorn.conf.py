@@ -0,0 +1,62 @@
+"""
+Production server: gunicorn pre-forking uvicorn workers, one per CPU.
+
+    gunicorn -c gunicorn.conf.py src.main:app
+
+The app is imported once in the master (preload_app) and shared by the workers
+through the fork; each worker then builds its own AWS clients and threads in
+post_fork and its lifespan start-up (see src/services/worker_process.py).
+Workers share rate limits, cache invalidations and metrics through a SQLite
+file on /dev/shm (src/core/shared_state.py).
+
+Settings come from the environment:
+- BIND (0.0.0.0:8000), WEB_CONCURRENCY (the CPU count);
+- GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT, GUNICORN_KEEPALIVE (seconds).
+
+SIGTERM stops gracefully: workers finish their requests and flush their
+write-behind buffers within the graceful timeout. SIGHUP replaces the workers
+gracefully, but with preload_app they keep the code loaded by the master; to
+deploy new code, restart the container or send USR2 and then TERM to the old master.
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+# Heartbeat files on tmpfs, so a slow disk can't get workers killed as unresponsive
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Set before the app, and so its settings, is loaded. Unless given, the shared state is a file of this
+# master alone, a new one after a USR2 re-exec too
+SHARED_STATE_PREFIX = "sioma-shared-"
+shared_state_path = os.environ.get("SHARED_STATE_PATH")
+if not shared_state_path or os.path.basename(shared_state_path).startswith(SHARED_STATE_PREFIX):
+    shared_state_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    shared_state_path = os.path.join(shared_state_dir, f"{SHARED_STATE_PREFIX}{os.getpid()}.db")
+os.environ["SHARED_STATE_PATH"] = shared_state_path
+os.environ.setdefault("RATE_LIMIT_BACKEND", "shared")
+
+
+def on_starting(server):
+    # Buckets and metrics of a previous server are dropped
+    from src.core.shared_state import SharedState
+
+    SharedState(shared_state_path).reset()
+
+
+def post_fork(server, worker):
+    from src.services.worker_process import init_worker_process
+
+    init_worker_process()
+
+
+def on_exit(server):
+    from src.core.shared_state import SharedState
+
+    SharedState(shared_state_path).reset()
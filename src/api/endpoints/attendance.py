@@ -0,0 +1,89 @@
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from src.core.rate_limit import device_key, rate_limit
+from src.models.attendance import (
+    AttendanceDeleteRequest, AttendanceSyncRequest, AttendanceSyncResponse, AttendanceUpdatesResponse, MAX_SYNC_RECORDS
+)
+from src.services.attendance_service import get_attendance_updates, sync_attendance_records
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+from src.services.storage import StorageBusyError
+from src.services.device_auth import get_current_device
+from src.services.timesheet_service import TENANT_SCOPE, stale_rollup_keys
+
+router = APIRouter()
+
+@router.post(
+    "/attendance/sync",
+    response_model=AttendanceSyncResponse,
+    dependencies=[Depends(rate_limit("attendance_sync", "RATE_LIMIT_ATTENDANCE_SYNC", device_key))]
+)
+async def sync_attendance(
+    sync_request: AttendanceSyncRequest,
+    x_tenant_id: str = Header(..., description="Tenant the records belong to"),
+    device: dict = Depends(get_current_device),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Uploads a batch of up to 100 attendance records from an authenticated device.
+    Records within ±30 seconds of another record of the same employee are
+    returned as conflicts and are not stored. Records whose `device_id` is not
+    the authenticated device's are returned as `DEVICE_MISMATCH` errors.
+    """
+    if len(sync_request.records) > MAX_SYNC_RECORDS:
+        raise HTTPException(status_code=413, detail=f"Too many records, maximum is {MAX_SYNC_RECORDS} per request.")
+
+    try:
+        return await aws.run(sync_attendance_records, aws.service, x_tenant_id, device["device_id"], sync_request.records)
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to sync attendance records: {str(e)}")
+
+@router.get("/attendance/updates", response_model=AttendanceUpdatesResponse)
+async def get_updates(
+    since: int = Query(..., ge=0, description="last_sync_timestamp of the previous poll, in epoch milliseconds"),
+    limit: int = Query(500, ge=1, le=1000, description="Maximum number of changes to return"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page of the same poll"),
+    x_tenant_id: str = Header(..., description="Tenant whose changes to return"),
+    device: dict = Depends(get_current_device),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Returns attendance records created, updated or deleted since `since`, from
+    any device of the tenant, oldest first. Store `last_sync_timestamp` and send it
+    as `since` on the next poll once `next_cursor` is null.
+    """
+    try:
+        return await aws.run(get_attendance_updates, aws.service, x_tenant_id, since, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve attendance updates: {str(e)}")
+
+@router.delete("/attendance/records/{employee_id}/{timestamp}", status_code=204)
+async def delete_attendance_record(
+    employee_id: str,
+    timestamp: int,
+    deletion: AttendanceDeleteRequest,
+    x_tenant_id: str = Header(..., description="Tenant the record belongs to"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Marks an attendance record as deleted by an administrator. The record is kept
+    and the deletion reaches devices through /attendance/updates; the stored
+    timesheet rollups of its days are dropped.
+    """
+    deletion_data = {**deletion.dict(), "deleted_at": int(time.time() * 1000), "sync_status": "deleted"}
+    try:
+        if not await aws.soft_delete_attendance_record(x_tenant_id, employee_id, timestamp, deletion_data):
+            raise HTTPException(status_code=404, detail="Attendance record not found")
+        await aws.delete_timesheet_rollups(stale_rollup_keys(TENANT_SCOPE, [(x_tenant_id, timestamp)]))
+        return
+    except (HTTPException, StorageBusyError) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete attendance record: {str(e)}")
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from src.core.config import settings
+from src.core.rate_limit import device_key, rate_limit
+from src.core.request_body import decoded_body, iter_json_array
+from src.models.audit import AuditSyncRequest, AuditSyncResponse
+from src.services.audit_service import AuditSync
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+from src.services.device_auth import get_current_device
+from src.services.storage import StorageBusyError
+
+router = APIRouter()
+
+def _inline_schema(model) -> dict:
+    """The model's JSON schema with its nested models inlined, to embed in the OpenAPI document."""
+    schema = model.model_json_schema(ref_template="{model}")
+    definitions = schema.pop("$defs", {})
+
+    def inline(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    return inline(schema)
+
+@router.post(
+    "/audit/sync",
+    response_model=AuditSyncResponse,
+    dependencies=[Depends(rate_limit("audit_sync", "RATE_LIMIT_AUDIT_SYNC", device_key))],
+    # The body is parsed as it arrives rather than by FastAPI; declared here for the OpenAPI schema
+    openapi_extra={"requestBody": {"content": {"application/json": {"schema": _inline_schema(AuditSyncRequest)}}}}
+)
+async def sync_audits(
+    request: Request,
+    device: dict = Depends(get_current_device),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Uploads a device's audit log records (spec §3.1), optionally compressed with
+    `Content-Encoding: gzip` or `zstd`. The `audits` array is parsed as it arrives
+    and written in batches, so a large upload is never held in memory. Resending
+    an audit (same device and `local_id`) stores it once, with the same `server_id`.
+    """
+    sync = AuditSync(device["tenant_id"], device["device_id"])
+    try:
+        async for audit in iter_json_array(decoded_body(request, settings.AUDIT_SYNC_MAX_BODY_BYTES), "audits"):
+            if sync.count >= settings.AUDIT_SYNC_MAX_RECORDS:
+                raise HTTPException(
+                    status_code=413, detail=f"Too many audits, maximum is {settings.AUDIT_SYNC_MAX_RECORDS} per request."
+                )
+            sync.add(audit)
+            if sync.batch_ready:
+                await aws.run(sync.flush, aws.service)
+        await aws.run(sync.flush, aws.service)
+        return sync.response()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except (HTTPException, StorageBusyError) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to sync audits: {str(e)}")
@@ -1,47 +1,45 @@
 from fastapi import APIRouter, status, Depends, HTTPException
-from src.models.device import DeviceRegisterRequest, DeviceRegisterResponse, DeviceRegisterResponseData
-from src.services.aws_service import AWSService, aws_service
+from src.models.device import (
+    DeviceDeactivateRequest, DeviceRegisterRequest, DeviceRegisterResponse, DeviceRegisterResponseData, DeviceResponse
+)
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+from src.services.storage import StorageBusyError
+from src.services.aws_service import ActivationCodeUnavailableError, DeviceAlreadyRegisteredError
+from src.core.rate_limit import ip_key, rate_limit
+from src.core.responses import item_response
 from src.core.security import create_device_token
 import time
+import uuid
 
 router = APIRouter()
 
-@router.post("/devices/register", response_model=DeviceRegisterResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/devices/register",
+    response_model=DeviceRegisterResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("device_register", "RATE_LIMIT_DEVICE_REGISTER", ip_key))]
+)
 async def register_device(
     device_data: DeviceRegisterRequest,
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
-    Registers a new device in the system using an activation code.
+    Registers a new device in the system using an activation code. A deactivated
+    device registers again the same way, with a new activation code.
     """
-    # 1. Validate activation code
-    activation_code = aws.get_activation_code(device_data.activation_code)
-    if not activation_code:
-        raise HTTPException(status_code=400, detail="Invalid activation code.")
-
-    if activation_code.get('status') != 'pending':
-        raise HTTPException(status_code=400, detail="Activation code has already been used.")
-
-    expires_at = activation_code.get('expires_at')
-    if expires_at and int(time.time() * 1000) > expires_at:
-        raise HTTPException(status_code=400, detail="Activation code has expired.")
-
-    # 2. Check for device conflicts
-    if aws.get_device_by_id(device_data.device_id):
-        raise HTTPException(status_code=409, detail="Device already registered.")
-
-    # 3. Extract tenant_id and create JWT
+    # 1. Extract tenant_id and create JWT
     try:
         tenant_id = device_data.activation_code.split('-')[0]
     except IndexError:
         raise HTTPException(status_code=422, detail="Invalid activation_code format. Expected 'TENANT-CODE'.")
 
-    token_data = {"tenant_id": tenant_id, "device_id": device_data.device_id}
+    # jti makes every registration's token distinct, so a later one replaces it
+    token_data = {"tenant_id": tenant_id, "device_id": device_data.device_id, "jti": uuid.uuid4().hex}
     device_token = create_device_token(token_data)
 
-    # 4. Save device registration to DynamoDB
+    # 2. Claim the activation code and save the device in a single transaction
     registered_at_ms = int(time.time() * 1000)
-    
+
     device_registration_data = device_data.dict()
     device_registration_data.update({
         "tenant_id": tenant_id,
@@ -52,11 +50,18 @@ async def register_device(
         "deactivated_at": None,
         "deactivation_reason": None
     })
-    aws.save_device_registration(device_registration_data)
-
-    # TODO: Mark the activation code as "used" in the ActivationCodes table
+    try:
+        await aws.register_device(device_registration_data, device_data.activation_code, registered_at_ms)
+    except ActivationCodeUnavailableError as e:
+        if not e.code_item:
+            raise HTTPException(status_code=400, detail="Invalid activation code.")
+        if e.code_item.get('status') != 'pending':
+            raise HTTPException(status_code=400, detail="Activation code has already been used.")
+        raise HTTPException(status_code=400, detail="Activation code has expired.")
+    except DeviceAlreadyRegisteredError:
+        raise HTTPException(status_code=409, detail="Device already registered.")
 
-    # 5. Prepare and return response
+    # 3. Prepare and return response
     response_data = DeviceRegisterResponseData(
         device_id=device_data.device_id,
         tenant_id=tenant_id,
@@ -67,3 +72,24 @@ async def register_device(
     )
 
     return DeviceRegisterResponse(success=True, data=response_data)
+
+@router.put("/admin/devices/{device_id}/deactivate", response_model=DeviceResponse)
+async def deactivate_device(
+    device_id: str,
+    deactivation: DeviceDeactivateRequest,
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Deactivates a device and returns it: its token is refused from then on. The
+    device has to be registered again with a new activation code, which issues it
+    a new token.
+    """
+    try:
+        device = await aws.deactivate_device(device_id, deactivation.reason, int(time.time() * 1000))
+        if not device:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return item_response(device, DeviceResponse)
+    except (HTTPException, StorageBusyError) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to deactivate device: {str(e)}")
@@ -0,0 +1,59 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from src.models.timesheet import TimesheetResponse
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+from src.services.storage import StorageBusyError
+from src.services.timesheet_service import TENANT_SCOPE, WORKER_SCOPE, build_timesheet
+
+router = APIRouter()
+
+MAX_TIMESHEET_DAYS = 366
+
+def _validate_range(from_date: date, to_date: date):
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'.")
+    if (to_date - from_date).days + 1 > MAX_TIMESHEET_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_TIMESHEET_DAYS} days.")
+
+@router.get("/timesheets/workers/{worker_id}", response_model=TimesheetResponse)
+async def get_worker_timesheet(
+    worker_id: str,
+    from_date: date = Query(..., alias="from", description="First day (UTC) of the period"),
+    to_date: date = Query(..., alias="to", description="Last day (UTC) of the period, inclusive"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Returns the hours worked by a worker per day and for the whole period,
+    pairing its entry and exit timestamps.
+    """
+    _validate_range(from_date, to_date)
+    try:
+        return await aws.run(build_timesheet, aws.service, WORKER_SCOPE, worker_id, from_date, to_date)
+    except ValueError as e:
+        # Raised from the service if the GSI doesn't exist
+        raise HTTPException(status_code=501, detail=str(e))
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build timesheet: {str(e)}")
+
+@router.get("/timesheets/tenants/{tenant_id}", response_model=TimesheetResponse)
+async def get_tenant_timesheet(
+    tenant_id: str,
+    from_date: date = Query(..., alias="from", description="First day (UTC) of the period"),
+    to_date: date = Query(..., alias="to", description="Last day (UTC) of the period, inclusive"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Returns the hours worked by every employee of a tenant per day and for the
+    whole period, pairing their ENTRY and EXIT attendance records.
+    """
+    _validate_range(from_date, to_date)
+    try:
+        return await aws.run(build_timesheet, aws.service, TENANT_SCOPE, tenant_id, from_date, to_date)
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build timesheet: {str(e)}")
@@ -1,66 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
 
+from src.core.config import settings
 from src.models.worker import TimeLogCreate, TimeLogResponse, TimeLogUpdate
-from src.services.aws_service import AWSService, aws_service
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+from src.services.storage import StorageBusyError
+from src.core.pagination import decode_cursor, encode_cursor, wants_ndjson
+from src.core.responses import item_response, items_response, ndjson_response, parse_fields
+from src.services.timesheet_service import time_log_rollup_keys
+from src.services.write_behind import WriteBehindFullError
 
 router = APIRouter()
 
+MAX_RANGE_DAYS = 366
+
 @router.post("/timestamps", response_model=TimeLogResponse, status_code=201)
 async def record_timestamp(
     log_data: TimeLogCreate,
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Records a new timestamp event (entry/exit) for a worker.
+
+    With TIMESTAMP_WRITE_BEHIND enabled, the event is acknowledged once it is
+    journaled locally and reaches DynamoDB within WRITE_BEHIND_MAX_DELAY_MS, so a
+    read right after this call may not find it yet. When too many events are
+    waiting to be written, 503 is returned with a Retry-After header.
     """
     try:
         timestamp_response = TimeLogResponse(
             worker_id=log_data.worker_id,
             event_type=log_data.event_type,
+            tenant_id=log_data.tenant_id,
             timestamp=datetime.utcnow()
         )
         timestamp_data_for_db = timestamp_response.dict()
         timestamp_data_for_db['timestamp'] = timestamp_data_for_db['timestamp'].isoformat()
-        aws.save_timestamp_data(timestamp_data_for_db)
+        if settings.TIMESTAMP_WRITE_BEHIND:
+            await aws.enqueue_timestamp_data(timestamp_data_for_db)
+        else:
+            await aws.save_timestamp_data(timestamp_data_for_db)
         return timestamp_response
+    except WriteBehindFullError:
+        raise HTTPException(status_code=503, detail="Too many timestamps waiting to be saved, retry shortly", headers={"Retry-After": "1"})
+    except StorageBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to record timestamp: {str(e)}")
 
+def _epoch_ms(value: datetime) -> int:
+    # Naive datetimes are UTC, like the timestamps stored on time logs
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
 @router.get("/timestamps", response_model=List[TimeLogResponse])
 async def get_timestamps(
+    request: Request,
     worker_id: str | None = Query(None, description="Filter timestamps by worker ID"),
-    aws: AWSService = Depends(lambda: aws_service)
+    tenant_id: str | None = Query(None, description="Filter timestamps by tenant ID (requires 'from' and 'to')"),
+    from_time: datetime | None = Query(None, alias="from", description="Start of the time range (ISO 8601 or epoch), inclusive"),
+    to_time: datetime | None = Query(None, alias="to", description="End of the time range (ISO 8601 or epoch), inclusive"),
+    limit: int | None = Query(None, ge=1, le=1000, description="Maximum number of timestamps to read for this page"),
+    cursor: str | None = Query(None, description="Value of the X-Next-Cursor header from the previous page"),
+    fields: str | None = Query(None, description="Comma-separated fields to return, e.g. id,timestamp; only these are read"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Retrieves a list of timestamps. Can be filtered by worker_id.
+    - With **from** and **to**, only the timestamps of a worker or a tenant within that range are read, oldest first.
+    - Without **limit**, every page is read and returned as a single list.
+    - With **limit**, one page is returned and the cursor for the next one is sent in the `X-Next-Cursor` header.
+    - With **fields**, only those attributes are read and returned.
+    - With `Accept: application/x-ndjson`, timestamps are streamed one per line as pages are read.
     """
     try:
-        if worker_id:
-            items = aws.get_timestamps_by_worker_id(worker_id)
-        else:
-            items = aws.get_all_timestamps()
-        return items
+        start_key = decode_cursor(cursor)
+        projection = parse_fields(fields, TimeLogResponse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if from_time or to_time or tenant_id:
+        if not (from_time and to_time):
+            raise HTTPException(status_code=400, detail="'from' and 'to' must be given together.")
+        if not (worker_id or tenant_id):
+            raise HTTPException(status_code=400, detail="A time range requires 'worker_id' or 'tenant_id'.")
+        start_ms, end_ms = _epoch_ms(from_time), _epoch_ms(to_time)
+        if end_ms < start_ms:
+            raise HTTPException(status_code=400, detail="'to' must not be before 'from'.")
+        if end_ms - start_ms > MAX_RANGE_DAYS * 86_400_000:
+            raise HTTPException(status_code=400, detail=f"Time range is limited to {MAX_RANGE_DAYS} days.")
+        return await _get_timestamps_in_range(request, aws, start_ms, end_ms, worker_id, tenant_id, limit, start_key, projection)
+
+    try:
+        if wants_ndjson(request.headers.get("accept")):
+            return ndjson_response(aws.iter_timestamp_pages(start_key, worker_id, projection), TimeLogResponse, projection)
+        if limit is None:
+            if worker_id:
+                items = await aws.get_timestamps_by_worker_id(worker_id, start_key, projection)
+            else:
+                items = await aws.get_all_timestamps(start_key, projection)
+            return items_response(items, TimeLogResponse, projection)
+
+        items, last_key = await aws.get_timestamps_page(limit, start_key, worker_id, projection)
+        return _page_response(items, last_key, projection)
     except ValueError as e:
         # Raised from the service if the GSI doesn't exist
         raise HTTPException(status_code=501, detail=str(e))
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve timestamps: {str(e)}")
+
+def _page_response(items, next_state, projection):
+    next_cursor = encode_cursor(next_state)
+    return items_response(items, TimeLogResponse, projection, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+async def _get_timestamps_in_range(request, aws, start_ms, end_ms, worker_id, tenant_id, limit, cursor, projection):
+    # Only the month partitions overlapping the range are queried, on the sort key
+    filters = {"worker_id": worker_id, "tenant_id": tenant_id, "projection": projection}
+    try:
+        if wants_ndjson(request.headers.get("accept")):
+            pages = aws.iter_time_log_pages_in_range(start_ms, end_ms, **filters)
+            return ndjson_response(pages, TimeLogResponse, projection)
+        if limit is None:
+            return items_response(await aws.get_time_logs_in_range(start_ms, end_ms, **filters), TimeLogResponse, projection)
+
+        items, next_state = await aws.get_time_logs_page_in_range(start_ms, end_ms, limit, cursor, **filters)
+        return _page_response(items, next_state, projection)
+    except ValueError as e:
+        # The cursor was issued for another range
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve timestamps: {str(e)}")
 
 @router.get("/timestamps/{timestamp_id}", response_model=TimeLogResponse)
 async def get_timestamp(
     timestamp_id: str,
-    aws: AWSService = Depends(lambda: aws_service)
+    fields: str | None = Query(None, description="Comma-separated fields to return, e.g. id,timestamp; only these are read"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
-    Retrieves a single timestamp by its ID.
+    Retrieves a single timestamp by its ID. With **fields**, only those attributes are read and returned.
     """
     try:
-        timestamp = aws.get_timestamp_by_id(timestamp_id)
+        projection = parse_fields(fields, TimeLogResponse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        timestamp = await aws.get_timestamp_by_id(timestamp_id, projection)
         if not timestamp:
             raise HTTPException(status_code=404, detail="Timestamp not found")
-        return timestamp
+        return item_response(timestamp, TimeLogResponse, projection)
+    except (HTTPException, StorageBusyError) as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve timestamp: {str(e)}")
 
@@ -68,7 +165,7 @@ async def get_timestamp(
 async def update_timestamp(
     timestamp_id: str,
     timestamp_update: TimeLogUpdate,
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Updates a timestamp's information.
@@ -78,30 +175,31 @@ async def update_timestamp(
         raise HTTPException(status_code=400, detail="No update data provided")
 
     try:
-        updated_timestamp = aws.update_timestamp(timestamp_id, update_data)
+        updated_timestamp = await aws.update_timestamp(timestamp_id, update_data)
         if not updated_timestamp:
             raise HTTPException(status_code=404, detail="Timestamp not found")
+        await aws.delete_timesheet_rollups(time_log_rollup_keys(updated_timestamp))
         return updated_timestamp
+    except (HTTPException, StorageBusyError) as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update timestamp: {str(e)}")
 
 @router.delete("/timestamps/{timestamp_id}", status_code=204)
 async def delete_timestamp(
     timestamp_id: str,
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Deletes a timestamp.
     """
     try:
-        # First, check if the timestamp exists
-        timestamp = aws.get_timestamp_by_id(timestamp_id)
-        if not timestamp:
+        deleted_timestamp = await aws.delete_timestamp(timestamp_id)
+        if not deleted_timestamp:
             raise HTTPException(status_code=404, detail="Timestamp not found")
-        
-        aws.delete_timestamp(timestamp_id)
+        await aws.delete_timesheet_rollups(time_log_rollup_keys(deleted_timestamp))
         return
-    except HTTPException as e:
+    except (HTTPException, StorageBusyError) as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete timestamp: {str(e)}")
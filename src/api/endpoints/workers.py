@@ -1,23 +1,81 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Query, Request, Response
 from typing import List
+import gzip
 import json
 from datetime import datetime
 
-from src.models.worker import WorkerCreate, WorkerResponse, WorkerPersonalData, WorkerUpdate
-from src.services.aws_service import AWSService, aws_service
+from src.models.worker import (
+    EnrollmentFinalizeRequest, EnrollmentStartResponse, WorkerCreate, WorkerResponse, WorkerPersonalData, WorkerUpdate
+)
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+from src.services.storage import StorageBusyError
+from src.services.aws_service import DELETE_WORKER_IMAGES_JOB
+from src.services.enrollment_service import (
+    EnrollmentIncompleteError, finalize_enrollment, image_keys, start_enrollment, variant_objects, variant_urls
+)
+from src.services.image_processing import InvalidImageError, image_processor
+from src.services.roster_service import get_roster, roster_etag
+from src.core.config import settings
+from src.core.pagination import decode_cursor, encode_cursor, wants_ndjson
+from src.core.responses import item_response, items_response, ndjson_response, parse_fields
 
 router = APIRouter()
 
-@router.post("/workers", response_model=WorkerResponse, status_code=201)
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. id,first_name,last_name; only these are read"
+
+@router.post("/workers/enrollments", response_model=EnrollmentStartResponse, status_code=201)
+async def start_worker_enrollment(
+    worker_create: WorkerCreate,
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Starts a two-phase enrollment. Returns a presigned POST policy for each of the
+    7 face images, which the client uploads straight to S3 (JPEG, size-limited),
+    and an enrollment token to pass to `/workers/enrollments/finalize`.
+    """
+    try:
+        return await aws.run(start_enrollment, aws.service, worker_create.personal_data)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start enrollment: {str(e)}")
+
+@router.post("/workers/enrollments/finalize", response_model=WorkerResponse, status_code=201)
+async def finalize_worker_enrollment(
+    request: EnrollmentFinalizeRequest,
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Completes an enrollment once every image is uploaded: the objects are checked
+    in S3, normalized into face crops and thumbnails, and the worker is registered.
+    Returns 409 listing the images that are missing or invalid.
+    """
+    try:
+        return await aws.run(finalize_enrollment, aws.service, request.enrollment_token)
+    except EnrollmentIncompleteError as e:
+        raise HTTPException(status_code=409, detail=e.problems)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to finalize enrollment: {str(e)}")
+
+@router.post("/workers", response_model=WorkerResponse, status_code=201, deprecated=True)
 async def register_worker(
     personal_data_json: str = Form(...),
     images: List[UploadFile] = File(..., max_uploads=7),
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Registers a new worker:
     - **personal_data_json**: A JSON string with worker's personal data.
     - **images**: A list of 7 face images.
+
+    Each image is stored as uploaded and as a normalized face crop and thumbnail (JPEG, EXIF stripped).
+    The images pass through the API; prefer `/workers/enrollments`, which has clients upload them to S3 directly.
     """
     try:
         personal_data_dict = json.loads(personal_data_json)
@@ -30,49 +88,143 @@ async def register_worker(
 
     worker_id = worker_create.personal_data.id
 
+    originals = [await image.read() for image in images]
+    for n, data in enumerate(originals, start=1):
+        if len(data) > settings.ENROLLMENT_IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=400, detail=f"Image {n} is larger than {settings.ENROLLMENT_IMAGE_MAX_BYTES} bytes")
     try:
-        image_urls = aws.upload_images_to_s3(worker_id, images)
-        
+        processed = await image_processor.normalize_all_async(originals)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        objects = {
+            key: (data, normalized["content_type"])
+            for key, data, normalized in zip(image_keys(worker_id), originals, processed)
+        }
+        await aws.put_s3_objects({**objects, **variant_objects(worker_id, processed)})
+
         worker_response = WorkerResponse(
             **worker_create.personal_data.dict(),
-            image_urls=image_urls,
+            **variant_urls(aws.service, worker_id),
             created_at=datetime.utcnow()
         )
 
         worker_data_for_db = worker_response.dict()
         worker_data_for_db['created_at'] = worker_data_for_db['created_at'].isoformat()
-        aws.save_worker_data(worker_data_for_db)
+        try:
+            await aws.save_worker_data(worker_data_for_db)
+        except Exception:
+            # The uploaded images are deleted in the background, unless a retry registers the worker first
+            await aws.submit_background_job(DELETE_WORKER_IMAGES_JOB, {"worker_id": worker_id})
+            raise
 
         return worker_response
 
+    except StorageBusyError:
+        raise
     except Exception as e:
-        # TODO: Add cleanup logic for S3 if DynamoDB write fails
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @router.get("/workers", response_model=List[WorkerResponse])
-async def get_all_workers(aws: AWSService = Depends(lambda: aws_service)):
+async def get_all_workers(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=1000, description="Maximum number of workers to read for this page"),
+    cursor: str | None = Query(None, description="Value of the X-Next-Cursor header from the previous page"),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
     """
-    Retrieves a list of all registered workers.
+    Retrieves registered workers.
+    - Without **limit**, every page is read and returned as a single list.
+    - With **limit**, one page is returned and the cursor for the next one is sent in the `X-Next-Cursor` header.
+    - With **fields**, only those attributes are read and returned.
+    - With `Accept: application/x-ndjson`, workers are streamed one per line as pages are read.
     """
     try:
-        workers = aws.get_all_workers()
-        return workers
+        start_key = decode_cursor(cursor)
+        projection = parse_fields(fields, WorkerResponse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if wants_ndjson(request.headers.get("accept")):
+            return ndjson_response(aws.iter_worker_pages(start_key, projection), WorkerResponse, projection)
+        if limit is None:
+            return items_response(await aws.get_all_workers(start_key, projection), WorkerResponse, projection)
+
+        workers, last_key = await aws.get_workers_page(limit, start_key, projection)
+        next_cursor = encode_cursor(last_key)
+        return items_response(workers, WorkerResponse, projection, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+    except StorageBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve workers: {str(e)}")
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+@router.get(
+    "/workers/roster",
+    response_class=Response,
+    responses={200: {"content": {"application/json": {}}}, 304: {"description": "The device's roster version is current"}}
+)
+async def get_worker_roster(
+    request: Request,
+    since: int | None = Query(None, ge=0, description="Roster version the device has; the response is a delta from it when possible"),
+    x_tenant_id: str = Header(..., description="Tenant whose roster to return"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+):
+    """
+    Roster of the tenant's workers for devices: `{"version", "full", "fields", "workers", "deleted"}`,
+    where each worker is a row of `fields` values.
+    - Without **since**, or when the device is too far behind, `full` is true and `workers` is the whole roster.
+    - Otherwise `workers` holds the workers added or changed since that version and `deleted` the ids removed.
+    - The `ETag` is the version: send it in `If-None-Match` to get `304` when nothing changed.
+
+    The body is gzip-encoded when the request accepts it.
+    """
+    try:
+        version = await aws.get_roster_version(x_tenant_id)
+        etag = roster_etag(version)
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        body = await aws.run(get_roster, aws.service, x_tenant_id, version, since)
+    except StorageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve roster: {str(e)}")
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(body, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(gzip.decompress(body), media_type="application/json", headers=headers)
+
 @router.get("/workers/{worker_id}", response_model=WorkerResponse)
 async def get_worker(
     worker_id: str,
-    aws: AWSService = Depends(lambda: aws_service)
+    fields: str | None = Query(None, description="Comma-separated fields to return, e.g. id,first_name,last_name"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
-    Retrieves a single worker by their ID.
+    Retrieves a single worker by their ID. With **fields**, only those attributes
+    are returned; the worker is still read whole, since it is cached.
     """
     try:
-        worker = aws.get_worker_by_id(worker_id)
+        projection = parse_fields(fields, WorkerResponse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        worker = await aws.get_worker_by_id(worker_id)
         if not worker:
             raise HTTPException(status_code=404, detail="Worker not found")
-        return worker
+        return item_response(worker, WorkerResponse, projection)
+    except (HTTPException, StorageBusyError) as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve worker: {str(e)}")
 
@@ -80,7 +232,7 @@ async def get_worker(
 async def update_worker(
     worker_id: str,
     worker_update: WorkerUpdate,
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Updates a worker's information.
@@ -90,30 +242,28 @@ async def update_worker(
         raise HTTPException(status_code=400, detail="No update data provided")
 
     try:
-        updated_worker = aws.update_worker(worker_id, update_data)
+        updated_worker = await aws.update_worker(worker_id, update_data)
         if not updated_worker:
             raise HTTPException(status_code=404, detail="Worker not found")
         return updated_worker
+    except (HTTPException, StorageBusyError) as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update worker: {str(e)}")
 
 @router.delete("/workers/{worker_id}", status_code=204)
 async def delete_worker(
     worker_id: str,
-    aws: AWSService = Depends(lambda: aws_service)
+    aws: AsyncAWSService = Depends(get_async_aws_service)
 ):
     """
     Deletes a worker.
     """
     try:
-        # First, check if the worker exists
-        worker = aws.get_worker_by_id(worker_id)
-        if not worker:
+        if not await aws.delete_worker(worker_id):
             raise HTTPException(status_code=404, detail="Worker not found")
-        
-        aws.delete_worker(worker_id)
         return
-    except HTTPException as e:
+    except (HTTPException, StorageBusyError) as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete worker: {str(e)}")
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries expire after a TTL.
+
+    A loader result of None is cached as well (negative caching), with its own,
+    usually shorter, TTL so that lookups of unknown ids do not reach the database
+    on every request either.
+
+    get_or_load() drops the result of a load that an invalidate() (or clear())
+    overtook: the loader may have read the data before the change that caused
+    the invalidation, and caching it would bring the old value back for a TTL.
+
+    With `invalidations` (CacheInvalidations from shared_state), invalidating a key
+    drops it in the other worker processes too: lookups pick up their
+    invalidations, at most once per sync interval. Keys must then be JSON values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        invalidations=None
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # Keys being loaded -> [generation, loads in flight]; invalidate() bumps the generation
+        self._loads: Dict[Hashable, List[int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = invalidations
+        if invalidations is not None:
+            invalidations.register(self)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Returns (found, value); a cached negative result is (True, None)."""
+        if self.invalidations is not None:
+            self.invalidations.maybe_sync()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        found, value = self.lookup(key)
+        if found:
+            return value
+        with self._lock:
+            load = self._loads.setdefault(key, [0, 0])
+            load[1] += 1
+            generation = load[0]
+        try:
+            value = loader()
+        except BaseException:
+            with self._lock:
+                self._end_load(key, load)
+            raise
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            if load[0] == generation and ttl > 0 and self.maxsize > 0:
+                self._store(key, value, ttl)
+            self._end_load(key, load)
+        return value
+
+    def _end_load(self, key: Hashable, load: List[int]):
+        load[1] -= 1
+        if load[1] == 0:
+            del self._loads[key]
+
+    def invalidate(self, key: Hashable, broadcast: bool = True):
+        with self._lock:
+            self._entries.pop(key, None)
+            load = self._loads.get(key)
+            if load is not None:
+                load[0] += 1
+        if broadcast and self.invalidations is not None:
+            self.invalidations.publish(self.name, key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for load in self._loads.values():
+                load[0] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,10 +12,154 @@ class Settings(BaseSettings):
     DYNAMODB_TIMESTAMPS_TABLE: str = "timestamps"
     DYNAMODB_DEVICES_TABLE: str = "devices"
     DYNAMODB_ACTIVATION_CODES_TABLE: str = "activation_codes"
+    DYNAMODB_ATTENDANCE_TABLE: str = "AttendanceRecords"
+    DYNAMODB_TIMESHEET_ROLLUPS_TABLE: str = "TimesheetRollups"
+    DYNAMODB_ATTENDANCE_CHANGES_TABLE: str = "AttendanceChanges"
+    DYNAMODB_ROSTER_TABLE: str = "RosterChanges"
+    DYNAMODB_AUDIT_LOGS_TABLE: str = "AuditLogs"
+
+    # Where items and images are stored: "dynamodb" (DynamoDB and S3), "memory" (tests,
+    # nothing persisted) or "sqlite" (a database file and an image directory, for gateways without AWS).
+    # The other engines keep the DYNAMODB_* table names and S3_BUCKET_NAME as logical names.
+    STORAGE_BACKEND: str = "dynamodb"
+    SQLITE_DATABASE_PATH: str = "data/sioma.db"
+    SQLITE_BLOB_DIR: str = "data/blobs"
+
+    # botocore connection pooling, timeouts and retries for the S3 and DynamoDB clients
+    AWS_MAX_POOL_CONNECTIONS: int = 64
+    AWS_CONNECT_TIMEOUT_SECONDS: float = 2
+    AWS_READ_TIMEOUT_SECONDS: float = 5
+    AWS_MAX_ATTEMPTS: int = 3
+    AWS_RETRY_MODE: str = "standard"
+    # Client-side protection of each DynamoDB table and the S3 bucket from throttling (see aws_resilience)
+    AWS_RESILIENCE_ENABLED: bool = True
+    # Throttled calls are retried with jittered exponential backoff, while the table's retry budget
+    # (RATIO retries per successful call, and at least MIN_PER_SECOND) lasts
+    AWS_THROTTLE_MAX_ATTEMPTS: int = 4
+    AWS_THROTTLE_BACKOFF_BASE_SECONDS: float = 0.05
+    AWS_THROTTLE_BACKOFF_MAX_SECONDS: float = 1
+    AWS_RETRY_BUDGET_RATIO: float = 0.1
+    AWS_RETRY_BUDGET_MIN_PER_SECOND: float = 5
+    # Once throttled, calls to a table are paced at its send rate times BACKOFF, raised by
+    # INCREASE_PER_SECOND while calls succeed; calls that would wait longer than MAX_WAIT get a 503
+    AWS_ADAPTIVE_RATE_BACKOFF: float = 0.7
+    AWS_ADAPTIVE_RATE_INCREASE_PER_SECOND: float = 5
+    AWS_ADAPTIVE_RATE_MIN: float = 1
+    AWS_ADAPTIVE_MAX_WAIT_SECONDS: float = 1
+    # After this many calls in a row still throttled once retried, calls fail fast with 503 for OPEN_SECONDS
+    AWS_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    AWS_CIRCUIT_OPEN_SECONDS: float = 5
+    # Threads that run blocking AWS calls for the async service
+    AWS_EXECUTOR_WORKERS: int = 32
+
+    # Maximum number of S3 uploads in flight at once for this process
+    S3_UPLOAD_CONCURRENCY: int = 16
+    # Maximum number of DynamoDB queries a single request may run in parallel
+    DYNAMODB_QUERY_CONCURRENCY: int = 8
+
+    # In-process read-through caches for single-item lookups (0 disables a cache)
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_WORKER_TTL_SECONDS: float = 30
+    CACHE_DEVICE_TTL_SECONDS: float = 60
+    CACHE_ACTIVATION_CODE_TTL_SECONDS: float = 10
+    CACHE_NEGATIVE_TTL_SECONDS: float = 5
+    # Decoded device tokens; devices are still checked against the device cache on every request
+    CACHE_DEVICE_TOKEN_TTL_SECONDS: float = 3600
+    # Roster versions are re-read this often, so changes made by other processes show up within this delay
+    CACHE_ROSTER_VERSION_TTL_SECONDS: float = 5
+    # Encoded roster snapshots and deltas kept per process
+    CACHE_ROSTER_MAX_ENTRIES: int = 256
+    CACHE_ROSTER_TTL_SECONDS: float = 3600
+
+    # Ask DynamoDB for the capacity each call consumed and export it at /metrics
+    METRICS_DYNAMODB_CONSUMED_CAPACITY: bool = True
+
+    # Change feed polled by devices (GET /api/attendance/updates)
+    CHANGE_FEED_RETENTION_DAYS: int = 30
+    # Polls only return changes at least this old, so writes still in flight can't be skipped
+    CHANGE_FEED_SETTLE_MS: int = 5000
+    # Tenant of time logs created without one
+    DEFAULT_TENANT_ID: str = "default"
+
+    # Devices further behind than this many roster changes get a full snapshot instead of a delta
+    ROSTER_DELTA_MAX_CHANGES: int = 500
+
+    # An entry is only paired with an exit that follows within this many hours
+    TIMESHEET_MAX_SHIFT_HOURS: int = 16
+
+    # Two-phase enrollment: clients upload face images straight to S3 with presigned POST policies
+    ENROLLMENT_UPLOAD_EXPIRES_SECONDS: int = 900
+    ENROLLMENT_IMAGE_MAX_BYTES: int = 5 * 1024 * 1024
+    ENROLLMENT_IMAGE_CONTENT_TYPE: str = "image/jpeg"
+
+    # Enrollment photos are decoded, cropped and re-encoded on a pool of worker processes
+    IMAGE_PROCESS_WORKERS: int = 2
+    # Side of the square face crop stored under <worker_id>/faces/ and of the one under <worker_id>/thumbnails/
+    IMAGE_FACE_SIZE: int = 480
+    IMAGE_THUMBNAIL_SIZE: int = 96
+    IMAGE_JPEG_QUALITY: int = 85
+
+    # Write-behind for POST /api/timestamps: events are acknowledged once journaled to a local file
+    # and written to DynamoDB in BatchWriteItem batches by a background thread
+    TIMESTAMP_WRITE_BEHIND: bool = False
+    WRITE_BEHIND_JOURNAL_PATH: str = "data/timestamps-write-behind.jsonl"
+    # 12 time logs and their change feed entries fill one BatchWriteItem call
+    WRITE_BEHIND_MAX_BATCH: int = 12
+    WRITE_BEHIND_MAX_DELAY_MS: int = 50
+    # Unwritten events kept at most; past this, POST /api/timestamps answers 503
+    WRITE_BEHIND_MAX_PENDING: int = 10000
+
+    # POST /api/audit/sync: bodies are read and parsed as they arrive, up to this many bytes once decompressed
+    AUDIT_SYNC_MAX_BODY_BYTES: int = 32 * 1024 * 1024
+    AUDIT_SYNC_MAX_RECORDS: int = 10000
+
+    # Background jobs (S3 cleanup) are journaled to this file and resumed after a restart
+    BACKGROUND_JOBS_JOURNAL_PATH: str = "data/background-jobs.jsonl"
+    BACKGROUND_JOB_MAX_ATTEMPTS: int = 10
+    # Images of workers that don't exist are swept this often (0 disables the sweep),
+    # once untouched for long enough that their enrollment can't still be in progress
+    S3_ORPHAN_SWEEP_INTERVAL_SECONDS: int = 6 * 3600
+    S3_ORPHAN_MIN_AGE_HOURS: int = 48
+
+    # Rate limits of spec §5.2, as "<count>/<second|minute|hour|day>"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_DEVICE_REGISTER: str = "5/hour"
+    RATE_LIMIT_ATTENDANCE_SYNC: str = "100/hour"
+    RATE_LIMIT_AUDIT_SYNC: str = "50/hour"
+    # Where token buckets are kept: "memory" is per process, "shared" in SHARED_STATE_PATH for all workers
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_SHARDS: int = 64
+    # Cap on the in-memory buckets of a process; past it, the oldest are forgotten
+    RATE_LIMIT_MAX_BUCKETS: int = 100_000
+    # Behind a load balancer, limit per IP by the last X-Forwarded-For address instead of the peer address
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+
+    # State shared by the worker processes of gunicorn.conf.py (rate limits, cache invalidations, metrics),
+    # in a SQLite file that belongs on a tmpfs such as /dev/shm; unset for a single process
+    SHARED_STATE_PATH: Optional[str] = None
+    # Other workers' cache invalidations are applied within this many seconds
+    SHARED_CACHE_SYNC_INTERVAL_SECONDS: float = 0.1
+    # Each worker publishes its metrics this often, for /metrics to report every worker
+    SHARED_METRICS_INTERVAL_SECONDS: float = 5
+
+    # Build the AWS clients and table resources during app startup instead of on the first request
+    AWS_WARM_UP_ON_STARTUP: bool = True
 
     SECRET_KEY: str = "a_secure_default_secret_key"
 
     class Config:
         env_file = ".env"
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+class LazySettings:
+    """
+    Stand-in for the Settings instance that reads the environment on first use,
+    so importing a module that depends on settings costs nothing by itself.
+    """
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+settings = LazySettings()
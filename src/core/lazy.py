@@ -0,0 +1,29 @@
+import threading
+from typing import Any, Callable
+
+
+class locked_cached_property:
+    """
+    Like functools.cached_property, but the value is built only once even when
+    several threads read the attribute for the first time at the same moment
+    (Python 3.12 dropped that lock from cached_property). Once built, the value
+    lives in the instance __dict__ and reads no longer go through the descriptor.
+    """
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        # Reentrant: a lazy attribute may be built from another one (a table from its resource)
+        self.lock = threading.RLock()
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with self.lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.func(instance)
+            return instance.__dict__[self.name]
@@ -0,0 +1,294 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+# Prometheus' default buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Label used for requests that matched no route, so unknown paths can't create unbounded series
+UNMATCHED_ROUTE = "unmatched"
+# Label for AWS calls made outside of a request (start-up, CLI tools, background work)
+NO_ROUTE = "none"
+
+# ASGI scope of the request being served; the router fills scope["route"] in place once it has matched
+current_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_scope", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(value: float, other: float) -> float:
+        return value + other
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> Iterable[str]:
+        for label_values, value in sorted((self.snapshot() if values is None else values).items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Gauge:
+    """A value per label combination that can go up and down."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(value: float, other: float) -> float:
+        # Across worker processes a gauge reports its highest value: any open circuit, the fastest send rate
+        return max(value, other)
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> Iterable[str]:
+        for label_values, value in sorted((self.snapshot() if values is None else values).items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observations per label combination."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def snapshot(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {labels: [list(counts), total] for labels, (counts, total) in self._series.items()}
+
+    @staticmethod
+    def combine(value: list, other: list) -> list:
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1]]
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], list]] = None) -> Iterable[str]:
+        for label_values, (counts, total) in sorted((self.snapshot() if values is None else values).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> dict:
+        """The values of every metric, as JSON, for another process to merge into its own (see render)."""
+        return {
+            metric.name: {
+                "gauge": metric.kind == "gauge",
+                "series": [[list(labels), value] for labels, value in metric.snapshot().items()],
+            }
+            for metric in self.metrics
+        }
+
+    def render(self, snapshots: Iterable[dict] = ()) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format, merged
+        with the snapshots of other processes: counters and histograms add up,
+        gauges report the highest value.
+        """
+        snapshots = list(snapshots)
+        lines = []
+        for metric in self.metrics:
+            values = metric.snapshot()
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(metric.name, {}).get("series", ()):
+                    labels = tuple(labels)
+                    values[labels] = metric.combine(values[labels], value) if labels in values else value
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(values))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests served, by route template and status code.", ["method", "route", "status"]
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, including streaming the body.", ["method", "route"]
+)
+aws_requests = registry.counter(
+    "aws_requests_total", "AWS API calls made, by outcome.", ["service", "operation", "outcome"]
+)
+aws_request_duration = registry.histogram(
+    "aws_request_duration_seconds", "Duration of AWS API calls, including botocore retries.", ["service", "operation"]
+)
+aws_request_retries = registry.counter(
+    "aws_request_retries_total", "Retries botocore made for AWS API calls.", ["service", "operation"]
+)
+aws_service_call_duration = registry.histogram(
+    "aws_service_call_duration_seconds",
+    "Duration of AWSService methods awaited by endpoints, including the wait for an executor thread.", ["method"]
+)
+aws_executor_wait = registry.histogram(
+    "aws_executor_wait_seconds", "Time blocking AWS calls waited for a free thread on the AWS executor."
+)
+dynamodb_consumed_capacity = registry.counter(
+    "dynamodb_consumed_capacity_units_total",
+    "DynamoDB capacity units consumed, by table, operation and the route that caused it.",
+    ["table", "operation", "route", "capacity"]
+)
+aws_throttled_requests = registry.counter(
+    "aws_throttled_requests_total", "Calls a DynamoDB table or the S3 bucket answered with a throttling error.", ["resource"]
+)
+aws_throttle_retries = registry.counter(
+    "aws_throttle_retries_total",
+    "Throttled calls, by whether they were retried or given up on (retry budget or attempts exhausted).",
+    ["resource", "outcome"]
+)
+aws_client_send_rate = registry.gauge(
+    "aws_client_send_rate", "Calls per second let through by adaptive rate limiting; 0 while unlimited.", ["resource"]
+)
+aws_client_throttle_wait = registry.histogram(
+    "aws_client_throttle_wait_seconds", "Time calls were held back by adaptive rate limiting.", ["resource"]
+)
+aws_circuit_state = registry.gauge(
+    "aws_circuit_state", "Circuit breaker state: 0 closed, 1 open, 2 half-open.", ["resource"]
+)
+aws_requests_rejected = registry.counter(
+    "aws_requests_rejected_total", "Calls failed fast with 503 without reaching AWS, by reason.", ["resource", "reason"]
+)
+
+write_behind_batch_size = registry.histogram(
+    "write_behind_batch_size", "Entries written per write-behind flush.", buckets=(1, 2, 5, 10, 12, 25, 50, 100)
+)
+write_behind_rejected = registry.counter(
+    "write_behind_rejected_total", "Writes turned away because the write-behind buffer was full."
+)
+rate_limit_rejected = registry.counter(
+    "rate_limit_rejected_total", "Requests answered 429 by a rate limit.", ["limit"]
+)
+
+
+def current_route() -> str:
+    """Route template of the request being served, for attributing work done on its behalf."""
+    scope = current_scope.get()
+    return NO_ROUTE if scope is None else route_template(scope)
+
+
+def route_template(scope: dict) -> str:
+    # FastAPI stores the matched route in the scope while routing
+    return getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records per-route request counts and latency. Routes are
+    labelled by their template (/api/workers/{worker_id}), not the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+        token = current_scope.set(scope)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_scope.reset(token)
+            route = route_template(scope)
+            http_requests.inc(scope["method"], route, str(status))
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route)
+
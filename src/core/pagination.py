@@ -0,0 +1,53 @@
+import base64
+import json
+from decimal import Decimal
+from typing import AsyncIterable, AsyncIterator, Callable, List
+
+import orjson
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def json_default(value):
+    """Serializes the Decimal values boto3 returns for DynamoDB numbers."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Compact JSON with orjson, which also encodes datetimes; Decimals go through json_default."""
+    return orjson.dumps(value, default=json_default)
+
+
+def encode_cursor(last_evaluated_key: dict | None) -> str | None:
+    """Turns a DynamoDB LastEvaluatedKey into an opaque, URL-safe cursor."""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, default=json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> dict | None:
+    """Turns a cursor back into an ExclusiveStartKey. Raises ValueError if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw, parse_int=Decimal, parse_float=Decimal)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor: expected an object")
+    return key
+
+
+def wants_ndjson(accept_header: str | None) -> bool:
+    return bool(accept_header) and NDJSON_MEDIA_TYPE in accept_header
+
+
+async def ndjson_lines(pages: AsyncIterable[List[dict]], convert: Callable[[dict], dict]) -> AsyncIterator[bytes]:
+    """Yields one JSON document per line, each item as convert() returns it, a page at a time as pages are read."""
+    async for page in pages:
+        if page:
+            yield b"".join(dumps(convert(item)) + b"\n" for item in page)
@@ -0,0 +1,216 @@
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+from fastapi import HTTPException, Request
+
+from src.core.config import settings
+from src.core.lazy import locked_cached_property
+from src.core.metrics import rate_limit_rejected
+from src.core.security import device_tokens
+from src.core.shared_state import shared
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """'100/hour' -> (100 requests, 3600 seconds)."""
+    try:
+        count, period = rate.split("/")
+        return int(count), PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate {rate!r}; expected <count>/<{'|'.join(PERIODS)}>")
+
+
+class TokenBucketStore:
+    """
+    Token buckets by key. A bucket holds up to `capacity` tokens and refills at
+    capacity / period tokens per second; each request takes one.
+
+    Subclasses decide where buckets live: InMemoryTokenBucketStore keeps them in
+    the process, SharedTokenBucketStore in the state shared by every worker process.
+    """
+
+    def acquire(self, key: str, capacity: int, period: float) -> float:
+        """Takes a token from key's bucket. Returns 0 if one was available, else the seconds until there is one."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+# Buckets each acquire() checks for eviction, at the front of its shard
+SWEEP_STEPS = 2
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [tokens, updated at, full at], least recently checked or used first
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
+
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    """
+    Buckets in per-process dicts, split into shards by a hash of the key, each with
+    its own lock, so concurrent requests for different keys rarely contend.
+
+    A bucket that would have refilled completely holds no information, so it is
+    dropped: each acquire() checks the SWEEP_STEPS buckets at the front of its
+    shard, dropping those that are full again and moving the others to the back,
+    so an idle bucket is found however long the buckets ahead of it take to
+    refill. Beyond `max_buckets`, the least recently checked buckets are dropped
+    even if they aren't full, which only forgets some of a key's past requests.
+    Checks and evictions are O(1) amortized.
+    """
+
+    def __init__(self, shards: int = 64, clock: Callable[[], float] = time.monotonic, max_buckets: int = 100_000):
+        self._shards = [_Shard() for _ in range(shards)]
+        self._clock = clock
+        self._shard_capacity = max(1, max_buckets // shards)
+
+    def acquire(self, key: str, capacity: int, period: float) -> float:
+        rate = capacity / period
+        shard = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        with shard.lock:
+            now = self._clock()
+            buckets = shard.buckets
+            for _ in range(min(SWEEP_STEPS, len(buckets))):
+                oldest_key, oldest = next(iter(buckets.items()))
+                if oldest[2] <= now:
+                    del buckets[oldest_key]
+                else:
+                    buckets.move_to_end(oldest_key)
+
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+
+            tokens -= 1
+            buckets[key] = [tokens, now, now + (capacity - tokens) / rate]
+            buckets.move_to_end(key)
+            if len(buckets) > self._shard_capacity:
+                buckets.popitem(last=False)
+            return 0.0
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.buckets.clear()
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+
+class SharedTokenBucketStore(TokenBucketStore):
+    """
+    Buckets in the shared state database (shared_state.SharedState), so every
+    worker process draws from the same buckets. Each acquire() is one short
+    transaction; time.monotonic() is the system's clock, the same in all workers.
+    Buckets that have refilled are deleted every `cleanup_every` acquires.
+    """
+
+    def __init__(self, state, cleanup_every: int = 1000, clock: Callable[[], float] = time.monotonic):
+        self.state = state
+        self.cleanup_every = cleanup_every
+        self._clock = clock
+        self._acquires = 0
+
+    def acquire(self, key: str, capacity: int, period: float) -> float:
+        rate = capacity / period
+        self._acquires += 1
+        with self.state.transaction() as connection:
+            now = self._clock()
+            if self._acquires % self.cleanup_every == 0:
+                connection.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+            row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+
+            tokens -= 1
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            return 0.0
+
+    def clear(self):
+        with self.state.transaction() as connection:
+            connection.execute("DELETE FROM buckets")
+
+
+class RateLimits:
+    """Process-wide token bucket store, built on first use from the RATE_LIMIT_* settings."""
+
+    @locked_cached_property
+    def store(self) -> TokenBucketStore:
+        if settings.RATE_LIMIT_BACKEND == "memory":
+            return InMemoryTokenBucketStore(settings.RATE_LIMIT_SHARDS, max_buckets=settings.RATE_LIMIT_MAX_BUCKETS)
+        if settings.RATE_LIMIT_BACKEND == "shared":
+            if shared.state is None:
+                raise ValueError("RATE_LIMIT_BACKEND 'shared' requires SHARED_STATE_PATH")
+            return SharedTokenBucketStore(shared.state)
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {settings.RATE_LIMIT_BACKEND!r}")
+
+    def check(self, name: str, rate: str, key: str):
+        """Raises 429 with Retry-After once key has used up the rate of the limit called name."""
+        capacity, period = parse_rate(rate)
+        retry_after = self.store.acquire(f"{name}:{key}", capacity, period)
+        if retry_after > 0:
+            rate_limit_rejected.inc(name)
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit of {rate} exceeded",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+
+rate_limits = RateLimits()
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            # The load balancer appends the address it saw; earlier entries are client-supplied
+            return forwarded_for.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def device_key(request: Request) -> str:
+    """The device of a valid bearer token, or the client IP for requests without one."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"device:{device_tokens.verify(token)['device_id']}"
+        except ValueError:
+            pass
+    return f"ip:{client_ip(request)}"
+
+
+def ip_key(request: Request) -> str:
+    return f"ip:{client_ip(request)}"
+
+
+def rate_limit(name: str, setting: str, key: Callable[[Request], str]):
+    """
+    Dependency enforcing the rate in the `setting` setting (e.g. "100/hour")
+    for each key(request), answering 429 with Retry-After beyond it.
+    """
+    # Async so FastAPI calls it on the event loop instead of a worker thread; it never blocks
+    async def check_rate_limit(request: Request):
+        if settings.RATE_LIMIT_ENABLED:
+            rate_limits.check(name, getattr(settings, setting), key(request))
+
+    return check_rate_limit
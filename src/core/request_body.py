@@ -0,0 +1,233 @@
+"""
+Request bodies read as a stream: decompressed per their Content-Encoding
+(gzip or zstd) and parsed one array item at a time, so a large upload is never
+held in memory as a whole, neither compressed nor as parsed JSON.
+"""
+import codecs
+import json
+import zlib
+from typing import AsyncIterator, Iterator, List
+
+from fastapi import HTTPException, Request
+
+SUPPORTED_ENCODINGS = ("identity", "gzip", "zstd")
+# Compressed input is fed to the decompressor in slices of this size, checking the output size
+# after each one, so a decompression bomb is stopped after a few MB of output
+DECOMPRESS_SLICE_BYTES = 1024
+# Largest single value (an array item, or the value of another key) buffered while it arrives
+MAX_VALUE_BYTES = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Decompressor:
+    def __init__(self, encoding: str):
+        if encoding == "gzip":
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            import zstandard
+            self._zlib = None
+            self._zstd = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes, max_length: int) -> Iterator[bytes]:
+        """Yields the output for `data`, raising 413 once it would exceed max_length in total."""
+        produced = 0
+        for start in range(0, len(data), DECOMPRESS_SLICE_BYTES):
+            piece = data[start:start + DECOMPRESS_SLICE_BYTES]
+            if self._zlib is not None:
+                # Bounded output per call; the rest of the input waits in unconsumed_tail
+                while piece:
+                    output = self._zlib.decompress(piece, max_length - produced + 1)
+                    piece = self._zlib.unconsumed_tail
+                    produced += len(output)
+                    if produced > max_length:
+                        raise _too_large(max_length)
+                    yield output
+            else:
+                output = self._zstd.decompress(piece)
+                produced += len(output)
+                if produced > max_length:
+                    raise _too_large(max_length)
+                yield output
+
+    def finish(self):
+        if self._zlib is not None and not self._zlib.eof:
+            raise HTTPException(status_code=400, detail="Truncated gzip body")
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body is larger than {max_bytes} bytes")
+
+
+async def decoded_body(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Yields the request body as it arrives, decompressed per its Content-Encoding.
+    Raises 415 for an unsupported encoding, 400 for a corrupt compressed body
+    and 413 once more than max_bytes have been decoded.
+    """
+    encoding = request.headers.get("content-encoding", "identity").strip().lower() or "identity"
+    if encoding not in SUPPORTED_ENCODINGS:
+        raise HTTPException(
+            status_code=415, detail=f"Unsupported Content-Encoding {encoding!r}; use {', '.join(SUPPORTED_ENCODINGS)}"
+        )
+    decompressor = _Decompressor(encoding) if encoding != "identity" else None
+
+    total = 0
+    try:
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            outputs = [chunk] if decompressor is None else decompressor.decompress(chunk, max_bytes - total)
+            for output in outputs:
+                total += len(output)
+                if total > max_bytes:
+                    raise _too_large(max_bytes)
+                if output:
+                    yield output
+        if decompressor is not None:
+            decompressor.finish()
+    except HTTPException:
+        raise
+    except Exception as e:
+        # zlib.error, zstandard.ZstdError
+        raise HTTPException(status_code=400, detail=f"Invalid {encoding} body: {e}")
+
+
+class JSONArrayStream:
+    """
+    Incremental parser of the items of one array, `key`, of a JSON object, e.g.
+    the records of {"audits": [{...}, {...}]}. feed() takes text as it arrives and
+    returns the items completed so far; only the item being received is buffered.
+    Values of other keys are parsed and dropped. Raises ValueError for input that
+    isn't such an object.
+    """
+
+    def __init__(self, key: str, max_value_chars: int = MAX_VALUE_BYTES):
+        self.key = key
+        self.max_value_chars = max_value_chars
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._state = "start"
+        self._current_key = None
+        self.found = False
+
+    def _skip_whitespace(self, position: int) -> int:
+        buffer = self._buffer
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        return position
+
+    def _decode(self, position: int, final: bool):
+        """(value, end), or None while the value at `position` may still be incomplete."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, position)
+        except json.JSONDecodeError as e:
+            if final:
+                raise ValueError(f"Invalid JSON: {e.msg}") from None
+            if len(self._buffer) - position > self.max_value_chars:
+                raise ValueError(f"JSON value larger than {self.max_value_chars} characters") from None
+            return None
+        # A number at the very end of the text may continue in the next chunk
+        if end == len(self._buffer) and not final:
+            return None
+        return value, end
+
+    def _expect(self, position: int, expected: str) -> str:
+        char = self._buffer[position]
+        if char not in expected:
+            raise ValueError(f"Invalid JSON: expected one of {expected!r}, found {char!r}")
+        return char
+
+    def _parse(self, final: bool) -> List:
+        items = []
+        position = 0
+        while True:
+            position = self._skip_whitespace(position)
+            if self._state == "end":
+                if position < len(self._buffer):
+                    raise ValueError("Invalid JSON: extra data after the object")
+                break
+            if position >= len(self._buffer):
+                break
+
+            state = self._state
+            if state == "start":
+                self._expect(position, "{")
+                position += 1
+                self._state = "key_or_end"
+            elif state in ("key_or_end", "key"):
+                if state == "key_or_end" and self._buffer[position] == "}":
+                    position += 1
+                    self._state = "end"
+                    continue
+                self._expect(position, '"')
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    break
+                self._current_key, position = decoded
+                self._state = "colon"
+            elif state == "colon":
+                self._expect(position, ":")
+                position += 1
+                self._state = "array_start" if self._current_key == self.key else "value"
+            elif state == "value":
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    break
+                position = decoded[1]
+                self._state = "after_value"
+            elif state == "after_value":
+                position += 1
+                self._state = "key" if self._expect(position - 1, ",}") == "," else "end"
+            elif state == "array_start":
+                self._expect(position, "[")
+                self.found = True
+                position += 1
+                self._state = "item_or_array_end"
+            elif state in ("item_or_array_end", "item"):
+                if state == "item_or_array_end" and self._buffer[position] == "]":
+                    position += 1
+                    self._state = "after_value"
+                    continue
+                decoded = self._decode(position, final)
+                if decoded is None:
+                    break
+                item, position = decoded
+                items.append(item)
+                self._state = "after_item"
+            elif state == "after_item":
+                position += 1
+                self._state = "item" if self._expect(position - 1, ",]") == "," else "after_value"
+
+        self._buffer = self._buffer[position:]
+        return items
+
+    def feed(self, text: str) -> List:
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> List:
+        """Parses what is left once the input has ended."""
+        items = self._parse(final=True)
+        if self._state != "end":
+            raise ValueError("Invalid JSON: the body ended before the object did")
+        return items
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: str) -> AsyncIterator:
+    """
+    Yields the items of the array `key` of the JSON object in `chunks` as each
+    one arrives. Raises ValueError for malformed JSON or an object without `key`.
+    """
+    parser = JSONArrayStream(key)
+    text = codecs.getincrementaldecoder("utf-8")()
+    try:
+        async for chunk in chunks:
+            for item in parser.feed(text.decode(chunk)):
+                yield item
+        for item in parser.feed(text.decode(b"", final=True)) + parser.close():
+            yield item
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Body is not valid UTF-8: {e}") from None
+    if not parser.found:
+        raise ValueError(f"Missing {key!r} array")
@@ -0,0 +1,109 @@
+"""
+Fast JSON responses for items read from storage.
+
+List and get endpoints return storage items as they are: they were validated by
+the models when written, so FastAPI's response_model validation is skipped.
+Each response model gets a converter, built once, that keeps the model's fields
+(or the requested subset), fills in missing defaults and turns DynamoDB's
+Decimals into the field's number type. orjson then encodes the result. The
+response_model stays declared on the routes, for the OpenAPI schema.
+"""
+import types
+import typing
+from decimal import Decimal
+from functools import lru_cache
+from typing import AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from src.core.pagination import NDJSON_MEDIA_TYPE, dumps, ndjson_lines
+
+_MISSING = object()
+
+_NUMBER_TYPES = {int: int, float: float}
+
+
+def _number_cast(annotation) -> Optional[Callable]:
+    """int or float for a (possibly optional) number field, so its Decimals are cast ahead of encoding."""
+    if annotation in _NUMBER_TYPES:
+        return _NUMBER_TYPES[annotation]
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        casts = {_NUMBER_TYPES.get(arg) for arg in typing.get_args(annotation) if arg is not type(None)}
+        if len(casts) == 1:
+            return casts.pop()
+    return None
+
+
+def _to_number(cast: Callable):
+    def convert(value):
+        return cast(value) if isinstance(value, Decimal) else value
+    return convert
+
+
+@lru_cache(maxsize=None)
+def item_converter(model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None) -> Callable[[dict], dict]:
+    """
+    Builds the function that turns a storage item into the JSON-ready dict of
+    `model` (restricted to `fields` when given), in the model's field order.
+    """
+    plan = []
+    for name, info in model.model_fields.items():
+        if fields is not None and name not in fields:
+            continue
+        if info.default_factory is not None:
+            default = info.default_factory
+        elif info.is_required():
+            default = _MISSING
+        else:
+            default = (lambda value: lambda: value)(info.default)
+        cast = _number_cast(info.annotation)
+        plan.append((name, default, _to_number(cast) if cast else None))
+
+    def convert(item: dict) -> dict:
+        result = {}
+        for name, default, cast in plan:
+            value = item.get(name, _MISSING)
+            if value is _MISSING:
+                if default is _MISSING:
+                    continue
+                value = default()
+            result[name] = cast(value) if cast else value
+        return result
+
+    return convert
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    Parses a comma-separated `fields` query parameter into the attributes to
+    project. Raises ValueError for names that aren't fields of the model.
+    """
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(model.model_fields)}")
+    return names or None
+
+
+def items_response(items: Iterable[dict], model: Type[BaseModel], fields: Optional[List[str]] = None,
+                   headers: Optional[Dict[str, str]] = None) -> Response:
+    """A JSON array of items as `model` (or only `fields` of it), without response_model validation."""
+    convert = item_converter(model, tuple(fields) if fields else None)
+    return Response(dumps([convert(item) for item in items]), media_type="application/json", headers=headers)
+
+
+def item_response(item: dict, model: Type[BaseModel], fields: Optional[List[str]] = None) -> Response:
+    """A single item as `model` (or only `fields` of it), without response_model validation."""
+    convert = item_converter(model, tuple(fields) if fields else None)
+    return Response(dumps(convert(item)), media_type="application/json")
+
+
+def ndjson_response(pages: AsyncIterable[List[dict]], model: Type[BaseModel],
+                    fields: Optional[List[str]] = None) -> StreamingResponse:
+    """Items as `model` (or only `fields` of it), streamed one per line as pages are read."""
+    convert = item_converter(model, tuple(fields) if fields else None)
+    return StreamingResponse(ndjson_lines(pages, convert), media_type=NDJSON_MEDIA_TYPE)
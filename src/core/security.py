@@ -1,8 +1,12 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import time
 
+from src.core.cache import TTLCache
 from src.core.config import settings
+from src.core.lazy import locked_cached_property
 
 ALGORITHM = "HS256"
 
@@ -28,3 +32,48 @@ def verify_token(token: str, credentials_exception):
         return payload
     except JWTError:
         raise credentials_exception
+
+class DeviceTokenVerifier:
+    """
+    verify_token with a cache of successful decodes, keyed by the SHA-256 of the
+    token so that cached tokens aren't kept in memory. Devices send the same
+    token on every request, so the HS256 check runs once per token and TTL.
+    """
+
+    @locked_cached_property
+    def cache(self) -> TTLCache:
+        return TTLCache("device_tokens", settings.CACHE_MAX_ENTRIES, settings.CACHE_DEVICE_TOKEN_TTL_SECONDS)
+
+    def verify(self, token: str) -> dict:
+        """Returns the claims of a device token. Raises ValueError if it is invalid or expired."""
+        key = hashlib.sha256(token.encode()).digest()
+        found, payload = self.cache.lookup(key)
+        if not found:
+            payload = verify_token(token, ValueError("Invalid device token"))
+            # Failures aren't cached, so random tokens can't evict valid ones
+            self.cache.set(key, payload)
+        if payload.get("exp") is not None and payload["exp"] <= time.time():
+            self.cache.invalidate(key)
+            raise ValueError("Device token has expired")
+        return payload
+
+
+device_tokens = DeviceTokenVerifier()
+
+ENROLLMENT_PURPOSE = "enrollment"
+
+def create_enrollment_token(data: dict, expires_delta: timedelta) -> str:
+    """Signs the state of a pending enrollment so the finalize call can trust it without storing it."""
+    now = datetime.utcnow()
+    to_encode = {**data, "purpose": ENROLLMENT_PURPOSE, "iat": now, "exp": now + expires_delta}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_enrollment_token(token: str) -> dict:
+    """Returns the token's claims. Raises ValueError if it is malformed, expired or not an enrollment token."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        raise ValueError(f"Invalid enrollment token: {e}")
+    if payload.get("purpose") != ENROLLMENT_PURPOSE:
+        raise ValueError("Invalid enrollment token: not issued for an enrollment")
+    return payload
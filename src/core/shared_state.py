@@ -0,0 +1,258 @@
+"""
+State shared by the worker processes of one server (see gunicorn.conf.py).
+
+It lives in a SQLite database that SHARED_STATE_PATH points to, on a tmpfs such
+as /dev/shm so that it never touches a disk. It holds:
+- rate limit buckets (SharedTokenBucketStore in rate_limit), so a limit applies
+  to a client across every worker;
+- cache invalidations: caches stay in process memory, but an invalidation in one
+  worker drops the entry in the others within SHARED_CACHE_SYNC_INTERVAL_SECONDS;
+- metric snapshots, published by each worker every SHARED_METRICS_INTERVAL_SECONDS,
+  so /metrics reports the whole server whichever worker serves it.
+
+Without SHARED_STATE_PATH, as under a single uvicorn process, none of this is used.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, Optional
+
+from src.core.config import settings
+from src.core.lazy import locked_cached_property
+
+logger = logging.getLogger(__name__)
+
+# Invalidations older than this are deleted; caches expire their entries well before
+INVALIDATION_RETENTION_SECONDS = 300
+# Gauges of snapshots older than this many publishing intervals are left out, e.g. those of an exited worker
+STALE_SNAPSHOT_INTERVALS = 3
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+    "updated_at REAL NOT NULL, full_at REAL NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)",
+    "CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "origin TEXT NOT NULL, cache TEXT NOT NULL, key TEXT NOT NULL, at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS metrics (pid INTEGER PRIMARY KEY, snapshot TEXT NOT NULL, updated_at REAL NOT NULL)",
+)
+
+
+class SharedState:
+    """
+    The shared SQLite database. Connections are per process and thread: one made
+    before a fork is never used by the child.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready_pid = None
+
+    def reset(self):
+        """Deletes the database, so a new server doesn't inherit the state of the previous one."""
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # The database is scratch state on a tmpfs; it is rebuilt on the next start
+            connection.execute("PRAGMA synchronous=OFF")
+            local.connection, local.pid = connection, os.getpid()
+            self._create_schema(connection)
+        return local.connection
+
+    def _create_schema(self, connection: sqlite3.Connection):
+        with self._schema_lock:
+            if self._schema_ready_pid != os.getpid():
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                self._schema_ready_pid = os.getpid()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE: the write lock is taken up front, so read-modify-write sequences are atomic across processes."""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def publish_metrics(self, snapshot: dict):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO metrics (pid, snapshot, updated_at) VALUES (?, ?, ?)",
+            (os.getpid(), json.dumps(snapshot), time.time())
+        )
+
+    def metric_snapshots(self, exclude_pid: Optional[int] = None) -> List[dict]:
+        """
+        The snapshots published by the other processes. Those of processes that stopped
+        publishing are kept for their counters and histograms, without their gauges.
+        """
+        stale_before = time.time() - STALE_SNAPSHOT_INTERVALS * settings.SHARED_METRICS_INTERVAL_SECONDS
+        snapshots = []
+        for pid, snapshot, updated_at in self.connection.execute("SELECT pid, snapshot, updated_at FROM metrics"):
+            if pid == exclude_pid:
+                continue
+            snapshot = json.loads(snapshot)
+            if updated_at < stale_before:
+                snapshot = {name: values for name, values in snapshot.items() if not values.get("gauge")}
+            snapshots.append(snapshot)
+        return snapshots
+
+
+def _encode_key(key: Hashable) -> str:
+    return json.dumps(key)
+
+
+def _decode_key(raw: str) -> Hashable:
+    key = json.loads(raw)
+    # Tuple keys come back as lists
+    return tuple(key) if isinstance(key, list) else key
+
+
+class CacheInvalidations:
+    """
+    Broadcasts cache invalidations between processes. Each process registers its
+    caches by name; an invalidation is published to the shared database, and
+    sync() drops the keys invalidated elsewhere since the last sync. Caches call
+    sync() on lookup, at most once per `interval` seconds.
+    """
+
+    def __init__(self, state: SharedState, interval: float, clock=time.monotonic):
+        self.state = state
+        self.interval = interval
+        self._clock = clock
+        # Identifies this process's own invalidations; a pid could be reused by a later worker
+        self.origin = uuid.uuid4().hex
+        self._caches: Dict[str, object] = {}
+        self._last_seq: Optional[int] = None
+        self._synced_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def register(self, cache):
+        self._caches[cache.name] = cache
+
+    def publish(self, cache_name: str, key: Hashable):
+        with self.state.transaction() as connection:
+            connection.execute(
+                "INSERT INTO invalidations (origin, cache, key, at) VALUES (?, ?, ?, ?)",
+                (self.origin, cache_name, _encode_key(key), time.time())
+            )
+
+    def maybe_sync(self):
+        if self._clock() - self._synced_at >= self.interval:
+            self.sync()
+
+    def sync(self):
+        # Non-blocking: a lookup never waits for another thread's sync
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = self._clock()
+            connection = self.state.connection
+            if self._last_seq is None:
+                # Entries cached from now on are newer than every earlier invalidation
+                self._last_seq = connection.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+                return
+            rows = connection.execute(
+                "SELECT seq, origin, cache, key FROM invalidations WHERE seq > ? ORDER BY seq", (self._last_seq,)
+            ).fetchall()
+            for seq, origin, cache_name, key in rows:
+                self._last_seq = seq
+                cache = self._caches.get(cache_name)
+                if origin != self.origin and cache is not None:
+                    cache.invalidate(_decode_key(key), broadcast=False)
+            if rows and rows[-1][0] % 1000 < len(rows):
+                # Now and then, once per ~1000 invalidations
+                connection.execute("DELETE FROM invalidations WHERE at < ?", (time.time() - INVALIDATION_RETENTION_SECONDS,))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to sync cache invalidations: {e}")
+        finally:
+            self._lock.release()
+
+
+class MetricsPublisher:
+    """Thread that publishes this process's metrics to the shared database every `interval` seconds."""
+
+    def __init__(self, state: SharedState, registry, interval: float):
+        self.state = state
+        self.registry = registry
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self):
+        try:
+            self.state.publish_metrics(self.registry.snapshot())
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to publish metrics: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    def start(self):
+        self.publish()
+        self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops publishing, after a last snapshot so the process's final counts are kept."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.publish()
+
+
+class Shared:
+    """The process's view of the shared state, built on first use; None members when SHARED_STATE_PATH is unset."""
+
+    @locked_cached_property
+    def state(self) -> Optional[SharedState]:
+        return SharedState(settings.SHARED_STATE_PATH) if settings.SHARED_STATE_PATH else None
+
+    @locked_cached_property
+    def cache_invalidations(self) -> Optional[CacheInvalidations]:
+        if self.state is None:
+            return None
+        return CacheInvalidations(self.state, settings.SHARED_CACHE_SYNC_INTERVAL_SECONDS)
+
+    @locked_cached_property
+    def metrics_publisher(self) -> Optional[MetricsPublisher]:
+        if self.state is None:
+            return None
+        from src.core.metrics import registry
+        publisher = MetricsPublisher(self.state, registry, settings.SHARED_METRICS_INTERVAL_SECONDS)
+        publisher.start()
+        return publisher
+
+    def start_metrics_publisher(self):
+        """Starts publishing this process's metrics, if there is shared state."""
+        self.metrics_publisher
+
+    def stop_metrics_publisher(self):
+        """Stops publishing, if it was started."""
+        publisher = self.__dict__.pop('metrics_publisher', None)
+        if publisher is not None:
+            publisher.stop()
+
+
+shared = Shared()
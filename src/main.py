@@ -1,16 +1,72 @@
-from fastapi import FastAPI
-from src.api.endpoints import workers, timestamps, devices
+import math
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from src.api.endpoints import workers, timestamps, devices, attendance, audit, timesheets
+from src.core.config import settings
+from src.core.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from src.core.shared_state import shared
+from src.services.async_aws_service import async_aws_service
+from src.services.aws_service import AWSService, get_aws_service
+from src.services.image_processing import image_processor
+from src.services.storage import StorageBusyError
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # AWS clients are built lazily; build them before serving so the first request doesn't pay for it
+    if settings.AWS_WARM_UP_ON_STARTUP:
+        await async_aws_service.warm_up()
+    if settings.TIMESTAMP_WRITE_BEHIND:
+        await async_aws_service.start_write_behind()
+    await async_aws_service.start_background_jobs()
+    # Under the multi-process server, publish this worker's metrics for the others' /metrics
+    shared.start_metrics_publisher()
+    yield
+    await async_aws_service.stop_write_behind()
+    await async_aws_service.stop_background_jobs()
+    image_processor.shutdown()
+    shared.stop_metrics_publisher()
 
 app = FastAPI(
     title="Sioma Dashboard API",
     description="API to manage worker data and time tracking for the Sioma project.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(StorageBusyError)
+async def storage_busy(request: Request, exc: StorageBusyError):
+    # A saturated table or bucket: clients back off instead of retrying at once
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service is busy, retry shortly"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
 app.include_router(workers.router, prefix="/api", tags=["Workers"])
 app.include_router(timestamps.router, prefix="/api", tags=["Timestamps"])
 app.include_router(devices.router, prefix="/api", tags=["Devices"])
+app.include_router(attendance.router, prefix="/api", tags=["Attendance"])
+app.include_router(audit.router, prefix="/api", tags=["Audit"])
+app.include_router(timesheets.router, prefix="/api", tags=["Timesheets"])
 
 @app.get("/health", tags=["Health"])
 def health_check():
     return {"status": "ok"}
+
+@app.get("/health/cache", tags=["Health"])
+def cache_stats(aws: AWSService = Depends(get_aws_service)):
+    return aws.cache_stats()
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def metrics():
+    """
+    Request, AWS call and DynamoDB consumed-capacity metrics in the Prometheus text format,
+    of every worker process when they share state.
+    """
+    snapshots = shared.state.metric_snapshots(exclude_pid=os.getpid()) if shared.state is not None else ()
+    return Response(registry.render(snapshots), media_type=CONTENT_TYPE)
@@ -0,0 +1,65 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+MAX_SYNC_RECORDS = 100
+
+class AttendanceRecordIn(BaseModel):
+    local_id: int = Field(..., example=123)
+    employee_id: str = Field(..., example="EMP001")
+    type: Literal["ENTRY", "EXIT"] = Field(..., example="ENTRY")
+    timestamp: int = Field(..., example=1706140800000)
+    confidence: float = Field(..., ge=0.0, le=1.0, example=0.95)
+    liveness_passed: bool = Field(..., example=True)
+    device_id: str = Field(..., example="550e8400-e29b-41d4-a716-446655440000")
+    created_at: int = Field(..., example=1706140800000)
+
+class AttendanceSyncRequest(BaseModel):
+    records: List[AttendanceRecordIn]
+
+class SyncedRecord(BaseModel):
+    local_id: int = Field(..., example=123)
+    server_id: str = Field(..., example="0b8f6c1e-7c2a-4a57-9d7e-3f1c2b9a8e11")
+    synced_at: int = Field(..., example=1706180000000)
+
+class ExistingRecord(BaseModel):
+    server_id: str = Field(..., example="5d1b2c3a-4e5f-4a6b-8c7d-9e0f1a2b3c4d")
+    timestamp: int = Field(..., example=1706173200000)
+    device_id: str = Field(..., example="other-device-uuid")
+
+class SyncConflict(BaseModel):
+    local_id: int = Field(..., example=124)
+    reason: str = Field(..., example="DUPLICATE_TIMESTAMP")
+    message: str = Field(..., example="Ya existe un registro para este empleado en este timestamp")
+    existing_record: Optional[ExistingRecord] = None
+
+class SyncError(BaseModel):
+    local_id: int = Field(..., example=125)
+    reason: str = Field(..., example="INVALID_TIMESTAMP")
+    message: str = Field(..., example="El timestamp no puede estar en el futuro")
+
+class AttendanceSyncResponse(BaseModel):
+    success: bool = Field(True, example=True)
+    synced_count: int = Field(..., example=2)
+    synced_records: List[SyncedRecord] = []
+    conflicts: List[SyncConflict] = []
+    errors: List[SyncError] = []
+
+class AttendanceUpdate(BaseModel):
+    server_id: str = Field(..., example="0b8f6c1e-7c2a-4a57-9d7e-3f1c2b9a8e11")
+    employee_id: str = Field(..., example="EMP002")
+    type: str = Field(..., example="ENTRY")
+    timestamp: Optional[int] = Field(..., example=1706184400000)
+    device_id: Optional[str] = Field(None, example="other-device-uuid")
+    action: Literal["CREATED", "UPDATED", "DELETED"] = Field(..., example="CREATED")
+    source: Literal["attendance", "timestamp"] = Field("attendance", example="attendance")
+    deleted_by_admin_id: Optional[int] = Field(None, example=42)
+    deletion_reason: Optional[str] = Field(None, example="Registro erróneo")
+
+class AttendanceUpdatesResponse(BaseModel):
+    updates: List[AttendanceUpdate] = []
+    last_sync_timestamp: int = Field(..., example=1706185000000)
+    next_cursor: Optional[str] = Field(None, example=None)
+
+class AttendanceDeleteRequest(BaseModel):
+    deleted_by_admin_id: int = Field(..., example=42)
+    deletion_reason: str = Field(..., example="Registro erróneo")
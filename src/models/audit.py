@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+
+from src.models.attendance import SyncError
+
+# Metadata blobs are stored as they are; this keeps an audit well below DynamoDB's 400 KB item limit
+MAX_METADATA_LENGTH = 64 * 1024
+
+class AuditRecordIn(BaseModel):
+    local_id: int = Field(..., example=501)
+    attendance_id: Union[int, str] = Field(..., example=123)
+    action: str = Field(..., max_length=64, example="CANCELLED_BY_USER")
+    employee_id_detected: Optional[str] = Field(None, example="EMP001")
+    employee_id_actual: Optional[str] = Field(None, example=None)
+    performed_by_user_id: Optional[int] = Field(None, example=None)
+    reason: Optional[str] = Field(None, max_length=1024, example="Usuario rechazó identificación")
+    metadata: Optional[str] = Field(None, max_length=MAX_METADATA_LENGTH, example="{\"confidence\":0.82}")
+    timestamp: int = Field(..., ge=0, example=1706140900000)
+
+class AuditSyncRequest(BaseModel):
+    """The request body; it is parsed as a stream, this model documents it."""
+    audits: List[AuditRecordIn]
+
+class SyncedAudit(BaseModel):
+    local_id: int = Field(..., example=501)
+    server_id: str = Field(..., example="6f1c2b9a-8e11-5c2a-9d7e-0b8f6c1e7c2a")
+    synced_at: int = Field(..., example=1706180000000)
+
+class AuditSyncResponse(BaseModel):
+    success: bool = Field(True, example=True)
+    synced_count: int = Field(..., example=1)
+    synced_audits: List[SyncedAudit] = []
+    errors: List[SyncError] = []
@@ -22,3 +22,19 @@ class DeviceRegisterResponseData(BaseModel):
 class DeviceRegisterResponse(BaseModel):
     success: bool = Field(True, example=True)
     data: DeviceRegisterResponseData
+
+class DeviceDeactivateRequest(BaseModel):
+    reason: Optional[str] = Field(None, example="Tablet lost")
+
+class DeviceResponse(BaseModel):
+    device_id: str = Field(..., example="550e8400-e29b-41d4-a716-446655440000")
+    tenant_id: str = Field(..., example="ACME")
+    device_name: Optional[str] = Field(None, example="Tablet Entrada Principal")
+    device_model: Optional[str] = Field(None, example="Samsung Galaxy Tab A7")
+    device_manufacturer: Optional[str] = Field(None, example="Samsung")
+    android_version: Optional[str] = Field(None, example="13")
+    is_active: bool = Field(..., example=False)
+    registered_at: Optional[int] = Field(None, example=1706140800000)
+    last_sync_at: Optional[int] = Field(None, example=None)
+    deactivated_at: Optional[int] = Field(None, example=1706227200000)
+    deactivation_reason: Optional[str] = Field(None, example="Tablet lost")
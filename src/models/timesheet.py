@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import date
+
+class TimesheetDay(BaseModel):
+    date: date
+    hours: float = Field(..., example=8.5)
+    pairs: int = Field(..., example=1)
+    unmatched_entries: int = Field(0, example=0)
+    unmatched_exits: int = Field(0, example=0)
+    workers: Optional[Dict[str, float]] = Field(None, example={"EMP001": 8.5})
+
+class TimesheetResponse(BaseModel):
+    scope: str = Field(..., example="worker#worker-123")
+    from_date: date
+    to_date: date
+    total_hours: float = Field(..., example=170.0)
+    workers: Optional[Dict[str, float]] = Field(None, example={"EMP001": 170.0})
+    days: List[TimesheetDay]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List
+from typing import Dict, List
 from datetime import datetime
 import uuid
 
@@ -9,23 +9,41 @@ class WorkerPersonalData(BaseModel):
     first_name: str
     last_name: str
     email: EmailStr
+    tenant_id: str | None = None # Roster the worker is synced to; DEFAULT_TENANT_ID when not given
     
 class WorkerCreate(BaseModel):
     personal_data: WorkerPersonalData
     
 class WorkerResponse(WorkerPersonalData):
     image_urls: List[str]
+    thumbnail_urls: List[str] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PresignedUpload(BaseModel):
+    key: str
+    url: str # POST the fields, then the file, as multipart/form-data to this URL
+    fields: Dict[str, str]
+
+class EnrollmentStartResponse(BaseModel):
+    worker_id: str
+    enrollment_token: str
+    expires_at: datetime
+    uploads: List[PresignedUpload]
+
+class EnrollmentFinalizeRequest(BaseModel):
+    enrollment_token: str
+
 class TimeLogCreate(BaseModel):
     worker_id: str
     event_type: str # "entry" or "exit"
+    tenant_id: str | None = None # Change feed partition; DEFAULT_TENANT_ID when not given
 
 class TimeLogResponse(BaseModel):
     id: str = Field(default_factory=lambda: f"log-{uuid.uuid4()}")
     worker_id: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     event_type: str
+    tenant_id: str | None = None
 
 class WorkerUpdate(BaseModel):
     first_name: str | None = None
@@ -0,0 +1,79 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from src.core.config import settings
+from src.core.lazy import locked_cached_property
+from src.core.metrics import aws_executor_wait, aws_service_call_duration
+from src.services.aws_service import AWSService, aws_service
+
+_END = object()
+
+
+class AsyncAWSService:
+    """
+    Async counterpart of AWSService with the same method surface.
+
+    Every blocking method is exposed as a coroutine that runs on a dedicated,
+    bounded thread pool, so endpoints can await DynamoDB and S3 calls without
+    stalling the event loop. Generator methods (e.g. iter_worker_pages) become
+    async iterators, and methods that are already coroutines are returned as is.
+    """
+
+    def __init__(self, service: AWSService, max_workers: Optional[int] = None):
+        self.service = service
+        self.max_workers = max_workers
+
+    @locked_cached_property
+    def executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.max_workers or settings.AWS_EXECUTOR_WORKERS, thread_name_prefix="aws")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Runs a blocking callable on the AWS executor, keeping the caller's context variables."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def call():
+            aws_executor_wait.observe(time.perf_counter() - submitted)
+            return context.run(func, *args, **kwargs)
+
+        try:
+            return await loop.run_in_executor(self.executor, call)
+        finally:
+            aws_service_call_duration.observe(time.perf_counter() - submitted, getattr(func, "__name__", "unknown"))
+
+    async def iterate(self, iterator: Iterator) -> AsyncIterator:
+        """Advances a blocking iterator on the AWS executor, one item at a time."""
+        while True:
+            item = await self.run(next, iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.service, name)
+        if not callable(attr) or inspect.iscoroutinefunction(attr):
+            return attr
+
+        if inspect.isgeneratorfunction(attr):
+            @functools.wraps(attr)
+            def wrapper(*args, **kwargs):
+                return self.iterate(attr(*args, **kwargs))
+        else:
+            @functools.wraps(attr)
+            async def wrapper(*args, **kwargs):
+                return await self.run(attr, *args, **kwargs)
+
+        return wrapper
+
+
+async_aws_service = AsyncAWSService(aws_service)
+
+def get_async_aws_service() -> AsyncAWSService:
+    """FastAPI dependency for the process-wide AsyncAWSService."""
+    return async_aws_service
@@ -0,0 +1,215 @@
+import bisect
+import time
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.pagination import decode_cursor, encode_cursor
+from src.models.attendance import (
+    AttendanceRecordIn, AttendanceSyncResponse, AttendanceUpdate, AttendanceUpdatesResponse, ExistingRecord,
+    SyncConflict, SyncError, SyncedRecord
+)
+from src.services.aws_service import AWSService
+from src.services.change_feed import CREATED, attendance_change, key_range
+from src.services.partitions import attendance_keys
+from src.services.timesheet_service import TENANT_SCOPE, stale_rollup_keys
+
+# Two records of the same employee closer than this are duplicates (spec §2.1)
+DUPLICATE_WINDOW_MS = 30_000
+# Tolerance for device clock drift when rejecting future timestamps (spec §5.3)
+FUTURE_TOLERANCE_MS = 5 * 60 * 1000
+
+DUPLICATE_MESSAGE = "Ya existe un registro para este empleado en este timestamp"
+
+def build_attendance_item(tenant_id: str, record: AttendanceRecordIn, synced_at: int) -> dict:
+    return {
+        **attendance_keys(tenant_id, record.employee_id, record.device_id, record.timestamp),
+        "timestamp": record.timestamp,
+        "record_id": str(uuid.uuid4()),
+        "tenant_id": tenant_id,
+        "employee_id": record.employee_id,
+        "type": record.type,
+        "confidence": Decimal(str(record.confidence)),
+        "liveness_passed": record.liveness_passed,
+        "device_id": record.device_id,
+        "local_id": record.local_id,
+        "created_at": record.created_at,
+        "synced_at": synced_at,
+        "deleted_at": None,
+        "deleted_by_admin_id": None,
+        "deletion_reason": None,
+        "sync_status": "synced"
+    }
+
+def _duplicate_conflict(record: AttendanceRecordIn, existing: dict) -> SyncConflict:
+    return SyncConflict(
+        local_id=record.local_id,
+        reason="DUPLICATE_TIMESTAMP",
+        message=DUPLICATE_MESSAGE,
+        existing_record=ExistingRecord(
+            server_id=existing["record_id"],
+            timestamp=int(existing["timestamp"]),
+            device_id=existing["device_id"]
+        )
+    )
+
+def sync_attendance_records(
+    aws: AWSService, tenant_id: str, device_id: str, records: List[AttendanceRecordIn]
+) -> AttendanceSyncResponse:
+    """
+    Validates, de-duplicates and stores a batch of attendance records uploaded by
+    the authenticated device `device_id`. Records taken on another device are
+    returned as errors (spec §5.3): a device only uploads its own records.
+
+    Duplicates are detected for the whole batch at once: one range query per
+    employee covers every incoming timestamp (±30 s), and each employee's records
+    are then compared in timestamp order against the stored ones and against the
+    records accepted earlier in the same batch. Records already stored from the
+    same device and local_id are treated as replays and reported as synced again,
+    even once deleted; a deleted record's timestamp stays taken.
+    Accepted records are written with BatchWriteItem.
+    """
+    now_ms = int(time.time() * 1000)
+    outcomes: Dict[int, object] = {}
+
+    by_employee: Dict[str, List[Tuple[int, AttendanceRecordIn]]] = defaultdict(list)
+    for index, record in enumerate(records):
+        if record.device_id != device_id:
+            outcomes[index] = SyncError(
+                local_id=record.local_id,
+                reason="DEVICE_MISMATCH",
+                message="El registro pertenece a otro dispositivo"
+            )
+        elif record.timestamp > now_ms + FUTURE_TOLERANCE_MS:
+            outcomes[index] = SyncError(
+                local_id=record.local_id,
+                reason="INVALID_TIMESTAMP",
+                message="El timestamp no puede estar en el futuro"
+            )
+        else:
+            by_employee[record.employee_id].append((index, record))
+
+    ranges = {
+        employee_id: (
+            min(r.timestamp for _, r in employee_records) - DUPLICATE_WINDOW_MS,
+            max(r.timestamp for _, r in employee_records) + DUPLICATE_WINDOW_MS
+        )
+        for employee_id, employee_records in by_employee.items()
+    }
+    stored_by_employee = aws.get_attendance_records_in_ranges(tenant_id, ranges)
+
+    accepted: Dict[int, dict] = {}
+    replays: Dict[int, dict] = {}
+    for employee_id, employee_records in by_employee.items():
+        stored = sorted(
+            (item for item in stored_by_employee[employee_id] if not item.get("deleted_at")),
+            key=lambda item: item["timestamp"]
+        )
+        stored_timestamps = [int(item["timestamp"]) for item in stored]
+        # Deleted records still count as replays, and still hold their key: storing
+        # another record at their timestamp would overwrite them and their deletion
+        known = {(item["device_id"], int(item["local_id"])): item for item in stored_by_employee[employee_id]}
+        deleted = {int(item["timestamp"]): item for item in stored_by_employee[employee_id] if item.get("deleted_at")}
+        last_accepted = None
+
+        for index, record in sorted(employee_records, key=lambda pair: pair[1].timestamp):
+            previous = known.get((record.device_id, record.local_id))
+            if previous is not None:
+                replays[index] = previous
+                continue
+
+            position = bisect.bisect_left(stored_timestamps, record.timestamp - DUPLICATE_WINDOW_MS)
+            if record.timestamp in deleted:
+                outcomes[index] = _duplicate_conflict(record, deleted[record.timestamp])
+            elif position < len(stored_timestamps) and stored_timestamps[position] <= record.timestamp + DUPLICATE_WINDOW_MS:
+                outcomes[index] = _duplicate_conflict(record, stored[position])
+            elif last_accepted is not None and record.timestamp - last_accepted["timestamp"] <= DUPLICATE_WINDOW_MS:
+                outcomes[index] = _duplicate_conflict(record, last_accepted)
+            else:
+                last_accepted = build_attendance_item(tenant_id, record, now_ms)
+                accepted[index] = last_accepted
+                known[(record.device_id, record.local_id)] = last_accepted
+
+    unprocessed = aws.batch_put_items({settings.DYNAMODB_ATTENDANCE_TABLE: list(accepted.values())})
+    failed_ids = {item["record_id"] for item in unprocessed.get(settings.DYNAMODB_ATTENDANCE_TABLE, [])}
+
+    # Only records that were actually stored are announced to the other devices
+    written = [item for item in accepted.values() if item["record_id"] not in failed_ids]
+    if written:
+        aws.append_changes([attendance_change(item, CREATED, now_ms) for item in written])
+
+    # Late uploads for past days make their materialized timesheet rollups stale
+    stale_rollups = stale_rollup_keys(TENANT_SCOPE, [(tenant_id, record.timestamp) for record in
+                                                     (records[index] for index in accepted)], now_ms)
+    if stale_rollups:
+        aws.delete_timesheet_rollups(stale_rollups)
+
+    for index, item in {**accepted, **replays}.items():
+        if item["record_id"] in failed_ids:
+            outcomes[index] = SyncError(
+                local_id=records[index].local_id,
+                reason="WRITE_FAILED",
+                message="No se pudo guardar el registro, reintente la sincronización"
+            )
+        else:
+            outcomes[index] = SyncedRecord(
+                local_id=records[index].local_id,
+                server_id=item["record_id"],
+                synced_at=int(item["synced_at"])
+            )
+
+    ordered = [outcomes[index] for index in sorted(outcomes)]
+    synced_records = [o for o in ordered if isinstance(o, SyncedRecord)]
+    return AttendanceSyncResponse(
+        success=True,
+        synced_count=len(synced_records),
+        synced_records=synced_records,
+        conflicts=[o for o in ordered if isinstance(o, SyncConflict)],
+        errors=[o for o in ordered if isinstance(o, SyncError)]
+    )
+
+
+def get_attendance_updates(
+    aws: AWSService,
+    tenant_id: str,
+    since: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    now_ms: Optional[int] = None
+) -> AttendanceUpdatesResponse:
+    """
+    Returns the tenant's attendance changes made after `since`, oldest first, with
+    one Query on the change feed.
+
+    Changes are only returned up to CHANGE_FEED_SETTLE_MS ago, so a write that was
+    stamped earlier but is still in flight can't be skipped. That upper bound is the
+    `last_sync_timestamp` to poll from next time, and it never goes below `since`.
+    When a page is full, `next_cursor` continues the same poll (with the same upper
+    bound) and `last_sync_timestamp` should only be stored after the last page.
+
+    Raises ValueError for a malformed cursor or one that belongs to another tenant.
+    """
+    state = decode_cursor(cursor)
+    if state is not None:
+        start_key, until = state.get("key"), state.get("until")
+        if not isinstance(start_key, dict) or start_key.get("tenant_id") != tenant_id or until is None:
+            raise ValueError("Invalid cursor for this tenant")
+        until = int(until)
+    else:
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        start_key, until = None, max(since, now_ms - settings.CHANGE_FEED_SETTLE_MS)
+
+    updates: List[AttendanceUpdate] = []
+    last_key = None
+    if until > since:
+        from_key, to_key = key_range(since, until)
+        items, last_key = aws.get_changes_page(tenant_id, from_key, to_key, limit, start_key)
+        updates = [AttendanceUpdate(**{k: v for k, v in item.items() if k in AttendanceUpdate.model_fields}) for item in items]
+
+    return AttendanceUpdatesResponse(
+        updates=updates,
+        last_sync_timestamp=until,
+        next_cursor=encode_cursor({"key": last_key, "until": until}) if last_key else None
+    )
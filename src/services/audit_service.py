@@ -0,0 +1,128 @@
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from src.core.config import settings
+from src.models.attendance import SyncError
+from src.models.audit import AuditRecordIn, AuditSyncResponse, SyncedAudit
+from src.services.aws_service import AWSService
+
+AUDIT_PARTITION_KEY = "tenant_id#attendance_id"
+# "<timestamp ms, zero-padded>#<audit id>": sorts by time, and two audits of a record never share a key
+AUDIT_SORT_KEY = "timestamp#audit_id"
+_TIMESTAMP_DIGITS = 13
+# Audits written per flush: one BatchWriteItem call
+AUDIT_WRITE_BATCH = 25
+# Namespace of audit ids, derived from the device and its local id so that a replay gets the same one
+AUDIT_ID_NAMESPACE = uuid.UUID("0f7f5b0e-6b8a-4f5e-9a51-3c1d2e8b7a64")
+
+def audit_id(tenant_id: str, device_id: str, local_id: int) -> str:
+    return str(uuid.uuid5(AUDIT_ID_NAMESPACE, f"{tenant_id}#{device_id}#{local_id}"))
+
+def audit_sort_key(timestamp: int, audit_id: str) -> str:
+    return f"{timestamp:0{_TIMESTAMP_DIGITS}d}#{audit_id}"
+
+def build_audit_item(tenant_id: str, device_id: str, record: AuditRecordIn, synced_at: int) -> dict:
+    attendance_id = str(record.attendance_id)
+    server_id = audit_id(tenant_id, device_id, record.local_id)
+    return {
+        AUDIT_PARTITION_KEY: f"{tenant_id}#{attendance_id}",
+        AUDIT_SORT_KEY: audit_sort_key(record.timestamp, server_id),
+        "timestamp": record.timestamp,
+        "audit_id": server_id,
+        "tenant_id": tenant_id,
+        "attendance_id": attendance_id,
+        "action": record.action,
+        "employee_id_detected": record.employee_id_detected,
+        "employee_id_actual": record.employee_id_actual,
+        "performed_by_user_id": record.performed_by_user_id,
+        "reason": record.reason,
+        "metadata": record.metadata,
+        "device_id": device_id,
+        "local_id": record.local_id,
+        "synced_at": synced_at
+    }
+
+class AuditSync:
+    """
+    Stores the audits of one POST /api/audit/sync request as they are parsed.
+
+    add() validates an audit and queues it; once AUDIT_WRITE_BATCH are queued the
+    caller runs flush(), which writes them with BatchWriteItem. Audits are keyed
+    by tenant#attendance_id and timestamp#audit_id, and their id is derived from
+    (device_id, local_id): a replayed audit is written to the same item with the
+    same id, so a device can resend a batch whose response it never received,
+    while audits of other devices or local ids, even of the same record at the
+    same time, are stored side by side.
+    """
+
+    def __init__(self, tenant_id: str, device_id: str):
+        self.tenant_id = tenant_id
+        self.device_id = device_id
+        self.count = 0
+        # Queued items by primary key; BatchWriteItem rejects two writes of one key in a call
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        # Queued audits, as (position in the request, item); their outcome is known once flushed
+        self._queued: List[Tuple[int, dict]] = []
+        self._outcomes: Dict[int, object] = {}
+
+    @property
+    def batch_ready(self) -> bool:
+        return len(self._pending) >= AUDIT_WRITE_BATCH
+
+    def add(self, raw: object):
+        """
+        Queues one audit of the request body. Invalid audits are reported as errors;
+        raises ValueError for one without an integer local_id, which can't be reported.
+        """
+        position = self.count
+        self.count += 1
+        local_id = raw.get("local_id") if isinstance(raw, dict) else None
+        if not isinstance(local_id, int) or isinstance(local_id, bool):
+            raise ValueError(f"Audit {self.count} has no integer local_id")
+        try:
+            record = AuditRecordIn.model_validate(raw)
+        except ValidationError as e:
+            fields = ", ".join(".".join(str(part) for part in error["loc"]) for error in e.errors())
+            self._outcomes[position] = SyncError(
+                local_id=local_id, reason="INVALID_RECORD", message=f"Campos inválidos: {fields}"
+            )
+            return
+
+        item = build_audit_item(self.tenant_id, self.device_id, record, int(time.time() * 1000))
+        # The same audit twice in a batch is written once
+        queued = self._pending.setdefault((item[AUDIT_PARTITION_KEY], item[AUDIT_SORT_KEY]), item)
+        self._queued.append((position, queued))
+
+    def flush(self, aws: AWSService):
+        """Writes the queued audits. Those DynamoDB leaves unprocessed are reported as errors."""
+        if not self._pending:
+            return
+        unprocessed = aws.batch_put_items({settings.DYNAMODB_AUDIT_LOGS_TABLE: list(self._pending.values())})
+        failed_ids = {item["audit_id"] for item in unprocessed.get(settings.DYNAMODB_AUDIT_LOGS_TABLE, [])}
+        for position, item in self._queued:
+            if item["audit_id"] in failed_ids:
+                self._outcomes[position] = SyncError(
+                    local_id=item["local_id"],
+                    reason="WRITE_FAILED",
+                    message="No se pudo guardar la auditoría, reintente la sincronización"
+                )
+            else:
+                self._outcomes[position] = SyncedAudit(
+                    local_id=item["local_id"], server_id=item["audit_id"], synced_at=item["synced_at"]
+                )
+        # Only the outcomes are kept, not the audits and their metadata
+        self._pending, self._queued = {}, []
+
+    def response(self) -> AuditSyncResponse:
+        """The outcome of every audit, in request order; call after the last flush()."""
+        ordered = [self._outcomes[position] for position in sorted(self._outcomes)]
+        synced = [o for o in ordered if isinstance(o, SyncedAudit)]
+        return AuditSyncResponse(
+            success=True,
+            synced_count=len(synced),
+            synced_audits=synced,
+            errors=[o for o in ordered if isinstance(o, SyncError)]
+        )
@@ -0,0 +1,71 @@
+import time
+
+from src.core.metrics import (
+    aws_request_duration, aws_request_retries, aws_requests, current_route, dynamodb_consumed_capacity
+)
+
+# DynamoDB operations that accept ReturnConsumedCapacity, and whether they consume read or write capacity
+CONSUMED_CAPACITY_OPERATIONS = {
+    "GetItem": "read", "BatchGetItem": "read", "Query": "read", "Scan": "read", "TransactGetItems": "read",
+    "PutItem": "write", "UpdateItem": "write", "DeleteItem": "write", "BatchWriteItem": "write",
+    "TransactWriteItems": "write",
+}
+
+_STARTED = "metrics_started_at"
+
+
+def instrument_client(client, consumed_capacity: bool = True):
+    """
+    Registers botocore event hooks on a client that record, for every API call,
+    its latency (retries included), outcome and retry count. For DynamoDB, table
+    operations also request ReturnConsumedCapacity=TOTAL, and the units consumed
+    are recorded per table, operation and the route being served.
+    """
+    service = client.meta.service_model.service_id.hyphenize()
+    events = client.meta.events
+
+    def request_consumed_capacity(params, model, **kwargs):
+        if model.name in CONSUMED_CAPACITY_OPERATIONS:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+    def start_timer(model, context, **kwargs):
+        context[_STARTED] = (model.name, time.perf_counter())
+
+    def finish_timer(context) -> str:
+        operation, started = context.pop(_STARTED)
+        aws_request_duration.observe(time.perf_counter() - started, service, operation)
+        return operation
+
+    def record_response(http_response, parsed, context, **kwargs):
+        operation = finish_timer(context)
+        # Error responses (throttling, failed conditions, ...) are labelled with their error code
+        outcome = (parsed.get("Error", {}).get("Code") or "error") if http_response.status_code >= 300 else "ok"
+        aws_requests.inc(service, operation, outcome)
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        if retries:
+            aws_request_retries.inc(service, operation, amount=retries)
+        if service == "dynamodb":
+            record_consumed_capacity(operation, parsed.get("ConsumedCapacity"))
+
+    def record_connection_error(exception, context, **kwargs):
+        # Raised after botocore gave up retrying, e.g. on connect or read timeouts
+        aws_requests.inc(service, finish_timer(context), type(exception).__name__)
+
+    if service == "dynamodb" and consumed_capacity:
+        events.register(f"before-parameter-build.{service}", request_consumed_capacity)
+    events.register(f"before-call.{service}", start_timer)
+    events.register(f"after-call.{service}", record_response)
+    events.register(f"after-call-error.{service}", record_connection_error)
+    return client
+
+
+def record_consumed_capacity(operation: str, consumed):
+    if not consumed:
+        return
+    capacity = CONSUMED_CAPACITY_OPERATIONS.get(operation, "write")
+    route = current_route()
+    # Single-table operations return one entry, batch and transaction operations a list
+    for entry in consumed if isinstance(consumed, list) else [consumed]:
+        units = entry.get("CapacityUnits")
+        if units:
+            dynamodb_consumed_capacity.inc(entry.get("TableName", "unknown"), operation, route, capacity, amount=float(units))
@@ -0,0 +1,302 @@
+"""
+Client-side protection of DynamoDB tables and the S3 bucket from throttling.
+
+Every table (and the bucket) gets a ResilienceGuard that wraps its calls with:
+- adaptive rate limiting: after a throttle, calls are paced at the rate the
+  table was taking times AWS_ADAPTIVE_RATE_BACKOFF, raised again while calls
+  succeed (additive increase, multiplicative decrease), until back at the rate
+  that was throttled;
+- budgeted retries: throttled calls are retried with full-jitter exponential
+  backoff, each retry spending a token from the table's retry budget, so retries
+  can't multiply the load on a table that is already saturated;
+- a circuit breaker: after AWS_CIRCUIT_FAILURE_THRESHOLD calls in a row are still
+  throttled once retried, calls fail fast for AWS_CIRCUIT_OPEN_SECONDS, then a
+  single probe call decides whether to close it again.
+
+Saturation surfaces as StorageBusyError, which the API answers with 503 and
+Retry-After. botocore's own retries (AWS_MAX_ATTEMPTS) still apply within each
+attempt made here.
+"""
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from botocore.exceptions import ClientError
+
+from src.core.config import settings
+from src.core.metrics import (
+    aws_circuit_state, aws_client_send_rate, aws_client_throttle_wait, aws_requests_rejected,
+    aws_throttle_retries, aws_throttled_requests
+)
+from src.services.storage import StorageBusyError
+
+# Error codes DynamoDB and S3 answer when a table, partition or bucket prefix is over its capacity
+THROTTLING_ERROR_CODES = {
+    "ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded",
+    "Throttling", "ThrottledException", "RequestThrottled", "SlowDown", "TooManyRequestsException",
+}
+
+# Throttles arriving together from concurrent calls cut the rate once
+RATE_CUT_INTERVAL_SECONDS = 0.1
+# Retry tokens saved up while calls succeed
+RETRY_BUDGET_MAX_TOKENS = 100
+
+CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+
+def is_throttling(e: BaseException) -> bool:
+    return isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1 for the first retry)."""
+    cap = min(settings.AWS_THROTTLE_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), settings.AWS_THROTTLE_BACKOFF_MAX_SECONDS)
+    return random.uniform(0, cap)
+
+
+class AdaptiveRateLimiter:
+    """
+    Paces calls once a resource has throttled them. Unlimited until the first
+    throttle; then each throttle cuts the rate by `backoff` and each success
+    raises it by `increase_per_second` per second elapsed, until it is back at
+    the rate that was throttled and pacing stops.
+    """
+
+    def __init__(self, backoff: float, increase_per_second: float, min_rate: float):
+        self.backoff = backoff
+        self.increase_per_second = increase_per_second
+        self.min_rate = min_rate
+        self.rate: Optional[float] = None
+        self._ceiling = 0.0
+        self._next_send = 0.0
+        self._adjusted_at = 0.0
+        self._cut_at = float("-inf")
+        # Calls sent in the current one-second window, and the rate measured over the last one
+        self._window_start = time.monotonic()
+        self._window_sends = 0
+        self._measured_rate = 0.0
+        self._lock = threading.Lock()
+
+    def _count_send(self, now: float):
+        self._window_sends += 1
+        elapsed = now - self._window_start
+        if elapsed >= 1:
+            self._measured_rate = self._window_sends / elapsed
+            self._window_start, self._window_sends = now, 0
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Reserves a send slot and returns how long to wait for it, or None if that is longer than max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.rate is not None:
+                send_at = max(now, self._next_send)
+                wait = send_at - now
+                if wait > max_wait:
+                    return None
+                self._next_send = send_at + 1 / self.rate
+            self._count_send(now)
+            return wait
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._cut_at < RATE_CUT_INTERVAL_SECONDS:
+                return
+            if self.rate is None:
+                # Throttled while unlimited: start from the rate the table was taking
+                current = max(self._measured_rate, self._window_sends / max(now - self._window_start, 1.0))
+                # Leave room to recover even when throttled at a rate below min_rate
+                self._ceiling = max(current, self.min_rate / self.backoff)
+            else:
+                current = self.rate
+            self.rate = max(self.min_rate, current * self.backoff)
+            self._cut_at = self._adjusted_at = now
+
+    def on_success(self):
+        if self.rate is None:
+            return
+        with self._lock:
+            if self.rate is None:
+                return
+            now = time.monotonic()
+            self.rate += self.increase_per_second * (now - self._adjusted_at)
+            self._adjusted_at = now
+            if self.rate >= self._ceiling:
+                self.rate = None
+
+
+class RetryBudget:
+    """
+    Token bucket of retries: each successful call saves `ratio` tokens, and
+    `min_per_second` tokens are added over time so a quiet resource can still
+    retry. A retry spends one token.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self._tokens = min(float(RETRY_BUDGET_MAX_TOKENS), min_per_second)
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(RETRY_BUDGET_MAX_TOKENS, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(RETRY_BUDGET_MAX_TOKENS, self._tokens + self.min_per_second * (now - self._refilled_at))
+            self._refilled_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` saturated calls in a row and rejects calls
+    for `open_seconds`. It then lets a single probe call through (half-open):
+    the circuit closes if it succeeds and opens again if it is saturated too.
+    """
+
+    def __init__(self, failure_threshold: int, open_seconds: float, on_state_change: Callable[[int], None]):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: int):
+        if state != self.state:
+            self.state = state
+            self.on_state_change(state)
+
+    def allow(self) -> Optional[float]:
+        """Returns None if a call may be made, or else the seconds until the circuit lets calls through again."""
+        if self.state == CLOSED:
+            return None
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return self.open_seconds
+                self._probing = True
+            return None
+
+    def on_success(self):
+        self._failures = 0
+        if self.state != CLOSED:
+            with self._lock:
+                self._probing = False
+                self._set_state(CLOSED)
+
+    def on_saturated(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self._set_state(OPEN)
+
+    def on_error(self):
+        # The call failed for another reason; the probe slot is freed without deciding anything
+        if self.state == HALF_OPEN:
+            with self._lock:
+                self._probing = False
+
+
+class ResilienceGuard:
+    """Adaptive rate limiting, budgeted retries and a circuit breaker for the calls to one table or bucket."""
+
+    def __init__(self, resource: str):
+        self.resource = resource
+        self.enabled = settings.AWS_RESILIENCE_ENABLED
+        self.limiter = AdaptiveRateLimiter(
+            settings.AWS_ADAPTIVE_RATE_BACKOFF, settings.AWS_ADAPTIVE_RATE_INCREASE_PER_SECOND, settings.AWS_ADAPTIVE_RATE_MIN
+        )
+        self.budget = RetryBudget(settings.AWS_RETRY_BUDGET_RATIO, settings.AWS_RETRY_BUDGET_MIN_PER_SECOND)
+        self.breaker = CircuitBreaker(
+            settings.AWS_CIRCUIT_FAILURE_THRESHOLD, settings.AWS_CIRCUIT_OPEN_SECONDS,
+            lambda state: aws_circuit_state.set(state, resource)
+        )
+
+    def _reject(self, reason: str, retry_after: float) -> StorageBusyError:
+        aws_requests_rejected.inc(self.resource, reason)
+        return StorageBusyError(self.resource, retry_after)
+
+    def _update_rate_metric(self):
+        aws_client_send_rate.set(self.limiter.rate or 0, self.resource)
+
+    def on_throttle(self):
+        """Records a throttle reported outside of a call's error, such as unprocessed batch items."""
+        aws_throttled_requests.inc(self.resource)
+        if self.enabled:
+            self.limiter.on_throttle()
+            self._update_rate_metric()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Calls func(*args, **kwargs), paced and retried as described above. Raises
+        StorageBusyError when the circuit is open, when the call would wait too
+        long for a send slot, or when it is still throttled after its retries.
+        Other errors are raised unchanged.
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        retry_after = self.breaker.allow()
+        if retry_after is not None:
+            raise self._reject("circuit_open", retry_after)
+
+        attempt = 1
+        while True:
+            wait = self.limiter.reserve(settings.AWS_ADAPTIVE_MAX_WAIT_SECONDS)
+            if wait is None:
+                self.breaker.on_error()
+                raise self._reject("rate_limited", settings.AWS_ADAPTIVE_MAX_WAIT_SECONDS)
+            if wait:
+                aws_client_throttle_wait.observe(wait, self.resource)
+                time.sleep(wait)
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_throttling(e):
+                    # The resource answered (a failed condition, a missing key, ...); it is not saturated
+                    if isinstance(e, ClientError):
+                        self.breaker.on_success()
+                    else:
+                        self.breaker.on_error()
+                    raise
+                self.on_throttle()
+                if attempt >= settings.AWS_THROTTLE_MAX_ATTEMPTS:
+                    outcome = "attempts_exhausted"
+                elif not self.budget.withdraw():
+                    outcome = "budget_exhausted"
+                else:
+                    aws_throttle_retries.inc(self.resource, "retried")
+                    time.sleep(backoff_delay(attempt))
+                    attempt += 1
+                    continue
+                aws_throttle_retries.inc(self.resource, outcome)
+                self.breaker.on_saturated()
+                raise StorageBusyError(self.resource, self.breaker.open_seconds if self.breaker.state == OPEN else 1) from e
+
+            self.budget.deposit()
+            self.breaker.on_success()
+            if self.limiter.rate is not None:
+                self.limiter.on_success()
+                self._update_rate_metric()
+            return result
@@ -1,184 +1,876 @@
-import boto3
+import asyncio
+import contextvars
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from fastapi import UploadFile
-from typing import List
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import logging
 
+from src.core.cache import TTLCache
 from src.core.config import settings
+from src.core.lazy import locked_cached_property
+from src.core.shared_state import shared
+from src.services.background_jobs import JobQueue
+from src.services.change_feed import (
+    CREATED, DELETED, ROSTER_FIELDS, UPDATED, attendance_change, restamp, roster_change, time_log_change, worker_tenant
+)
+from src.services.partitions import ATTENDANCE_PARTITION_KEY, month_shards, sharded_key, time_log_index_attributes
+from src.services.storage import (
+    ActivationCodeUnavailableError, DeviceAlreadyRegisteredError, Storage, Table, create_storage
+)
+from src.services.worker_process import runs_periodic_jobs
+from src.services.write_behind import WriteBehindBuffer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# GSI1 and GSI2 of spec §8.3, with month-sharded partition keys: tenant or device (PK) + timestamp (SK)
+ATTENDANCE_TENANT_INDEX = "tenant_month-timestamp-index"
+ATTENDANCE_DEVICE_INDEX = "device_month-timestamp-index"
+# The same access patterns for time logs, sorted by their epoch-ms timestamp
+TIME_LOG_WORKER_INDEX = "worker_month-timestamp_ms-index"
+TIME_LOG_TENANT_INDEX = "tenant_month-timestamp_ms-index"
+
+# Background jobs (see background_jobs)
+DELETE_WORKER_IMAGES_JOB = "delete_worker_images"
+DELETE_S3_KEYS_JOB = "delete_s3_keys"
+SWEEP_ORPHANED_IMAGES_JOB = "sweep_orphaned_images"
+
+# Roster table item, under each tenant, holding the tenant's latest roster version
+ROSTER_HEAD_VERSION = 0
+
+def timestamp_entry_id(table_name: str, item: dict) -> str:
+    # Write-behind entries are keyed by time log id, which change feed entries carry as server_id
+    return item['server_id'] if table_name == settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE else item['id']
+
+def stamp_timestamp_write(table_name: str, item: dict) -> dict:
+    # A buffered time log's change is dated when it is written: a retry or a replay can land
+    # after the settle window, past the cursor of devices that already polled that far
+    return restamp(item) if table_name == settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE else item
+
 class AWSService:
-    def __init__(self):
-        self.s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
+    """
+    Data access for workers, time logs, devices, attendance and their images,
+    over the storage engine STORAGE_BACKEND selects (DynamoDB and S3 by default,
+    see storage).
+
+    The engine, executors and caches are built on first use rather than in
+    __init__, so importing the app does not load boto3 or read settings;
+    warm_up() builds them ahead of the first request.
+    """
+
+    @locked_cached_property
+    def storage(self) -> Storage:
+        return create_storage(settings.STORAGE_BACKEND)
+
+    @locked_cached_property
+    def upload_executor(self):
+        return ThreadPoolExecutor(
+            max_workers=settings.S3_UPLOAD_CONCURRENCY,
+            thread_name_prefix="s3-upload"
         )
-        self.dynamodb = boto3.resource(
-            "dynamodb",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
+
+    @locked_cached_property
+    def workers_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_WORKERS_TABLE)
+
+    @locked_cached_property
+    def timestamps_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_TIMESTAMPS_TABLE)
+
+    @locked_cached_property
+    def devices_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_DEVICES_TABLE)
+
+    @locked_cached_property
+    def activation_codes_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_ACTIVATION_CODES_TABLE)
+
+    @locked_cached_property
+    def attendance_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_ATTENDANCE_TABLE)
+
+    @locked_cached_property
+    def timesheet_rollups_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_TIMESHEET_ROLLUPS_TABLE)
+
+    @locked_cached_property
+    def attendance_changes_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE)
+
+    @locked_cached_property
+    def roster_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_ROSTER_TABLE)
+
+    @locked_cached_property
+    def audit_logs_table(self) -> Table:
+        return self.storage.table(settings.DYNAMODB_AUDIT_LOGS_TABLE)
+
+    @locked_cached_property
+    def query_executor(self):
+        return ThreadPoolExecutor(
+            max_workers=settings.DYNAMODB_QUERY_CONCURRENCY,
+            thread_name_prefix="dynamodb-query"
         )
-        self.workers_table = self.dynamodb.Table(settings.DYNAMODB_WORKERS_TABLE)
-        self.timestamps_table = self.dynamodb.Table(settings.DYNAMODB_TIMESTAMPS_TABLE)
-        self.devices_table = self.dynamodb.Table(settings.DYNAMODB_DEVICES_TABLE)
-        self.activation_codes_table = self.dynamodb.Table(settings.DYNAMODB_ACTIVATION_CODES_TABLE)
+
+    @locked_cached_property
+    def worker_cache(self):
+        return TTLCache(
+            "workers", settings.CACHE_MAX_ENTRIES, settings.CACHE_WORKER_TTL_SECONDS, settings.CACHE_NEGATIVE_TTL_SECONDS,
+            invalidations=shared.cache_invalidations
+        )
+
+    @locked_cached_property
+    def device_cache(self):
+        return TTLCache(
+            "devices", settings.CACHE_MAX_ENTRIES, settings.CACHE_DEVICE_TTL_SECONDS, settings.CACHE_NEGATIVE_TTL_SECONDS,
+            invalidations=shared.cache_invalidations
+        )
+
+    @locked_cached_property
+    def activation_code_cache(self):
+        return TTLCache(
+            "activation_codes", settings.CACHE_MAX_ENTRIES, settings.CACHE_ACTIVATION_CODE_TTL_SECONDS, settings.CACHE_NEGATIVE_TTL_SECONDS,
+            invalidations=shared.cache_invalidations
+        )
+
+    @locked_cached_property
+    def roster_version_cache(self):
+        return TTLCache(
+            "roster_versions", settings.CACHE_MAX_ENTRIES, settings.CACHE_ROSTER_VERSION_TTL_SECONDS,
+            invalidations=shared.cache_invalidations
+        )
+
+    @locked_cached_property
+    def roster_cache(self):
+        # Encoded snapshots and deltas, keyed by (tenant, version, since); a new version never hits an old entry
+        return TTLCache("rosters", settings.CACHE_ROSTER_MAX_ENTRIES, settings.CACHE_ROSTER_TTL_SECONDS)
+
+    @locked_cached_property
+    def timestamp_buffer(self):
+        buffer = WriteBehindBuffer(
+            self.batch_put_items,
+            timestamp_entry_id,
+            settings.WRITE_BEHIND_JOURNAL_PATH,
+            max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+            max_delay_ms=settings.WRITE_BEHIND_MAX_DELAY_MS,
+            max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+            stamp=stamp_timestamp_write
+        )
+        buffer.start()
+        return buffer
+
+    def start_write_behind(self):
+        """Starts the time log write-behind buffer, replaying events journaled before a crash or restart."""
+        self.timestamp_buffer
+
+    def stop_write_behind(self):
+        """Writes the buffered time logs and stops the buffer, if it was started."""
+        buffer = self.__dict__.pop('timestamp_buffer', None)
+        if buffer is not None:
+            buffer.stop()
+
+    @locked_cached_property
+    def background_jobs(self):
+        jobs = JobQueue(
+            {
+                DELETE_WORKER_IMAGES_JOB: lambda payload: self.delete_worker_images(payload['worker_id']),
+                DELETE_S3_KEYS_JOB: lambda payload: self.delete_s3_objects(payload['keys']),
+                SWEEP_ORPHANED_IMAGES_JOB: lambda payload: self.sweep_orphaned_images(),
+            },
+            settings.BACKGROUND_JOBS_JOURNAL_PATH,
+            max_attempts=settings.BACKGROUND_JOB_MAX_ATTEMPTS,
+            # One sweep per server: every worker would otherwise list the whole bucket
+            schedules=(
+                {SWEEP_ORPHANED_IMAGES_JOB: settings.S3_ORPHAN_SWEEP_INTERVAL_SECONDS} if runs_periodic_jobs() else None
+            )
+        )
+        jobs.start()
+        return jobs
+
+    def start_background_jobs(self):
+        """Starts the background job thread, resuming the jobs journaled before a crash or restart."""
+        self.background_jobs
+
+    def stop_background_jobs(self):
+        """Stops the background job thread, if it was started; queued jobs run on the next start."""
+        jobs = self.__dict__.pop('background_jobs', None)
+        if jobs is not None:
+            jobs.stop()
+
+    def submit_background_job(self, kind: str, payload: dict) -> str:
+        """Durably queues a job to run off the request path. Returns once it is journaled."""
+        return self.background_jobs.submit(kind, payload)
+
+    def warm_up(self):
+        """Builds the storage engine's clients, every table and every cache now instead of on first use. Makes no AWS calls."""
+        self.storage.warm_up()
+        for name in (
+            "workers_table", "timestamps_table", "devices_table", "activation_codes_table",
+            "attendance_table", "timesheet_rollups_table", "attendance_changes_table", "roster_table", "audit_logs_table",
+            "worker_cache", "device_cache", "activation_code_cache", "roster_version_cache", "roster_cache"
+        ):
+            getattr(self, name)
+
+    def cache_stats(self) -> dict:
+        return {
+            cache.name: cache.stats()
+            for cache in (
+                self.worker_cache, self.device_cache, self.activation_code_cache, self.roster_version_cache, self.roster_cache
+            )
+        }
 
     def get_activation_code(self, code: str):
+        return self.activation_code_cache.get_or_load(code, lambda: self._get_activation_code(code))
+
+    def _get_activation_code(self, code: str):
         try:
-            response = self.activation_codes_table.get_item(Key={'code': code})
-            return response.get("Item")
+            return self.activation_codes_table.get({'code': code})
         except ClientError as e:
             logger.error(f"Failed to get activation code {code}: {e}")
             raise
 
     def save_device_registration(self, device_data: dict):
         try:
-            self.devices_table.put_item(Item=device_data)
+            self.devices_table.put(device_data)
         except ClientError as e:
-            logger.error(f"Failed to save device data to DynamoDB: {e}")
+            logger.error(f"Failed to save device data: {e}")
             raise
+        finally:
+            self.device_cache.invalidate(device_data['device_id'])
 
     def get_device_by_id(self, device_id: str):
+        return self.device_cache.get_or_load(device_id, lambda: self._get_device_by_id(device_id))
+
+    def _get_device_by_id(self, device_id: str):
         try:
-            response = self.devices_table.get_item(Key={'device_id': device_id})
-            return response.get("Item")
+            return self.devices_table.get({'device_id': device_id})
         except ClientError as e:
             logger.error(f"Failed to get device {device_id}: {e}")
             raise
 
-    def upload_images_to_s3(self, worker_id: str, images: List[UploadFile]) -> List[str]:
-        image_urls = []
-        for i, image in enumerate(images):
-            file_key = f"{worker_id}/face_{i+1}.jpg"
+    def deactivate_device(self, device_id: str, reason: Optional[str], deactivated_at: int):
+        """
+        Marks a device inactive, so its token is refused. Takes effect at once in this
+        process and within CACHE_DEVICE_TTL_SECONDS in the others. Returns the updated
+        device, or None if it does not exist.
+        """
+        try:
+            return self.devices_table.update(
+                {'device_id': device_id},
+                {'is_active': False, 'deactivated_at': deactivated_at, 'deactivation_reason': reason}
+            )
+        except ClientError as e:
+            logger.error(f"Failed to deactivate device {device_id}: {e}")
+            raise
+        finally:
+            self.device_cache.invalidate(device_id)
+
+    def register_device(self, device_data: dict, activation_code: str, registered_at: int):
+        """
+        Claims the activation code and inserts the device atomically, so two devices
+        can never register with the same code (one TransactWriteItems call on DynamoDB).
+
+        A deactivated device registers again this way, with a new code and token.
+        Raises ActivationCodeUnavailableError if the code is missing, not pending or
+        expired, and DeviceAlreadyRegisteredError if the device_id exists and is active.
+        """
+        try:
+            self.storage.register_device(device_data, activation_code, registered_at)
+        except ClientError as e:
+            logger.error(f"Failed to register device {device_data['device_id']}: {e}")
+            raise
+        finally:
+            self.activation_code_cache.invalidate(activation_code)
+            self.device_cache.invalidate(device_data['device_id'])
+
+    def get_s3_url(self, file_key: str) -> str:
+        return self.storage.blobs.url(file_key)
+
+    def upload_image_to_s3(self, file_key: str, image: UploadFile) -> str:
+        try:
+            self.storage.blobs.upload_fileobj(file_key, image.file, image.content_type)
+            return self.get_s3_url(file_key)
+        except ClientError as e:
+            logger.error(f"Failed to upload {file_key} to S3: {e}")
+            raise
+
+    def create_presigned_image_upload(self, file_key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+        """
+        Presigned POST policy (url and form fields) that lets a client upload one
+        image of at most max_bytes and the given content type straight to S3.
+        Signing is local; no request is made. Raises NotImplementedError on
+        engines other than S3.
+        """
+        return self.storage.blobs.presigned_post(file_key, content_type, max_bytes, expires_in)
+
+    def head_s3_object(self, file_key: str) -> Optional[dict]:
+        """Returns an object's metadata, or None if it does not exist."""
+        try:
+            return self.storage.blobs.head(file_key)
+        except ClientError as e:
+            logger.error(f"Failed to read metadata of {file_key} from S3: {e}")
+            raise
+
+    def head_s3_objects(self, file_keys: List[str]) -> Dict[str, Optional[dict]]:
+        """Runs head_s3_object for every key in parallel on the upload executor."""
+        return self._run_per_key(self.head_s3_object, file_keys)
+
+    def get_s3_object(self, file_key: str) -> bytes:
+        try:
+            return self.storage.blobs.get(file_key)
+        except ClientError as e:
+            logger.error(f"Failed to download {file_key} from S3: {e}")
+            raise
+
+    def get_s3_objects(self, file_keys: List[str]) -> Dict[str, bytes]:
+        """Downloads every key in parallel on the upload executor."""
+        return self._run_per_key(self.get_s3_object, file_keys)
+
+    def put_s3_object(self, file_key: str, body: bytes, content_type: str) -> str:
+        try:
+            self.storage.blobs.put(file_key, body, content_type)
+            return self.get_s3_url(file_key)
+        except ClientError as e:
+            logger.error(f"Failed to upload {file_key} to S3: {e}")
+            raise
+
+    def put_s3_objects(self, objects: Dict[str, Tuple[bytes, str]]) -> List[str]:
+        """
+        Uploads (body, content type) pairs by key in parallel on the upload executor
+        and returns their URLs. If any upload fails, the ones that succeeded are
+        deleted before the first error is re-raised.
+        """
+        futures = {
+            file_key: self.upload_executor.submit(contextvars.copy_context().run, self.put_s3_object, file_key, body, content_type)
+            for file_key, (body, content_type) in objects.items()
+        }
+        results = {}
+        for file_key, future in futures.items():
             try:
-                self.s3_client.upload_fileobj(
-                    image.file,
-                    settings.S3_BUCKET_NAME,
-                    file_key,
-                    ExtraArgs={'ContentType': image.content_type}
-                )
-                image_url = f"https://{settings.S3_BUCKET_NAME}.s3.amazonaws.com/{file_key}"
-                image_urls.append(image_url)
-            except ClientError as e:
-                logger.error(f"Failed to upload {file_key} to S3: {e}")
-                raise
-        return image_urls
+                results[file_key] = future.result()
+            except Exception as e:
+                results[file_key] = e
+
+        errors = [result for result in results.values() if isinstance(result, BaseException)]
+        if errors:
+            uploaded_keys = [file_key for file_key, result in results.items() if not isinstance(result, BaseException)]
+            self._roll_back_uploads(uploaded_keys)
+            raise errors[0]
+        return list(results.values())
+
+    def _run_per_key(self, func: Callable, file_keys: List[str]) -> dict:
+        futures = {
+            file_key: self.upload_executor.submit(contextvars.copy_context().run, func, file_key)
+            for file_key in file_keys
+        }
+        return {file_key: future.result() for file_key, future in futures.items()}
+
+    def delete_s3_objects(self, file_keys: List[str]):
+        """Deletes keys (with one DeleteObjects call per 1000 on S3). Raises if any key wasn't deleted."""
+        self.storage.blobs.delete_many(file_keys)
+
+    def iter_s3_key_pages(self, prefix: str) -> Iterator[List[dict]]:
+        """Yields the objects under prefix ({"Key", "LastModified", ...}), up to 1000 per page."""
+        try:
+            yield from self.storage.blobs.iter_key_pages(prefix)
+        except ClientError as e:
+            logger.error(f"Failed to list objects under {prefix} in S3: {e}")
+            raise
+
+    def iter_s3_prefixes(self) -> Iterator[str]:
+        """Yields the top-level "folders" of the bucket: one "<worker_id>/" per worker."""
+        try:
+            yield from self.storage.blobs.iter_prefixes()
+        except ClientError as e:
+            logger.error(f"Failed to list prefixes in S3: {e}")
+            raise
+
+    def delete_s3_prefix(self, prefix: str) -> int:
+        """Deletes every object under prefix, a listed page (up to 1000 keys) per DeleteObjects call."""
+        deleted = 0
+        for objects in self.iter_s3_key_pages(prefix):
+            self.delete_s3_objects([obj['Key'] for obj in objects])
+            deleted += len(objects)
+        return deleted
+
+    def delete_worker_images(self, worker_id: str) -> int:
+        """
+        Deletes the "<worker_id>/" prefix, unless the worker exists: a registration
+        retried after the cleanup was queued keeps its images.
+        """
+        if self._get_worker_by_id(worker_id):
+            logger.info(f"Worker {worker_id} exists, keeping its images")
+            return 0
+        deleted = self.delete_s3_prefix(f"{worker_id}/")
+        logger.info(f"Deleted {deleted} images of worker {worker_id}")
+        return deleted
+
+    def sweep_orphaned_images(self) -> List[str]:
+        """
+        Deletes the images of workers that don't exist, such as abandoned enrollments.
+        Prefixes with an object newer than S3_ORPHAN_MIN_AGE_HOURS are kept, since
+        their enrollment may still be in progress. Returns the swept worker ids.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.S3_ORPHAN_MIN_AGE_HOURS)
+        swept = []
+        for prefix in self.iter_s3_prefixes():
+            worker_id = prefix.rstrip('/')
+            if self._get_worker_by_id(worker_id):
+                continue
+            objects = [obj for page in self.iter_s3_key_pages(prefix) for obj in page]
+            if any(obj['LastModified'] > cutoff for obj in objects):
+                continue
+            self.delete_s3_objects([obj['Key'] for obj in objects])
+            swept.append(worker_id)
+        if swept:
+            logger.info(f"Swept the orphaned images of {len(swept)} workers")
+        return swept
+
+    def _roll_back_uploads(self, file_keys: List[str]):
+        """Deletes keys uploaded before a failure; if that fails too, queues their deletion."""
+        try:
+            self.delete_s3_objects(file_keys)
+        except Exception:
+            logger.error(f"Rollback failed, queueing the deletion of {file_keys}")
+            self.submit_background_job(DELETE_S3_KEYS_JOB, {'keys': file_keys})
+
+    def upload_images_to_s3(self, worker_id: str, images: List[UploadFile]) -> List[str]:
+        return [
+            self.upload_image_to_s3(f"{worker_id}/face_{i+1}.jpg", image)
+            for i, image in enumerate(images)
+        ]
+
+    async def upload_images_to_s3_concurrently(self, worker_id: str, images: List[UploadFile]) -> List[str]:
+        """
+        Uploads all images in parallel on the upload executor, so the event loop
+        is never blocked. If any upload fails, the ones that succeeded are deleted
+        before the first error is re-raised.
+        """
+        loop = asyncio.get_running_loop()
+        file_keys = [f"{worker_id}/face_{i+1}.jpg" for i in range(len(images))]
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(self.upload_executor, self.upload_image_to_s3, file_key, image)
+                for file_key, image in zip(file_keys, images)
+            ),
+            return_exceptions=True
+        )
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            uploaded_keys = [
+                file_key for file_key, result in zip(file_keys, results)
+                if not isinstance(result, BaseException)
+            ]
+            await loop.run_in_executor(self.upload_executor, self._roll_back_uploads, uploaded_keys)
+            raise errors[0]
+
+        return results
 
     def save_worker_data(self, worker_data: dict):
         try:
-            self.workers_table.put_item(Item=worker_data)
+            self.workers_table.put(worker_data)
         except ClientError as e:
-            logger.error(f"Failed to save worker data to DynamoDB: {e}")
+            logger.error(f"Failed to save worker data: {e}")
             raise
+        finally:
+            self.worker_cache.invalidate(worker_data['id'])
+        self.record_roster_change(worker_data, UPDATED)
+
+    def timestamp_writes(self, timestamp_data: dict) -> Dict[str, List[dict]]:
+        """The items that store a new time log: the log, with the attributes that index it, and its CREATED change."""
+        return {
+            settings.DYNAMODB_TIMESTAMPS_TABLE: [{**timestamp_data, **time_log_index_attributes(timestamp_data)}],
+            settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE: [time_log_change(timestamp_data, CREATED)]
+        }
 
     def save_timestamp_data(self, timestamp_data: dict):
+        """Saves a time log and appends its CREATED entry to the change feed in one BatchWriteItem call."""
+        unprocessed = self.batch_put_items(self.timestamp_writes(timestamp_data))
+        if unprocessed:
+            raise RuntimeError(f"Failed to save timestamp {timestamp_data['id']}: write was throttled")
+
+    def enqueue_timestamp_data(self, timestamp_data: dict):
+        """
+        Journals a time log for the write-behind buffer, which writes it with others
+        in a later BatchWriteItem call. Raises WriteBehindFullError when the buffer is full.
+        """
+        self.timestamp_buffer.submit(timestamp_data['id'], self.timestamp_writes(timestamp_data))
+
+    def iter_pages(self, read_page: Callable, start_key: Optional[dict] = None) -> Iterator[List[dict]]:
+        """
+        Yields the pages of a table scan or query, given as read_page(start_key) ->
+        (items, key of the next page), e.g. functools.partial(table.query_page, partition).
+        """
+        while True:
+            items, start_key = read_page(start_key=start_key)
+            yield items
+            if not start_key:
+                return
+
+    def query_shards(self, table: Table, shards: List[Tuple[str, int, int]], index_name: Optional[str] = None,
+                     projection: Optional[List[str]] = None) -> List[List[dict]]:
+        """
+        Reads, for each (partition, start_ms, end_ms) shard, the items whose sort key
+        is in range, in sort key order. Shards are queried in parallel on the query
+        executor and their results are returned in the order of `shards`.
+        """
+        def read(partition: str, start_ms: int, end_ms: int) -> List[dict]:
+            pages = self.iter_pages(partial(table.query_page, partition, start_ms, end_ms, index_name, projection=projection))
+            return [item for page in pages for item in page]
+
+        if len(shards) == 1:
+            return [read(*shards[0])]
+        # Each query runs in a copy of the caller's context, so its metrics are attributed to the caller's route
+        futures = [self.query_executor.submit(contextvars.copy_context().run, read, *shard) for shard in shards]
+        return [future.result() for future in futures]
+
+    def query_month_shards(self, table: Table, prefix: str, start_ms: int, end_ms: int,
+                           index_name: Optional[str] = None, projection: Optional[List[str]] = None) -> List[dict]:
+        """
+        Reads the items of a month-sharded partition whose sort key is within
+        [start_ms, end_ms], oldest first. Every month is queried in parallel; months
+        don't overlap, so concatenating their results in month order keeps them sorted.
+        """
+        shards = [(f"{prefix}#{month}", start_ms, end_ms) for month in month_shards(start_ms, end_ms)]
+        return [item for items in self.query_shards(table, shards, index_name, projection) for item in items]
+
+    def query_month_shards_page(self, table: Table, prefix: str, start_ms: int, end_ms: int, limit: int,
+                                cursor: Optional[dict] = None, index_name: Optional[str] = None,
+                                projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        """
+        One page of at most `limit` items of a month-sharded partition, oldest first.
+        Months are read in order until the page is full, and the returned cursor
+        ({"month", "key"}, None after the last month) resumes where the page stopped.
+        Raises ValueError for a cursor that does not belong to this range.
+        """
+        months = month_shards(start_ms, end_ms)
+        position, start_key = 0, None
+        if cursor is not None:
+            if cursor.get("month") not in months:
+                raise ValueError("Invalid cursor for this range")
+            position, start_key = months.index(cursor["month"]), cursor.get("key")
+
+        items: List[dict] = []
+        while position < len(months) and len(items) < limit:
+            page, start_key = table.query_page(
+                f"{prefix}#{months[position]}", start_ms, end_ms, index_name, limit - len(items), start_key, projection
+            )
+            items.extend(page)
+            if not start_key:
+                position += 1
+
+        if position == len(months):
+            return items, None
+        return items, {"month": months[position], "key": start_key}
+
+    def get_workers_page(self, limit: Optional[int] = None, start_key: Optional[dict] = None,
+                         projection: Optional[List[str]] = None):
         try:
-            self.timestamps_table.put_item(Item=timestamp_data)
+            return self.workers_table.scan_page(limit, start_key, projection)
         except ClientError as e:
-            logger.error(f"Failed to save timestamp to DynamoDB: {e}")
+            logger.error(f"Failed to scan workers table: {e}")
             raise
 
-    def get_all_workers(self):
+    def iter_worker_pages(self, start_key: Optional[dict] = None, projection: Optional[List[str]] = None) -> Iterator[List[dict]]:
         try:
-            response = self.workers_table.scan()
-            return response.get("Items", [])
+            yield from self.iter_pages(partial(self.workers_table.scan_page, projection=projection), start_key)
         except ClientError as e:
             logger.error(f"Failed to scan workers table: {e}")
             raise
 
+    def get_all_workers(self, start_key: Optional[dict] = None, projection: Optional[List[str]] = None):
+        return [item for page in self.iter_worker_pages(start_key, projection) for item in page]
+
     def get_worker_by_id(self, worker_id: str):
+        return self.worker_cache.get_or_load(worker_id, lambda: self._get_worker_by_id(worker_id))
+
+    def _get_worker_by_id(self, worker_id: str):
         try:
-            response = self.workers_table.get_item(Key={'id': worker_id})
-            return response.get("Item")
+            return self.workers_table.get({'id': worker_id})
         except ClientError as e:
             logger.error(f"Failed to get worker {worker_id}: {e}")
             raise
 
     def delete_worker(self, worker_id: str):
+        """
+        Deletes a worker in a single call and queues the deletion of its images.
+        Returns the deleted item, or None if it did not exist.
+        """
         try:
-            # TODO: Add logic to delete associated images from S3
-            self.workers_table.delete_item(Key={'id': worker_id})
+            deleted = self.workers_table.delete({'id': worker_id})
         except ClientError as e:
             logger.error(f"Failed to delete worker {worker_id}: {e}")
             raise
+        finally:
+            self.worker_cache.invalidate(worker_id)
+        if deleted is None:
+            return None
+        self.record_roster_change(deleted, DELETED)
+        self.submit_background_job(DELETE_WORKER_IMAGES_JOB, {'worker_id': worker_id})
+        return deleted
+
+    def get_roster_version(self, tenant_id: str) -> int:
+        return self.roster_version_cache.get_or_load(tenant_id, lambda: self._get_roster_version(tenant_id))
+
+    def _get_roster_version(self, tenant_id: str) -> int:
+        try:
+            head = self.roster_table.get({'tenant_id': tenant_id, 'version': ROSTER_HEAD_VERSION})
+            return int((head or {}).get("latest", 0))
+        except ClientError as e:
+            logger.error(f"Failed to get the roster version of tenant {tenant_id}: {e}")
+            raise
+
+    def record_roster_change(self, worker: dict, action: str) -> int:
+        """
+        Bumps the roster version of the worker's tenant and stores the change under
+        the new version. Versions are consecutive, so a change that failed to be
+        stored shows up as a gap and the devices behind it get a full snapshot.
+        """
+        tenant_id = worker_tenant(worker)
+        try:
+            version = self.roster_table.increment({'tenant_id': tenant_id, 'version': ROSTER_HEAD_VERSION}, 'latest')
+            self.roster_table.put(roster_change(worker, action, version))
+            return version
+        except ClientError as e:
+            logger.error(f"Failed to record the roster change of worker {worker['id']}: {e}")
+            raise
+        finally:
+            self.roster_version_cache.invalidate(tenant_id)
+
+    def get_roster_changes(self, tenant_id: str, after_version: int, to_version: int) -> List[dict]:
+        """Roster changes with after_version < version <= to_version, oldest first."""
+        pages = self.iter_pages(partial(self.roster_table.query_page, tenant_id, after_version + 1, to_version))
+        return [change for page in pages for change in page]
 
     def update_worker(self, worker_id: str, worker_update: dict):
-        update_expression = "SET " + ", ".join(f"#{k}=:{k}" for k in worker_update)
-        expression_attribute_names = {f"#{k}": k for k in worker_update}
-        expression_attribute_values = {f":{k}": v for k, v in worker_update.items()}
-        
-        try:
-            response = self.workers_table.update_item(
-                Key={'id': worker_id},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values,
-                ReturnValues="ALL_NEW"
-            )
-            return response.get("Attributes")
+        """Updates an existing worker. Returns the updated item, or None if it does not exist."""
+        try:
+            updated = self.workers_table.update({'id': worker_id}, worker_update)
         except ClientError as e:
             logger.error(f"Failed to update worker {worker_id}: {e}")
             raise
+        finally:
+            self.worker_cache.invalidate(worker_id)
+        if updated is None:
+            return None
+        if set(worker_update) & set(ROSTER_FIELDS):
+            self.record_roster_change(updated, UPDATED)
+        return updated
+
+    def _timestamps_operation(self, worker_id: Optional[str], projection: Optional[List[str]] = None) -> Callable:
+        if not worker_id:
+            return partial(self.timestamps_table.scan_page, projection=projection)
+        # Assumes a GSI on worker_id
+        return partial(self.timestamps_table.query_page, worker_id, index_name='worker_id-index', projection=projection)
 
-    def get_all_timestamps(self):
+    def _raise_timestamps_error(self, e: ClientError, worker_id: Optional[str]):
+        if not worker_id:
+            logger.error(f"Failed to scan timestamps table: {e}")
+            raise e
+        logger.error(f"Failed to query timestamps for worker {worker_id}: {e}")
+        # This is a common error if the index doesn't exist
+        if e.response['Error']['Code'] == 'ResourceNotFoundException':
+            raise ValueError("Timestamps by worker ID query requires a 'worker_id-index' Global Secondary Index on the table.")
+        raise e
+
+    def get_timestamps_page(self, limit: Optional[int] = None, start_key: Optional[dict] = None, worker_id: Optional[str] = None,
+                            projection: Optional[List[str]] = None):
+        read_page = self._timestamps_operation(worker_id, projection)
         try:
-            response = self.timestamps_table.scan()
-            return response.get("Items", [])
+            return read_page(limit=limit, start_key=start_key)
         except ClientError as e:
-            logger.error(f"Failed to scan timestamps table: {e}")
+            self._raise_timestamps_error(e, worker_id)
+
+    def iter_timestamp_pages(self, start_key: Optional[dict] = None, worker_id: Optional[str] = None,
+                             projection: Optional[List[str]] = None) -> Iterator[List[dict]]:
+        try:
+            yield from self.iter_pages(self._timestamps_operation(worker_id, projection), start_key)
+        except ClientError as e:
+            self._raise_timestamps_error(e, worker_id)
+
+    def get_all_timestamps(self, start_key: Optional[dict] = None, projection: Optional[List[str]] = None):
+        return [item for page in self.iter_timestamp_pages(start_key, projection=projection) for item in page]
+
+    def get_timestamps_by_worker_id(self, worker_id: str, start_key: Optional[dict] = None,
+                                    projection: Optional[List[str]] = None):
+        return [item for page in self.iter_timestamp_pages(start_key, worker_id, projection) for item in page]
+
+    def _time_log_index(self, worker_id: Optional[str], tenant_id: Optional[str]) -> Tuple[str, str]:
+        if worker_id:
+            return TIME_LOG_WORKER_INDEX, worker_id
+        return TIME_LOG_TENANT_INDEX, tenant_id
+
+    def get_time_logs_in_range(self, start_ms: int, end_ms: int, worker_id: Optional[str] = None,
+                               tenant_id: Optional[str] = None, projection: Optional[List[str]] = None) -> List[dict]:
+        """Reads a worker's (or else a tenant's) time logs within [start_ms, end_ms], oldest first."""
+        index_name, prefix = self._time_log_index(worker_id, tenant_id)
+        try:
+            return self.query_month_shards(self.timestamps_table, prefix, start_ms, end_ms, index_name, projection)
+        except ClientError as e:
+            logger.error(f"Failed to query time logs of {prefix} between {start_ms} and {end_ms}: {e}")
             raise
 
-    def get_timestamps_by_worker_id(self, worker_id: str):
+    def get_time_logs_page_in_range(self, start_ms: int, end_ms: int, limit: int, cursor: Optional[dict] = None,
+                                    worker_id: Optional[str] = None, tenant_id: Optional[str] = None,
+                                    projection: Optional[List[str]] = None):
+        index_name, prefix = self._time_log_index(worker_id, tenant_id)
         try:
-            response = self.timestamps_table.query(
-                IndexName='worker_id-index', # Assumes a GSI on worker_id
-                KeyConditionExpression='worker_id = :worker_id',
-                ExpressionAttributeValues={':worker_id': worker_id}
+            return self.query_month_shards_page(
+                self.timestamps_table, prefix, start_ms, end_ms, limit, cursor, index_name, projection
             )
-            return response.get("Items", [])
         except ClientError as e:
-            logger.error(f"Failed to query timestamps for worker {worker_id}: {e}")
-            # This is a common error if the index doesn't exist
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                raise ValueError("Timestamps by worker ID query requires a 'worker_id-index' Global Secondary Index on the table.")
+            logger.error(f"Failed to query time logs of {prefix} between {start_ms} and {end_ms}: {e}")
+            raise
+
+    def iter_time_log_pages_in_range(self, start_ms: int, end_ms: int, worker_id: Optional[str] = None,
+                                     tenant_id: Optional[str] = None, projection: Optional[List[str]] = None) -> Iterator[List[dict]]:
+        index_name, prefix = self._time_log_index(worker_id, tenant_id)
+        try:
+            for month in month_shards(start_ms, end_ms):
+                yield from self.iter_pages(
+                    partial(self.timestamps_table.query_page, f"{prefix}#{month}", start_ms, end_ms, index_name,
+                            projection=projection)
+                )
+        except ClientError as e:
+            logger.error(f"Failed to query time logs of {prefix} between {start_ms} and {end_ms}: {e}")
             raise
 
-    def get_timestamp_by_id(self, timestamp_id: str):
+    def get_timestamp_by_id(self, timestamp_id: str, projection: Optional[List[str]] = None):
         try:
-            response = self.timestamps_table.get_item(Key={'id': timestamp_id})
-            return response.get("Item")
+            return self.timestamps_table.get({'id': timestamp_id}, projection)
         except ClientError as e:
             logger.error(f"Failed to get timestamp {timestamp_id}: {e}")
             raise
 
     def delete_timestamp(self, timestamp_id: str):
+        """Deletes a timestamp in a single call. Returns the deleted item, or None if it did not exist."""
         try:
-            self.timestamps_table.delete_item(Key={'id': timestamp_id})
+            deleted = self.timestamps_table.delete({'id': timestamp_id})
         except ClientError as e:
             logger.error(f"Failed to delete timestamp {timestamp_id}: {e}")
             raise
-    
-    def update_timestamp(self, timestamp_id: str, timestamp_update: dict):
-        update_expression = "SET " + ", ".join(f"#{k}=:{k}" for k in timestamp_update)
-        expression_attribute_names = {f"#{k}": k for k in timestamp_update}
-        expression_attribute_values = {f":{k}": v for k, v in timestamp_update.items()}
+        if deleted is None:
+            return None
+        self.append_changes([time_log_change(deleted, DELETED)])
+        return deleted
 
+    def update_timestamp(self, timestamp_id: str, timestamp_update: dict):
+        """Updates an existing time log. Returns the updated item, or None if it does not exist."""
         try:
-            response = self.timestamps_table.update_item(
-                Key={'id': timestamp_id},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values,
-                ReturnValues="ALL_NEW"
-            )
-            return response.get("Attributes")
+            updated = self.timestamps_table.update({'id': timestamp_id}, timestamp_update)
         except ClientError as e:
             logger.error(f"Failed to update timestamp {timestamp_id}: {e}")
             raise
+        if updated is None:
+            return None
+        self.append_changes([time_log_change(updated, UPDATED)])
+        return updated
+
+
+    def batch_put_items(self, items_by_table: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        """
+        Writes items to several tables (with BatchWriteItem on DynamoDB, retrying
+        unprocessed items). Returns the items, per table, that were still
+        unprocessed after the last attempt.
+        """
+        return self.storage.batch_put_items(items_by_table)
+
+    def append_changes(self, changes: List[dict]):
+        """Appends entries to the tenant-partitioned change feed polled by devices."""
+        unprocessed = self.batch_put_items({settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE: changes})
+        for change in unprocessed.get(settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE, []):
+            logger.error(f"Change feed entry lost for {change['source']} {change['server_id']} ({change['action']})")
+
+    def get_changes_page(self, tenant_id: str, from_key: str, to_key: str, limit: int, start_key: Optional[dict] = None):
+        """One page of a tenant's change feed between two change keys, in the order the changes were made."""
+        try:
+            return self.attendance_changes_table.query_page(tenant_id, from_key, to_key, limit=limit, start_key=start_key)
+        except ClientError as e:
+            logger.error(f"Failed to query change feed for tenant {tenant_id}: {e}")
+            raise
+
+    def soft_delete_attendance_record(self, tenant_id: str, employee_id: str, timestamp: int, deletion: dict):
+        """
+        Marks an attendance record as deleted (spec §9: records are never removed, so
+        devices can learn about the deletion) and appends a DELETED change. Returns
+        the updated record, or None if it does not exist or was already deleted.
+        """
+        key = {ATTENDANCE_PARTITION_KEY: sharded_key(f"{tenant_id}#{employee_id}", timestamp), 'timestamp': timestamp}
+        try:
+            record = self.attendance_table.update(key, deletion, unless_set='deleted_at')
+        except ClientError as e:
+            logger.error(f"Failed to delete attendance record {tenant_id}#{employee_id}@{timestamp}: {e}")
+            raise
+        if record is None:
+            return None
+        self.append_changes([attendance_change(record, DELETED, deletion.get('deleted_at'))])
+        return record
+
+    def get_attendance_records_in_range(self, tenant_id: str, employee_id: str, start_ms: int, end_ms: int) -> List[dict]:
+        """Reads every attendance record of an employee whose timestamp is within [start_ms, end_ms], oldest first."""
+        return self.get_attendance_records_in_ranges(tenant_id, {employee_id: (start_ms, end_ms)})[employee_id]
+
+    def get_attendance_records_in_ranges(self, tenant_id: str, ranges: Dict[str, Tuple[int, int]]) -> Dict[str, List[dict]]:
+        """Runs one range query per employee and month partition, all in parallel on the query executor."""
+        shards, owners = [], []
+        for employee_id, (start_ms, end_ms) in ranges.items():
+            for month in month_shards(start_ms, end_ms):
+                shards.append((f"{tenant_id}#{employee_id}#{month}", start_ms, end_ms))
+                owners.append(employee_id)
+        try:
+            results = self.query_shards(self.attendance_table, shards)
+        except ClientError as e:
+            logger.error(f"Failed to query attendance for {len(ranges)} employees of {tenant_id}: {e}")
+            raise
+
+        records: Dict[str, List[dict]] = {employee_id: [] for employee_id in ranges}
+        # Shards were listed employee by employee, month by month, so each employee's records stay sorted
+        for employee_id, items in zip(owners, results):
+            records[employee_id].extend(items)
+        return records
+
+    def get_tenant_attendance_in_range(self, tenant_id: str, start_ms: int, end_ms: int) -> List[dict]:
+        """Reads every attendance record of a tenant whose timestamp is within [start_ms, end_ms], oldest first."""
+        try:
+            return self.query_month_shards(self.attendance_table, tenant_id, start_ms, end_ms, ATTENDANCE_TENANT_INDEX)
+        except ClientError as e:
+            logger.error(f"Failed to query attendance for tenant {tenant_id}: {e}")
+            raise
+
+    def get_device_attendance_in_range(self, device_id: str, start_ms: int, end_ms: int) -> List[dict]:
+        """Reads every attendance record taken on a device whose timestamp is within [start_ms, end_ms], oldest first."""
+        try:
+            return self.query_month_shards(self.attendance_table, device_id, start_ms, end_ms, ATTENDANCE_DEVICE_INDEX)
+        except ClientError as e:
+            logger.error(f"Failed to query attendance for device {device_id}: {e}")
+            raise
+
+    def get_timesheet_rollups(self, scope: str, from_day: str, to_day: str) -> List[dict]:
+        try:
+            pages = self.iter_pages(partial(self.timesheet_rollups_table.query_page, scope, from_day, to_day))
+            return [item for page in pages for item in page]
+        except ClientError as e:
+            logger.error(f"Failed to query timesheet rollups for {scope}: {e}")
+            raise
+
+    def save_timesheet_rollups(self, rollups: List[dict]):
+        # A rollup that fails to save is simply recomputed on the next request
+        self.batch_put_items({settings.DYNAMODB_TIMESHEET_ROLLUPS_TABLE: rollups})
+
+    def delete_timesheet_rollups(self, keys: List[Tuple[str, str]]):
+        """Drops materialized rollups, given as (scope, day) pairs, after late or changed events."""
+        try:
+            self.timesheet_rollups_table.delete_many([{'scope': scope, 'day': day} for scope, day in set(keys)])
+        except ClientError as e:
+            logger.error(f"Failed to delete {len(keys)} timesheet rollups: {e}")
+            raise
 
 aws_service = AWSService()
+
+def get_aws_service() -> AWSService:
+    """FastAPI dependency for the process-wide AWSService."""
+    return aws_service
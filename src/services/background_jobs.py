@@ -0,0 +1,162 @@
+import heapq
+import logging
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from src.services.write_behind import JOURNAL_COMPACT_BYTES, Journal
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 300.0
+
+
+class JobQueue:
+    """
+    Runs jobs ({"id", "kind", "payload"}) off the request path on one background thread.
+
+    submit() journals a job before returning, so it survives a crash or restart:
+    jobs still in the journal when the queue starts are run again. A job whose
+    handler raises is retried with jittered exponential backoff, up to
+    max_attempts. Handlers must be idempotent, since a job can run twice after
+    a crash.
+
+    Jobs in `schedules` ({kind: interval seconds}) are run periodically with an
+    empty payload. They aren't journaled: a missed run is made up by the next one.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[[dict], None]],
+        journal_path: str,
+        max_attempts: int,
+        schedules: Optional[Dict[str, float]] = None
+    ):
+        self.handlers = handlers
+        self.journal_path = journal_path
+        self.max_attempts = max_attempts
+        self.schedules = {kind: interval for kind, interval in (schedules or {}).items() if interval > 0}
+        self.journal: Optional[Journal] = None
+        # (due at, sequence, attempt, job); new jobs are due right away
+        self._jobs = []
+        self._sequence = 0
+        self._outstanding = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Opens the journal, queues the jobs it still holds, schedules the periodic jobs and starts the thread."""
+        completed, pending = set(), {}
+        for record in Journal.read(self.journal_path):
+            if "done" in record:
+                completed.update(record["done"])
+            else:
+                pending[record["id"]] = record
+        pending = [job for job_id, job in pending.items() if job_id not in completed]
+
+        self.journal = Journal(self.journal_path)
+        self.journal.rewrite(pending)
+        if pending:
+            logger.info(f"Resuming {len(pending)} background jobs from {self.journal_path}")
+        now = time.monotonic()
+        with self._cond:
+            self._stopping = False
+            self._outstanding += len(pending)
+            for job in pending:
+                self._push(now, 0, job)
+            for kind, interval in self.schedules.items():
+                self._push(now + interval, 0, {"id": None, "kind": kind, "payload": {}})
+        self._thread = threading.Thread(target=self._run, name="background-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops after the running job. Jobs not run yet stay in the journal for the next start."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return
+            self._thread = None
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def submit(self, kind: str, payload: dict) -> str:
+        """Journals a job and queues it. Returns its id once it is durable."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind}")
+        job = {"id": uuid.uuid4().hex, "kind": kind, "payload": payload}
+        # Counted before it is journaled, so the journal isn't compacted from under it
+        with self._cond:
+            self._outstanding += 1
+        try:
+            self.journal.append(job)
+        except Exception:
+            with self._cond:
+                self._outstanding -= 1
+            raise
+        with self._cond:
+            self._push(time.monotonic(), 0, job)
+            self._cond.notify()
+        return job["id"]
+
+    def pending(self) -> int:
+        """Submitted jobs that haven't finished or been given up on."""
+        with self._cond:
+            return self._outstanding
+
+    def _push(self, due_at: float, attempt: int, job: dict):
+        self._sequence += 1
+        heapq.heappush(self._jobs, (due_at, self._sequence, attempt, job))
+
+    def _next_job(self) -> Optional[tuple]:
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                if self._jobs and self._jobs[0][0] <= now:
+                    _, _, attempt, job = heapq.heappop(self._jobs)
+                    return attempt, job
+                self._cond.wait(self._jobs[0][0] - now if self._jobs else None)
+            return None
+
+    def _run(self):
+        while True:
+            next_job = self._next_job()
+            if next_job is None:
+                return
+            self._run_job(*next_job)
+
+    def _run_job(self, attempt: int, job: dict):
+        try:
+            self.handlers[job["kind"]](job["payload"])
+            failed = False
+        except Exception as e:
+            logger.error(f"Background job {job['kind']} {job['id']} failed (attempt {attempt + 1}): {e}")
+            failed = True
+
+        if job["id"] is None:
+            # Periodic job: runs again after its interval, whatever the outcome
+            with self._cond:
+                self._push(time.monotonic() + self.schedules[job["kind"]], 0, job)
+            return
+
+        if failed and attempt + 1 < self.max_attempts:
+            delay = random.uniform(0, min(RETRY_BASE_SECONDS * 2 ** attempt, RETRY_MAX_SECONDS))
+            with self._cond:
+                self._push(time.monotonic() + delay, attempt + 1, job)
+            return
+
+        if failed:
+            logger.error(f"Giving up on background job {job['kind']} {job['id']}: {job['payload']}")
+        # Not synced: losing this line only means the job runs again after a crash
+        self.journal.append({"done": [job["id"]]}, sync=False)
+        with self._cond:
+            self._outstanding -= 1
+            if self._outstanding == 0 and self.journal.size() > JOURNAL_COMPACT_BYTES:
+                self.journal.rewrite([])
@@ -0,0 +1,105 @@
+import time
+import uuid
+from typing import Optional
+
+from src.core.config import settings
+from src.services.partitions import time_log_epoch_ms
+
+CREATED = "CREATED"
+UPDATED = "UPDATED"
+DELETED = "DELETED"
+
+ATTENDANCE_SOURCE = "attendance"
+TIMESTAMP_SOURCE = "timestamp"
+
+# Change keys are "<changed_at ms, zero-padded>#<uuid>", so they sort by time within a tenant
+_KEY_DIGITS = 13
+
+
+def change_key(changed_at_ms: int) -> str:
+    return f"{changed_at_ms:0{_KEY_DIGITS}d}#{uuid.uuid4().hex}"
+
+
+def key_range(since_ms: int, until_ms: int):
+    """Change-key bounds for the changes made after since_ms and up to until_ms (inclusive)."""
+    # "#" sorts after every digit and "~" after every hex digit
+    return f"{since_ms:0{_KEY_DIGITS}d}#~", f"{until_ms:0{_KEY_DIGITS}d}#~"
+
+
+def _change(tenant_id: str, changed_at_ms: Optional[int], **fields) -> dict:
+    changed_at_ms = changed_at_ms if changed_at_ms is not None else int(time.time() * 1000)
+    return {
+        "tenant_id": tenant_id,
+        "change_key": change_key(changed_at_ms),
+        "changed_at": changed_at_ms,
+        # Read by DynamoDB TTL; devices that poll less often than this resync from scratch
+        "expires_at": changed_at_ms // 1000 + settings.CHANGE_FEED_RETENTION_DAYS * 86400,
+        **fields
+    }
+
+
+def restamp(change: dict, changed_at_ms: Optional[int] = None) -> dict:
+    """
+    The change as made at changed_at_ms (now by default), under a new change key.
+    For changes written later than they were made, e.g. by the write-behind buffer:
+    devices poll up to the settle window behind now, so a change must be stamped
+    with the time it is written, not the time it was built.
+    """
+    return {**change, **_change(change["tenant_id"], changed_at_ms)}
+
+
+def attendance_change(record: dict, action: str, changed_at_ms: Optional[int] = None) -> dict:
+    """Change-feed entry for a created, updated or deleted attendance record."""
+    return _change(
+        record["tenant_id"], changed_at_ms,
+        source=ATTENDANCE_SOURCE,
+        action=action,
+        server_id=record["record_id"],
+        employee_id=record["employee_id"],
+        type=record["type"],
+        timestamp=int(record["timestamp"]),
+        device_id=record.get("device_id"),
+        deleted_by_admin_id=record.get("deleted_by_admin_id"),
+        deletion_reason=record.get("deletion_reason")
+    )
+
+
+def time_log_change(time_log: dict, action: str, changed_at_ms: Optional[int] = None) -> dict:
+    """Change-feed entry for a created, updated or deleted worker time log."""
+    logged_at = time_log.get("timestamp")
+    return _change(
+        time_log.get("tenant_id") or settings.DEFAULT_TENANT_ID, changed_at_ms,
+        source=TIMESTAMP_SOURCE,
+        action=action,
+        server_id=time_log["id"],
+        employee_id=time_log["worker_id"],
+        type=time_log["event_type"].upper(),
+        timestamp=time_log_epoch_ms(logged_at) if logged_at else None,
+        device_id=None
+    )
+
+
+# Worker attributes devices keep in their roster, in the order of a roster entry
+ROSTER_FIELDS = ["id", "document_id", "first_name", "last_name", "image_urls", "thumbnail_urls"]
+
+
+def worker_tenant(worker: dict) -> str:
+    return worker.get("tenant_id") or settings.DEFAULT_TENANT_ID
+
+
+def roster_entry(worker: dict) -> list:
+    return [worker.get(field) for field in ROSTER_FIELDS]
+
+
+def roster_change(worker: dict, action: str, version: int, changed_at_ms: Optional[int] = None) -> dict:
+    """Roster change stored under the tenant's roster version it produced."""
+    changed_at_ms = changed_at_ms if changed_at_ms is not None else int(time.time() * 1000)
+    return {
+        "tenant_id": worker_tenant(worker),
+        "version": version,
+        "action": action,
+        "worker_id": worker["id"],
+        "entry": roster_entry(worker) if action != DELETED else None,
+        "changed_at": changed_at_ms,
+        "expires_at": changed_at_ms // 1000 + settings.CHANGE_FEED_RETENTION_DAYS * 86400,
+    }
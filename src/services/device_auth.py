@@ -0,0 +1,52 @@
+import hmac
+
+from fastapi import Depends, Header, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from src.core.security import device_tokens
+from src.services.async_aws_service import AsyncAWSService, get_async_aws_service
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def get_current_device(
+    credentials: HTTPAuthorizationCredentials | None = Depends(_bearer),
+    x_tenant_id: str = Header(..., description="Tenant of the device; must match its token"),
+    aws: AsyncAWSService = Depends(get_async_aws_service)
+) -> dict:
+    """
+    Dependency authenticating a device by its `Authorization: Bearer` token (spec §5.1).
+    Returns the device item. A bad token or an unknown device answers 401, as does
+    a token other than the one the device was last registered with (once a device
+    registers again, its earlier tokens are refused). A deactivated device is known
+    but no longer allowed, and answers 403. The token's decode and the device are
+    both served from in-process caches, so a request from a known device makes no
+    DynamoDB call.
+    """
+    if credentials is None:
+        raise _unauthorized("Missing device token")
+    try:
+        claims = device_tokens.verify(credentials.credentials)
+    except ValueError as e:
+        raise _unauthorized(str(e))
+    if not hmac.compare_digest(claims["tenant_id"].encode(), x_tenant_id.encode()):
+        raise HTTPException(status_code=403, detail="X-Tenant-ID does not match the device token")
+
+    try:
+        device = await aws.get_device_by_id(claims["device_id"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to authenticate device: {str(e)}")
+    if not device:
+        raise _unauthorized("Device is not registered")
+    if not hmac.compare_digest(str(device.get("tenant_id", "")).encode(), claims["tenant_id"].encode()):
+        raise _unauthorized("Device token was issued for another tenant")
+    stored_token = device.get("device_token")
+    if stored_token and not hmac.compare_digest(stored_token.encode(), credentials.credentials.encode()):
+        raise _unauthorized("Device token has been replaced by a later registration")
+    if not device.get("is_active"):
+        raise HTTPException(status_code=403, detail="Device has been deactivated")
+    return device
@@ -0,0 +1,400 @@
+import logging
+import random
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from src.core.config import settings
+from src.core.lazy import locked_cached_property
+from src.services.aws_instrumentation import instrument_client
+from src.services.aws_resilience import ResilienceGuard
+from src.services.storage import (
+    ActivationCodeUnavailableError, BlobStore, DeviceAlreadyRegisteredError, Storage, Table, TableSchema, table_schemas
+)
+
+logger = logging.getLogger(__name__)
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_ATTEMPTS = 6
+
+# DeleteObjects accepts at most 1000 keys per call
+S3_DELETE_BATCH_SIZE = 1000
+
+
+def is_condition_failure(e: ClientError) -> bool:
+    return e.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def client_config(max_pool_connections: int):
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=max_pool_connections,
+        connect_timeout=settings.AWS_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=settings.AWS_READ_TIMEOUT_SECONDS,
+        retries={'max_attempts': settings.AWS_MAX_ATTEMPTS, 'mode': settings.AWS_RETRY_MODE},
+        # Pooled connections are reused across requests; keep idle ones from being dropped
+        tcp_keepalive=True
+    )
+
+
+class DynamoDBTable(Table):
+    """
+    A Table over a boto3 Table resource. Attribute names are passed as placeholders,
+    so any name is allowed. Calls go through the table's ResilienceGuard.
+    """
+
+    def __init__(self, schema: TableSchema, resource, guard: ResilienceGuard):
+        super().__init__(schema)
+        self.resource = resource
+        self.guard = guard
+
+    def _exists_condition(self) -> Tuple[str, dict]:
+        return 'attribute_exists(#hash)', {'#hash': self.schema.hash_key}
+
+    @staticmethod
+    def _projection(kwargs: dict, projection: Optional[List[str]]) -> dict:
+        """Adds a ProjectionExpression for the given attributes to the call's arguments."""
+        if projection:
+            names = {f"#p{n}": attr for n, attr in enumerate(projection)}
+            kwargs['ProjectionExpression'] = ', '.join(names)
+            kwargs['ExpressionAttributeNames'] = {**kwargs.get('ExpressionAttributeNames', {}), **names}
+        return kwargs
+
+    def get(self, key: dict, projection: Optional[List[str]] = None) -> Optional[dict]:
+        return self.guard.call(self.resource.get_item, **self._projection({'Key': key}, projection)).get("Item")
+
+    def put(self, item: dict):
+        self.guard.call(self.resource.put_item, Item=item)
+
+    def update(self, key: dict, changes: dict, unless_set: Optional[str] = None) -> Optional[dict]:
+        condition, names = self._exists_condition()
+        values = {}
+        assignments = []
+        for n, (attr, value) in enumerate(changes.items()):
+            names[f"#a{n}"] = attr
+            values[f":v{n}"] = value
+            assignments.append(f"#a{n} = :v{n}")
+        if unless_set:
+            condition += ' AND (attribute_not_exists(#unless) OR attribute_type(#unless, :null_type))'
+            names['#unless'] = unless_set
+            values[':null_type'] = 'NULL'
+        try:
+            response = self.guard.call(
+                self.resource.update_item,
+                Key=key,
+                UpdateExpression='SET ' + ', '.join(assignments),
+                # Without the condition, update_item would create a phantom item for unknown keys
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW'
+            )
+        except ClientError as e:
+            if is_condition_failure(e):
+                return None
+            raise
+        return response.get("Attributes")
+
+    def increment(self, key: dict, attribute: str, amount: int = 1) -> int:
+        response = self.guard.call(
+            self.resource.update_item,
+            Key=key,
+            UpdateExpression='ADD #attr :amount',
+            ExpressionAttributeNames={'#attr': attribute},
+            ExpressionAttributeValues={':amount': amount},
+            ReturnValues='UPDATED_NEW'
+        )
+        return int(response['Attributes'][attribute])
+
+    def delete(self, key: dict) -> Optional[dict]:
+        condition, names = self._exists_condition()
+        try:
+            response = self.guard.call(
+                self.resource.delete_item,
+                Key=key, ConditionExpression=condition, ExpressionAttributeNames=names, ReturnValues='ALL_OLD'
+            )
+        except ClientError as e:
+            if is_condition_failure(e):
+                return None
+            raise
+        return response.get("Attributes")
+
+    def delete_many(self, keys: List[dict]):
+        key_attrs = [attr for attr in (self.schema.hash_key, self.schema.range_key) if attr]
+
+        def delete_batch():
+            # Deletes are idempotent, so a throttled batch can be retried as a whole
+            with self.resource.batch_writer(overwrite_by_pkeys=key_attrs) as batch:
+                for key in keys:
+                    batch.delete_item(Key=key)
+
+        self.guard.call(delete_batch)
+
+    @staticmethod
+    def _page(response: dict) -> Tuple[List[dict], Optional[dict]]:
+        return response.get("Items", []), response.get("LastEvaluatedKey")
+
+    def query_page(self, partition, start=None, end=None, index_name: Optional[str] = None,
+                   limit: Optional[int] = None, start_key: Optional[dict] = None,
+                   projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        partition_attr, sort_attr = self.schema.index_keys(index_name)
+        kwargs = {
+            'KeyConditionExpression': '#pk = :pk',
+            'ExpressionAttributeNames': {'#pk': partition_attr},
+            'ExpressionAttributeValues': {':pk': partition}
+        }
+        if sort_attr and (start is not None or end is not None):
+            if start is not None and end is not None:
+                kwargs['KeyConditionExpression'] += ' AND #sk BETWEEN :start AND :end'
+            else:
+                kwargs['KeyConditionExpression'] += ' AND #sk >= :start' if start is not None else ' AND #sk <= :end'
+            kwargs['ExpressionAttributeNames']['#sk'] = sort_attr
+            bounds = {':start': start, ':end': end}
+            kwargs['ExpressionAttributeValues'].update({k: v for k, v in bounds.items() if v is not None})
+        if index_name:
+            kwargs['IndexName'] = index_name
+        if limit:
+            kwargs['Limit'] = limit
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        return self._page(self.guard.call(self.resource.query, **self._projection(kwargs, projection)))
+
+    def scan_page(self, limit: Optional[int] = None, start_key: Optional[dict] = None,
+                  projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        kwargs = {}
+        if limit:
+            kwargs['Limit'] = limit
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        return self._page(self.guard.call(self.resource.scan, **self._projection(kwargs, projection)))
+
+
+class S3BlobStore(BlobStore):
+    def __init__(self, storage: "DynamoDBStorage"):
+        self.storage = storage
+        self.guard = ResilienceGuard(settings.S3_BUCKET_NAME)
+
+    @property
+    def s3_client(self):
+        return self.storage.s3_client
+
+    def url(self, key: str) -> str:
+        return f"https://{settings.S3_BUCKET_NAME}.s3.amazonaws.com/{key}"
+
+    def put(self, key: str, body: bytes, content_type: str):
+        self.guard.call(self.s3_client.put_object, Bucket=settings.S3_BUCKET_NAME, Key=key, Body=body, ContentType=content_type)
+
+    def upload_fileobj(self, key: str, fileobj, content_type: str):
+        position = fileobj.tell()
+
+        def upload():
+            # A retried upload starts over from the same position
+            fileobj.seek(position)
+            self.s3_client.upload_fileobj(fileobj, settings.S3_BUCKET_NAME, key, ExtraArgs={'ContentType': content_type})
+
+        self.guard.call(upload)
+
+    def get(self, key: str) -> bytes:
+        return self.guard.call(lambda: self.s3_client.get_object(Bucket=settings.S3_BUCKET_NAME, Key=key)['Body'].read())
+
+    def head(self, key: str) -> Optional[dict]:
+        try:
+            return self.guard.call(self.s3_client.head_object, Bucket=settings.S3_BUCKET_NAME, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def delete_many(self, keys: List[str]):
+        """Deletes keys with one DeleteObjects call per 1000. Raises ClientError if any key wasn't deleted."""
+        for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+            try:
+                response = self.guard.call(
+                    self.s3_client.delete_objects,
+                    Bucket=settings.S3_BUCKET_NAME,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except ClientError as e:
+                logger.error(f"Failed to delete {len(batch)} objects from S3: {e}")
+                raise
+            # DeleteObjects succeeds as a whole and reports the keys it couldn't delete
+            errors = response.get('Errors', [])
+            if errors:
+                logger.error(f"Failed to delete {len(errors)} of {len(batch)} objects from S3: {errors[:3]}")
+                raise ClientError({'Error': {'Code': errors[0]['Code'], 'Message': errors[0]['Message']}}, 'DeleteObjects')
+
+    def _list_pages(self, **kwargs) -> Iterator[dict]:
+        # Paged by hand rather than with a paginator, so a throttled page can be retried on its own
+        while True:
+            page = self.guard.call(self.s3_client.list_objects_v2, Bucket=settings.S3_BUCKET_NAME, **kwargs)
+            yield page
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+    def iter_key_pages(self, prefix: str) -> Iterator[List[dict]]:
+        for page in self._list_pages(Prefix=prefix):
+            yield page.get('Contents', [])
+
+    def iter_prefixes(self) -> Iterator[str]:
+        for page in self._list_pages(Delimiter='/'):
+            for prefix in page.get('CommonPrefixes', []):
+                yield prefix['Prefix']
+
+    def presigned_post(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+        # Signing is local; no request is made
+        return self.s3_client.generate_presigned_post(
+            Bucket=settings.S3_BUCKET_NAME,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]],
+            ExpiresIn=expires_in
+        )
+
+
+class DynamoDBStorage(Storage):
+    """
+    DynamoDB tables and an S3 bucket. Clients and table resources are built on
+    first use, so importing the app does not load boto3.
+    """
+
+    def __init__(self):
+        self.blobs = S3BlobStore(self)
+
+    @locked_cached_property
+    def s3_client(self):
+        import boto3
+
+        return instrument_client(boto3.client(
+            "s3",
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_REGION,
+            # Keep enough pooled connections for every concurrent upload
+            config=client_config(max(settings.AWS_MAX_POOL_CONNECTIONS, settings.S3_UPLOAD_CONCURRENCY))
+        ))
+
+    @locked_cached_property
+    def dynamodb(self):
+        import boto3
+
+        dynamodb = boto3.resource(
+            "dynamodb",
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_REGION,
+            config=client_config(settings.AWS_MAX_POOL_CONNECTIONS)
+        )
+        instrument_client(dynamodb.meta.client, consumed_capacity=settings.METRICS_DYNAMODB_CONSUMED_CAPACITY)
+        return dynamodb
+
+    @locked_cached_property
+    def tables(self) -> Dict[str, DynamoDBTable]:
+        return {
+            name: DynamoDBTable(schema, self.dynamodb.Table(name), ResilienceGuard(name))
+            for name, schema in table_schemas().items()
+        }
+
+    def table(self, name: str) -> Table:
+        return self.tables[name]
+
+    def warm_up(self):
+        """Builds the clients and table resources. Makes no AWS calls."""
+        self.s3_client
+        self.tables
+
+    def batch_put_items(self, items_by_table: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        """
+        Writes items with BatchWriteItem in chunks of 25 requests, retrying any
+        UnprocessedItems with jittered exponential backoff. Returns the items,
+        per table, that were still unprocessed after the last attempt.
+        """
+        requests = [
+            (table_name, {'PutRequest': {'Item': item}})
+            for table_name, items in items_by_table.items()
+            for item in items
+        ]
+        unprocessed_items: Dict[str, List[dict]] = {}
+
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            request_items: Dict[str, List[dict]] = {}
+            for table_name, request in requests[start:start + BATCH_WRITE_SIZE]:
+                request_items.setdefault(table_name, []).append(request)
+            # A batch is paced and retried as its first table
+            guard = self.tables[next(iter(request_items))].guard
+
+            for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+                try:
+                    response = guard.call(self.dynamodb.batch_write_item, RequestItems=request_items)
+                except ClientError as e:
+                    logger.error(f"Failed to batch write to {list(request_items)}: {e}")
+                    raise
+                request_items = response.get("UnprocessedItems") or {}
+                if not request_items:
+                    break
+                # Unprocessed items mean their table is throttling writes
+                for table_name in request_items:
+                    self.tables[table_name].guard.on_throttle()
+                time.sleep(random.uniform(0, min(0.05 * 2 ** attempt, 2.0)))
+
+            for table_name, table_requests in request_items.items():
+                logger.error(f"{len(table_requests)} items left unprocessed in {table_name} after {BATCH_WRITE_MAX_ATTEMPTS} attempts")
+                unprocessed_items.setdefault(table_name, []).extend(r['PutRequest']['Item'] for r in table_requests)
+
+        return unprocessed_items
+
+    def register_device(self, device_data: dict, activation_code: str, registered_at: int):
+        """
+        Claims the activation code and inserts the device in one TransactWriteItems
+        call, so two devices can never register with the same code. The device may
+        replace a deactivated one with the same device_id. The resource's
+        client serializes plain Python values, as the Table methods do.
+        """
+        try:
+            devices_guard = self.tables[settings.DYNAMODB_DEVICES_TABLE].guard
+            devices_guard.call(self.dynamodb.meta.client.transact_write_items, TransactItems=[
+                {'Update': {
+                    'TableName': settings.DYNAMODB_ACTIVATION_CODES_TABLE,
+                    'Key': {'code': activation_code},
+                    'UpdateExpression': 'SET #status = :used, used_at = :now, used_by_device_id = :device_id',
+                    'ConditionExpression': (
+                        '#status = :pending AND (attribute_not_exists(expires_at) '
+                        'OR attribute_type(expires_at, :null_type) OR expires_at >= :now)'
+                    ),
+                    'ExpressionAttributeNames': {'#status': 'status'},
+                    'ExpressionAttributeValues': {
+                        ':used': 'used',
+                        ':pending': 'pending',
+                        ':null_type': 'NULL',
+                        ':now': registered_at,
+                        ':device_id': device_data['device_id']
+                    },
+                    'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                }},
+                {'Put': {
+                    'TableName': settings.DYNAMODB_DEVICES_TABLE,
+                    'Item': device_data,
+                    'ConditionExpression': 'attribute_not_exists(device_id) OR is_active = :inactive',
+                    'ExpressionAttributeValues': {':inactive': False}
+                }}
+            ])
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            code_reason, device_reason = e.response.get('CancellationReasons') or [{}, {}]
+            if code_reason.get('Code') == 'ConditionalCheckFailed':
+                if 'Item' in code_reason:
+                    # Error responses are not deserialized like regular results
+                    from boto3.dynamodb.types import TypeDeserializer
+                    deserializer = TypeDeserializer()
+                    code_item = {k: deserializer.deserialize(v) for k, v in code_reason['Item'].items()}
+                else:
+                    code_item = self.table(settings.DYNAMODB_ACTIVATION_CODES_TABLE).get({'code': activation_code})
+                raise ActivationCodeUnavailableError(activation_code, code_item)
+            if device_reason.get('Code') == 'ConditionalCheckFailed':
+                raise DeviceAlreadyRegisteredError(device_data['device_id'])
+            raise
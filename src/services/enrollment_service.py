@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from src.core.config import settings
+from src.core.security import create_enrollment_token, verify_enrollment_token
+from src.models.worker import EnrollmentStartResponse, PresignedUpload, WorkerPersonalData, WorkerResponse
+from src.services.aws_service import AWSService
+from src.services.image_processing import InvalidImageError, image_processor
+
+ENROLLMENT_IMAGES = 7
+# Time left to finalize after the upload policies expire, for uploads that finish at the last moment
+FINALIZE_GRACE_SECONDS = 300
+# Folders, next to the originals, of the variants derived by normalize_face_image
+FACES_FOLDER = "faces"
+THUMBNAILS_FOLDER = "thumbnails"
+
+
+class EnrollmentIncompleteError(Exception):
+    """Some face images are missing or don't match the upload policy."""
+    def __init__(self, problems: List[str]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def image_keys(worker_id: str) -> List[str]:
+    return [f"{worker_id}/face_{n}.jpg" for n in range(1, ENROLLMENT_IMAGES + 1)]
+
+
+def variant_keys(worker_id: str, folder: str) -> List[str]:
+    return [f"{worker_id}/{folder}/face_{n}.jpg" for n in range(1, ENROLLMENT_IMAGES + 1)]
+
+
+def variant_objects(worker_id: str, processed: List[dict]) -> Dict[str, Tuple[bytes, str]]:
+    """S3 objects, by key, for the face crops and thumbnails returned by the image processor."""
+    objects = {}
+    for folder, variant in [(FACES_FOLDER, "face"), (THUMBNAILS_FOLDER, "thumbnail")]:
+        for key, images in zip(variant_keys(worker_id, folder), processed):
+            objects[key] = (images[variant], "image/jpeg")
+    return objects
+
+
+def variant_urls(aws: AWSService, worker_id: str) -> dict:
+    return {
+        "image_urls": [aws.get_s3_url(key) for key in variant_keys(worker_id, FACES_FOLDER)],
+        "thumbnail_urls": [aws.get_s3_url(key) for key in variant_keys(worker_id, THUMBNAILS_FOLDER)],
+    }
+
+
+def start_enrollment(aws: AWSService, personal_data: WorkerPersonalData) -> EnrollmentStartResponse:
+    """
+    First phase of an enrollment: returns one presigned POST policy per face image,
+    limited in size and content type, and a signed token carrying the personal
+    data. Nothing is stored until the enrollment is finalized.
+    """
+    expires_in = settings.ENROLLMENT_UPLOAD_EXPIRES_SECONDS
+    uploads = [
+        PresignedUpload(key=key, **aws.create_presigned_image_upload(
+            key, settings.ENROLLMENT_IMAGE_CONTENT_TYPE, settings.ENROLLMENT_IMAGE_MAX_BYTES, expires_in
+        ))
+        for key in image_keys(personal_data.id)
+    ]
+    token = create_enrollment_token(
+        {"personal_data": personal_data.dict()}, timedelta(seconds=expires_in + FINALIZE_GRACE_SECONDS)
+    )
+    return EnrollmentStartResponse(
+        worker_id=personal_data.id,
+        enrollment_token=token,
+        expires_at=datetime.utcnow() + timedelta(seconds=expires_in),
+        uploads=uploads
+    )
+
+
+def finalize_enrollment(aws: AWSService, enrollment_token: str) -> WorkerResponse:
+    """
+    Second phase: checks with HeadObject that every image was uploaded and
+    matches the policy, normalizes the images into face crops and thumbnails,
+    then writes the worker record. Finalizing the same enrollment again returns
+    the worker already stored.
+
+    Raises ValueError for an invalid or expired token and EnrollmentIncompleteError
+    when images are missing or invalid.
+    """
+    personal_data = WorkerPersonalData(**verify_enrollment_token(enrollment_token)["personal_data"])
+    existing = aws.get_worker_by_id(personal_data.id)
+    if existing:
+        return WorkerResponse(**existing)
+
+    keys = image_keys(personal_data.id)
+    problems = []
+    for key, head in aws.head_s3_objects(keys).items():
+        if head is None:
+            problems.append(f"{key} was not uploaded")
+        elif head.get("ContentType") != settings.ENROLLMENT_IMAGE_CONTENT_TYPE or head["ContentLength"] > settings.ENROLLMENT_IMAGE_MAX_BYTES:
+            problems.append(f"{key} is not a {settings.ENROLLMENT_IMAGE_CONTENT_TYPE} image of at most {settings.ENROLLMENT_IMAGE_MAX_BYTES} bytes")
+    if problems:
+        raise EnrollmentIncompleteError(problems)
+
+    originals = aws.get_s3_objects(keys)
+    try:
+        processed = image_processor.normalize_all([originals[key] for key in keys])
+    except InvalidImageError as e:
+        raise EnrollmentIncompleteError([str(e)])
+    aws.put_s3_objects(variant_objects(personal_data.id, processed))
+
+    worker_response = WorkerResponse(
+        **personal_data.dict(),
+        **variant_urls(aws, personal_data.id),
+        created_at=datetime.utcnow()
+    )
+    worker_data_for_db = worker_response.dict()
+    worker_data_for_db['created_at'] = worker_data_for_db['created_at'].isoformat()
+    aws.save_worker_data(worker_data_for_db)
+    return worker_response
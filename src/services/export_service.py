@@ -0,0 +1,256 @@
+"""
+Bulk export of a DynamoDB table using a parallel scan.
+
+Each scan segment runs on its own thread and writes a gzip-compressed part file,
+one gzip member per page, so the output can be read with any gzip reader. After
+every page the segment's LastEvaluatedKey and file size are saved to a checkpoint
+file; an interrupted export is resumed from there when run again.
+
+CSV columns are the union of the attributes of every item, in the order they are
+first seen by any segment, and are kept in the checkpoint. Rows are written
+positionally, so a row written before a column was seen just ends before it.
+Part files have no header: once every segment is done, the header is written to
+<table>-header.csv.gz, which sorts first, so the files concatenated make one CSV:
+
+    cat ./export/timestamps-header.csv.gz ./export/timestamps-part-*.csv.gz | gunzip
+
+    python -m src.services.export_service timestamps --segments 16 --format csv --output ./export
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from src.core.config import settings
+from src.core.pagination import json_default
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("jsonl", "csv")
+
+
+class TableExporter:
+    def __init__(
+        self,
+        table_name: str,
+        output_dir: str,
+        total_segments: int = 8,
+        export_format: str = "jsonl",
+        page_size: int = 1000,
+        progress: Optional[Callable[[dict], None]] = None,
+        dynamodb_client=None
+    ):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{export_format}'. Expected one of {EXPORT_FORMATS}.")
+
+        self.table_name = table_name
+        self.output_dir = output_dir
+        self.total_segments = total_segments
+        self.export_format = export_format
+        self.page_size = page_size
+        self.progress = progress or self._log_progress
+        self.checkpoint_path = os.path.join(output_dir, f"{table_name}.checkpoint.json")
+        # Clients are thread-safe, so all segments share one with a pool sized to match
+        self.client = dynamodb_client or boto3.client(
+            "dynamodb",
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_REGION,
+            config=Config(max_pool_connections=total_segments)
+        )
+        self._deserializer = TypeDeserializer()
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._checkpoint = self._load_checkpoint()
+
+    def part_path(self, segment: int) -> str:
+        return os.path.join(self.output_dir, f"{self.table_name}-part-{segment:04d}.{self.export_format}.gz")
+
+    def header_path(self) -> str:
+        return os.path.join(self.output_dir, f"{self.table_name}-header.csv.gz")
+
+    def run(self) -> dict:
+        """Exports every unfinished segment and returns the final checkpoint."""
+        pending = [
+            segment for segment in range(self.total_segments)
+            if not self._checkpoint["segments"][str(segment)]["done"]
+        ]
+        if len(pending) < self.total_segments:
+            logger.info(f"Resuming export of {self.table_name}: {len(pending)} of {self.total_segments} segments left")
+
+        with ThreadPoolExecutor(max_workers=self.total_segments, thread_name_prefix="export") as executor:
+            # list() surfaces the first exception raised by any segment
+            list(executor.map(self._export_segment, pending))
+
+        if self.export_format == "csv":
+            self._write_header()
+        self._checkpoint["completed"] = True
+        self._save_checkpoint()
+        return self._checkpoint
+
+    def _load_checkpoint(self) -> dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if (checkpoint["total_segments"], checkpoint["format"]) != (self.total_segments, self.export_format):
+                raise ValueError(
+                    f"Checkpoint {self.checkpoint_path} was created with {checkpoint['total_segments']} "
+                    f"segments in {checkpoint['format']} format; resume with the same options or delete it."
+                )
+            return checkpoint
+
+        return {
+            "table": self.table_name,
+            "format": self.export_format,
+            "total_segments": self.total_segments,
+            "completed": False,
+            # CSV columns seen so far, by every segment
+            "columns": [],
+            "segments": {
+                str(segment): {"start_key": None, "bytes": 0, "items": 0, "done": False}
+                for segment in range(self.total_segments)
+            }
+        }
+
+    def _save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _export_segment(self, segment: int):
+        state = self._checkpoint["segments"][str(segment)]
+        path = self.part_path(segment)
+
+        with open(path, "ab") as f:
+            # Drop anything written after the last checkpoint of an interrupted run
+            f.truncate(state["bytes"])
+            start_key = state["start_key"]
+            while True:
+                params = {
+                    "TableName": self.table_name,
+                    "Segment": segment,
+                    "TotalSegments": self.total_segments,
+                    "Limit": self.page_size
+                }
+                if start_key:
+                    params["ExclusiveStartKey"] = start_key
+                try:
+                    response = self.client.scan(**params)
+                except ClientError as e:
+                    logger.error(f"Failed to scan segment {segment} of {self.table_name}: {e}")
+                    raise
+
+                items = [
+                    {k: self._deserializer.deserialize(v) for k, v in item.items()}
+                    for item in response.get("Items", [])
+                ]
+                if items:
+                    f.write(self._encode_chunk(items))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                start_key = response.get("LastEvaluatedKey")
+                with self._lock:
+                    state.update(start_key=start_key, bytes=f.tell(), items=state["items"] + len(items), done=not start_key)
+                    self._save_checkpoint()
+                    self.progress(self._progress_snapshot())
+                if not start_key:
+                    return
+
+    def _columns_for(self, items: List[dict]) -> List[str]:
+        """The CSV columns, extended with the attributes of items not seen before."""
+        with self._lock:
+            columns = self._checkpoint["columns"]
+            known = set(columns)
+            columns.extend(sorted({key for item in items for key in item} - known))
+            return list(columns)
+
+    def _write_header(self):
+        text = io.StringIO()
+        csv.writer(text).writerow(self._checkpoint["columns"])
+        tmp_path = f"{self.header_path()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(text.getvalue().encode()))
+        os.replace(tmp_path, self.header_path())
+
+    def _encode_chunk(self, items: List[dict]) -> bytes:
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+            if self.export_format == "jsonl":
+                for item in items:
+                    gz.write((json.dumps(item, default=json_default, separators=(",", ":")) + "\n").encode())
+            else:
+                text = io.StringIO()
+                writer = csv.writer(text)
+                columns = self._columns_for(items)
+                for item in items:
+                    writer.writerow([
+                        json.dumps(v, default=json_default) if isinstance(v, (list, dict, set)) else v
+                        for v in (item.get(column) for column in columns)
+                    ])
+                gz.write(text.getvalue().encode())
+        return buffer.getvalue()
+
+    def _progress_snapshot(self) -> dict:
+        segments = self._checkpoint["segments"].values()
+        return {
+            "table": self.table_name,
+            "items": sum(s["items"] for s in segments),
+            "bytes": sum(s["bytes"] for s in segments),
+            "segments_done": sum(1 for s in segments if s["done"]),
+            "total_segments": self.total_segments,
+            "elapsed_seconds": round(time.monotonic() - self._started_at, 2)
+        }
+
+    @staticmethod
+    def _log_progress(snapshot: dict):
+        logger.info(
+            f"Export {snapshot['table']}: {snapshot['items']} items, {snapshot['bytes']} bytes, "
+            f"{snapshot['segments_done']}/{snapshot['total_segments']} segments done "
+            f"in {snapshot['elapsed_seconds']}s"
+        )
+
+
+def export_table_names() -> Dict[str, str]:
+    return {
+        "timestamps": settings.DYNAMODB_TIMESTAMPS_TABLE,
+        "workers": settings.DYNAMODB_WORKERS_TABLE,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export a DynamoDB table with a parallel scan.")
+    parser.add_argument("table", choices=sorted(export_table_names()), help="Table to export")
+    parser.add_argument("--output", default="./export", help="Directory for part files and the checkpoint")
+    parser.add_argument("--segments", type=int, default=8, help="Number of parallel scan segments")
+    parser.add_argument("--format", dest="export_format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--page-size", type=int, default=1000, help="Items per scan page (and per written chunk)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    exporter = TableExporter(
+        export_table_names()[args.table],
+        args.output,
+        total_segments=args.segments,
+        export_format=args.export_format,
+        page_size=args.page_size
+    )
+    exporter.run()
+
+
+if __name__ == "__main__":
+    main()
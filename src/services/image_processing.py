@@ -0,0 +1,117 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List
+
+from src.core.config import settings
+from src.core.lazy import locked_cached_property
+
+# Formats accepted from devices, with the content type their originals are stored with
+CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+# Larger images are rejected before being decoded (a 48 MP phone camera is below this)
+MAX_PIXELS = 64_000_000
+# Where the face crop sits in portrait selfies: horizontally centred, slightly above the middle
+FACE_CENTERING = (0.5, 0.4)
+
+
+class InvalidImageError(ValueError):
+    """The bytes are not an image in one of the accepted formats."""
+
+
+def _encode_jpeg(image, quality: int) -> bytes:
+    output = io.BytesIO()
+    # No exif/icc arguments: the metadata of the original (GPS, device, ...) is not carried over
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def normalize_face_image(data: bytes, face_size: int, thumbnail_size: int, quality: int) -> dict:
+    """
+    Validates an enrollment photo and derives its stored variants: a square face
+    crop of face_size pixels and a thumbnail_size thumbnail, both baseline JPEG
+    without EXIF and rotated upright according to the EXIF orientation.
+
+    Returns {"content_type", "face", "thumbnail"}. Raises InvalidImageError.
+    CPU-bound; runs in ImageProcessor's worker processes.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format not in CONTENT_TYPES:
+            raise InvalidImageError(f"Unsupported image format {image.format}; use {', '.join(CONTENT_TYPES)}")
+        if image.width * image.height > MAX_PIXELS:
+            raise InvalidImageError(f"Image of {image.width}x{image.height} pixels is too large")
+        content_type = CONTENT_TYPES[image.format]
+        # JPEGs are decoded at the smallest 1/2, 1/4 or 1/8 scale still larger than the crop
+        image.draft("RGB", (face_size, face_size))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(f"Not a valid image: {e}")
+
+    face = ImageOps.fit(image, (face_size, face_size), method=Image.Resampling.LANCZOS, centering=FACE_CENTERING)
+    thumbnail = face.resize((thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS)
+    return {
+        "content_type": content_type,
+        "face": _encode_jpeg(face, quality),
+        "thumbnail": _encode_jpeg(thumbnail, quality),
+    }
+
+
+class ImageProcessor:
+    """
+    Runs normalize_face_image on a process pool, so decoding and resizing
+    photos neither holds the GIL of the API process nor blocks its event loop.
+    """
+
+    @locked_cached_property
+    def executor(self) -> ProcessPoolExecutor:
+        # Workers are spawned rather than forked: the API process has boto3 and executor threads running
+        return ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(self, data: bytes) -> Future:
+        return self.executor.submit(
+            normalize_face_image, data,
+            settings.IMAGE_FACE_SIZE, settings.IMAGE_THUMBNAIL_SIZE, settings.IMAGE_JPEG_QUALITY
+        )
+
+    def normalize_all(self, images: List[bytes]) -> List[dict]:
+        """Normalizes every image in parallel, blocking the calling thread (for AWS executor code)."""
+        futures = [self.submit(data) for data in images]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return _checked(results)
+
+    async def normalize_all_async(self, images: List[bytes]) -> List[dict]:
+        """Normalizes every image in parallel without blocking the event loop."""
+        results = await asyncio.gather(
+            *(asyncio.wrap_future(self.submit(data)) for data in images),
+            return_exceptions=True
+        )
+        return _checked(results)
+
+    def shutdown(self):
+        executor = self.__dict__.pop("executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _checked(results: list) -> List[dict]:
+    """Raises InvalidImageError naming the first invalid image, or the first other error."""
+    for n, result in enumerate(results, start=1):
+        if isinstance(result, InvalidImageError):
+            raise InvalidImageError(f"Image {n}: {result}")
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+image_processor = ImageProcessor()
@@ -0,0 +1,65 @@
+"""
+Moves rows written before the month-sharded keys to the new layout.
+
+Time logs get the timestamp_ms, worker_month and tenant_month attributes their
+range GSIs are keyed on. Attendance records are rewritten under their
+month-suffixed partition key (with the tenant_month and device_month GSI keys)
+and the row under the old key is deleted. Rows already migrated are skipped, so
+it can be re-run after an interruption.
+
+    python -m src.services.partition_migration [--dry-run]
+"""
+import argparse
+import logging
+from typing import List, Optional
+
+from src.core.config import settings
+from src.services.aws_service import AWSService, aws_service
+from src.services.partitions import ATTENDANCE_PARTITION_KEY, attendance_keys, time_log_index_attributes
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_time_logs(aws: AWSService, dry_run: bool = False) -> int:
+    migrated = 0
+    for page in aws.iter_timestamp_pages():
+        pending = [
+            {**item, **time_log_index_attributes(item)}
+            for item in page if item.get("timestamp") and "timestamp_ms" not in item
+        ]
+        if pending and not dry_run:
+            aws.batch_put_items({settings.DYNAMODB_TIMESTAMPS_TABLE: pending})
+        migrated += len(pending)
+    return migrated
+
+
+def migrate_attendance_records(aws: AWSService, dry_run: bool = False) -> int:
+    migrated = 0
+    for page in aws.iter_pages(aws.attendance_table.scan_page):
+        pending = [item for item in page if "tenant_month" not in item]
+        if pending and not dry_run:
+            # The new rows are written before the old ones are deleted, so no record is ever missing
+            unprocessed = aws.batch_put_items({settings.DYNAMODB_ATTENDANCE_TABLE: [
+                {**item, **attendance_keys(item["tenant_id"], item["employee_id"], item["device_id"], int(item["timestamp"]))}
+                for item in pending
+            ]})
+            failed = {item["record_id"] for item in unprocessed.get(settings.DYNAMODB_ATTENDANCE_TABLE, [])}
+            pending = [item for item in pending if item["record_id"] not in failed]
+            aws.attendance_table.delete_many([
+                {ATTENDANCE_PARTITION_KEY: item[ATTENDANCE_PARTITION_KEY], "timestamp": item["timestamp"]} for item in pending
+            ])
+        migrated += len(pending)
+    return migrated
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Move time logs and attendance records to month-sharded keys.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be migrated")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Time logs migrated: {migrate_time_logs(aws_service, args.dry_run)}")
+    logger.info(f"Attendance records migrated: {migrate_attendance_records(aws_service, args.dry_run)}")
+
+if __name__ == "__main__":
+    main()
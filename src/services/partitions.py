@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from typing import List
+
+from src.core.config import settings
+
+ATTENDANCE_PARTITION_KEY = "tenant_id#employee_id"
+
+# Partition keys get a "#YYYY-MM" suffix (spec §8.5, "Hot Partitions"), so an
+# employee, device or tenant that logs all day writes to a new partition every month
+
+
+def month_of(epoch_ms: int) -> str:
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def sharded_key(prefix: str, epoch_ms: int) -> str:
+    """Month-suffixed partition key, e.g. "ACME#EMP001#2025-01"."""
+    return f"{prefix}#{month_of(epoch_ms)}"
+
+
+def month_shards(start_ms: int, end_ms: int) -> List[str]:
+    """Every month touched by [start_ms, end_ms], oldest first."""
+    start = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc)
+    end = datetime.fromtimestamp(end_ms / 1000, tz=timezone.utc)
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def time_log_epoch_ms(iso_timestamp: str) -> int:
+    """Converts the naive UTC ISO timestamp stored on time logs to epoch milliseconds."""
+    return int(datetime.fromisoformat(iso_timestamp).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def time_log_index_attributes(time_log: dict) -> dict:
+    """
+    Attributes that index a time log by worker and by tenant, sorted by time:
+    timestamp_ms is the sort key of both GSIs, worker_month and tenant_month
+    their month-sharded partition keys.
+    """
+    timestamp_ms = time_log_epoch_ms(time_log["timestamp"])
+    return {
+        "timestamp_ms": timestamp_ms,
+        "worker_month": sharded_key(time_log["worker_id"], timestamp_ms),
+        "tenant_month": sharded_key(time_log.get("tenant_id") or settings.DEFAULT_TENANT_ID, timestamp_ms),
+    }
+
+
+def attendance_keys(tenant_id: str, employee_id: str, device_id: str, timestamp_ms: int) -> dict:
+    """
+    Month-sharded keys of an attendance record (spec §8.3): its partition key and
+    the partition keys of the tenant and device GSIs, all sorted by timestamp.
+    """
+    return {
+        ATTENDANCE_PARTITION_KEY: sharded_key(f"{tenant_id}#{employee_id}", timestamp_ms),
+        "tenant_month": sharded_key(tenant_id, timestamp_ms),
+        "device_month": sharded_key(device_id, timestamp_ms),
+    }
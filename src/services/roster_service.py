@@ -0,0 +1,73 @@
+import gzip
+import json
+import threading
+from typing import List, Optional
+
+from src.core.config import settings
+from src.services.aws_service import AWSService
+from src.services.change_feed import DELETED, ROSTER_FIELDS, roster_entry, worker_tenant
+
+# Serializes snapshot and delta builds, so devices asking at once for a new version trigger a single build
+_build_lock = threading.Lock()
+
+
+def roster_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def encode_roster(version: int, full: bool, workers: List[list], deleted: List[str]) -> bytes:
+    """
+    Gzip-compressed JSON roster document. Workers are rows of ROSTER_FIELDS values
+    rather than objects, and mtime=0 makes the bytes depend only on the content.
+    """
+    document = {"version": version, "full": full, "fields": ROSTER_FIELDS, "workers": workers, "deleted": deleted}
+    return gzip.compress(json.dumps(document, separators=(",", ":")).encode(), mtime=0)
+
+
+def build_snapshot(aws: AWSService, tenant_id: str, version: int) -> bytes:
+    """Every worker of the tenant, sorted by id. Reads the workers table once."""
+    workers = [worker for page in aws.iter_worker_pages() for worker in page if worker_tenant(worker) == tenant_id]
+    return encode_roster(version, True, [roster_entry(worker) for worker in sorted(workers, key=lambda w: w["id"])], [])
+
+
+def build_delta(aws: AWSService, tenant_id: str, since: int, version: int) -> Optional[bytes]:
+    """
+    The changes from since to version, one per worker (the latest). Returns None
+    when a delta isn't possible: too many changes, or some expired or missing.
+    """
+    if version - since > settings.ROSTER_DELTA_MAX_CHANGES:
+        return None
+    changes = aws.get_roster_changes(tenant_id, since, version)
+    if len(changes) != version - since:
+        return None
+
+    latest = {change["worker_id"]: change for change in changes}
+    workers = [change["entry"] for change in latest.values() if change["action"] != DELETED]
+    deleted = [worker_id for worker_id, change in latest.items() if change["action"] == DELETED]
+    return encode_roster(version, False, workers, deleted)
+
+
+def get_roster(aws: AWSService, tenant_id: str, version: int, since: Optional[int] = None) -> bytes:
+    """
+    Encoded roster of the tenant at version: a delta from `since` when the device
+    has a version and the changes since then are all kept, a full snapshot
+    otherwise. Each one is built once per process and served from roster_cache.
+    """
+    since = since if since is not None and 0 < since <= version else None
+    key = (tenant_id, version, since)
+    found, body = aws.roster_cache.lookup(key)
+    if found:
+        return body
+
+    with _build_lock:
+        found, body = aws.roster_cache.lookup(key)
+        if found:
+            return body
+        body = build_delta(aws, tenant_id, since, version) if since is not None else None
+        if body is None:
+            found, body = aws.roster_cache.lookup((tenant_id, version, None))
+            if not found:
+                body = build_snapshot(aws, tenant_id, version)
+                aws.roster_cache.set((tenant_id, version, None), body)
+        aws.roster_cache.set(key, body)
+        return body
@@ -0,0 +1,324 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core.config import settings
+from src.core.pagination import json_default
+from src.services.storage import (
+    BLOB_PAGE_SIZE, ActivationCodeUnavailableError, BlobStore, DeviceAlreadyRegisteredError, Storage, Table,
+    TableSchema, blob_not_found, code_is_claimable, device_can_register, project, table_schemas, used_code
+)
+
+# Sorts after every character a key can hold, as the upper bound of a prefix
+_MAX_CHAR = "\U0010ffff"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column_value(value):
+    # Keys and index attributes are stored in their own columns, as SQLite numbers or text
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+class SqliteTable(Table):
+    """
+    A table as an SQLite table: a column per key and index attribute, with an SQLite
+    index per secondary index, and the whole item as JSON.
+    """
+
+    def __init__(self, schema: TableSchema, storage: "SqliteStorage"):
+        super().__init__(schema)
+        self.storage = storage
+        self.name = _quote(schema.name)
+        self.key_columns = [attr for attr in (schema.hash_key, schema.range_key) if attr]
+        index_columns = [attr for keys in schema.indexes.values() for attr in keys if attr]
+        self.columns = list(dict.fromkeys(self.key_columns + index_columns))
+
+    def create_statements(self) -> List[str]:
+        columns = ", ".join(_quote(column) for column in self.columns)
+        primary_key = ", ".join(_quote(column) for column in self.key_columns)
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {self.name} ({columns}, item TEXT NOT NULL, PRIMARY KEY ({primary_key})) WITHOUT ROWID"
+        ]
+        for index_name, keys in self.schema.indexes.items():
+            indexed = ", ".join(_quote(attr) for attr in keys if attr)
+            statements.append(f"CREATE INDEX IF NOT EXISTS {_quote(self.schema.name + ':' + index_name)} ON {self.name} ({indexed})")
+        return statements
+
+    def _key_clause(self, key: dict) -> Tuple[str, list]:
+        return " AND ".join(f"{_quote(column)} = ?" for column in self.key_columns), [_column_value(key[c]) for c in self.key_columns]
+
+    def _read(self, connection, key: dict) -> Optional[dict]:
+        clause, params = self._key_clause(key)
+        row = connection.execute(f"SELECT item FROM {self.name} WHERE {clause}", params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, connection, item: dict):
+        placeholders = ", ".join("?" for _ in range(len(self.columns) + 1))
+        columns = ", ".join(_quote(column) for column in self.columns)
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.name} ({columns}, item) VALUES ({placeholders})",
+            [_column_value(item.get(column)) for column in self.columns] + [json.dumps(item, default=json_default)]
+        )
+
+    def _remove(self, connection, key: dict):
+        clause, params = self._key_clause(key)
+        connection.execute(f"DELETE FROM {self.name} WHERE {clause}", params)
+
+    def get(self, key: dict, projection: Optional[List[str]] = None) -> Optional[dict]:
+        item = self._read(self.storage.connection, key)
+        return None if item is None else project(item, projection)
+
+    def put(self, item: dict):
+        self._write(self.storage.connection, item)
+
+    def update(self, key: dict, changes: dict, unless_set: Optional[str] = None) -> Optional[dict]:
+        with self.storage.transaction() as connection:
+            item = self._read(connection, key)
+            if item is None or (unless_set and item.get(unless_set) is not None):
+                return None
+            item.update(json.loads(json.dumps(changes, default=json_default)))
+            self._write(connection, item)
+            return item
+
+    def increment(self, key: dict, attribute: str, amount: int = 1) -> int:
+        with self.storage.transaction() as connection:
+            item = self._read(connection, key) or json.loads(json.dumps(key, default=json_default))
+            item[attribute] = item.get(attribute, 0) + amount
+            self._write(connection, item)
+            return item[attribute]
+
+    def delete(self, key: dict) -> Optional[dict]:
+        with self.storage.transaction() as connection:
+            item = self._read(connection, key)
+            if item is not None:
+                self._remove(connection, key)
+            return item
+
+    def delete_many(self, keys: List[dict]):
+        with self.storage.transaction() as connection:
+            for key in keys:
+                self._remove(connection, key)
+
+    def _select_page(self, conditions: List[str], params: list, order: List[str], limit: Optional[int],
+                     start_key: Optional[dict], projection: Optional[List[str]]) -> Tuple[List[dict], Optional[dict]]:
+        if start_key:
+            columns = ", ".join(_quote(column) for column in order)
+            conditions.append(f"({columns}) > ({', '.join('?' for _ in order)})")
+            params.extend(_column_value(start_key[column]) for column in order)
+        sql = f"SELECT item FROM {self.name}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY " + ", ".join(_quote(column) for column in order)
+        if limit:
+            # One more than the page, to tell whether another page follows
+            sql += f" LIMIT {int(limit) + 1}"
+        items = [json.loads(row[0]) for row in self.storage.connection.execute(sql, params)]
+        last_key = None
+        if limit and len(items) > limit:
+            items = items[:limit]
+            last_key = self.page_key(items[-1])
+        return [project(item, projection) for item in items], last_key
+
+    def query_page(self, partition, start=None, end=None, index_name: Optional[str] = None,
+                   limit: Optional[int] = None, start_key: Optional[dict] = None,
+                   projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        partition_attr, sort_attr = self.schema.index_keys(index_name)
+        conditions, params = [f"{_quote(partition_attr)} = ?"], [_column_value(partition)]
+        if sort_attr:
+            # Like a GSI, an index only holds the items that have its sort key
+            conditions.append(f"{_quote(sort_attr)} IS NOT NULL")
+            if start is not None:
+                conditions.append(f"{_quote(sort_attr)} >= ?")
+                params.append(_column_value(start))
+            if end is not None:
+                conditions.append(f"{_quote(sort_attr)} <= ?")
+                params.append(_column_value(end))
+        # Sorted by the sort key, then by the item key so items with the same sort key keep a stable order
+        order = ([sort_attr] if sort_attr else []) + [c for c in self.key_columns if c not in (partition_attr, sort_attr)]
+        order = order or self.key_columns
+        return self._select_page(conditions, params, order, limit, start_key, projection)
+
+    def scan_page(self, limit: Optional[int] = None, start_key: Optional[dict] = None,
+                  projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        return self._select_page([], [], self.key_columns, limit, start_key, projection)
+
+
+class FileBlobStore(BlobStore):
+    """Images as files under a directory, with their content type and size in the SQLite database."""
+
+    def __init__(self, root: str, storage: "SqliteStorage"):
+        self.root = Path(root).resolve()
+        self.storage = storage
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid blob key {key!r}")
+        return path
+
+    def url(self, key: str) -> str:
+        return self.path(key).as_uri()
+
+    def put(self, key: str, body: bytes, content_type: str):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file
+        partial = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        partial.write_bytes(body)
+        os.replace(partial, path)
+        self.storage.connection.execute(
+            "INSERT OR REPLACE INTO blobs (key, content_type, size, last_modified) VALUES (?, ?, ?, ?)",
+            (key, content_type, len(body), datetime.now(timezone.utc).timestamp())
+        )
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            raise blob_not_found(key) from None
+
+    def head(self, key: str) -> Optional[dict]:
+        row = self.storage.connection.execute(
+            "SELECT content_type, size, last_modified FROM blobs WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"ContentType": row[0], "ContentLength": row[1], "LastModified": datetime.fromtimestamp(row[2], timezone.utc)}
+
+    def delete_many(self, keys: List[str]):
+        with self.storage.transaction() as connection:
+            connection.executemany("DELETE FROM blobs WHERE key = ?", [(key,) for key in keys])
+        for key in keys:
+            path = self.path(key)
+            path.unlink(missing_ok=True)
+            # Drop the worker's directory once it is empty
+            for parent in path.parents:
+                if parent == self.root:
+                    break
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+
+    def iter_key_pages(self, prefix: str) -> Iterator[List[dict]]:
+        after = ""
+        while True:
+            rows = self.storage.connection.execute(
+                "SELECT key, size, last_modified FROM blobs WHERE key >= ? AND key < ? AND key > ? ORDER BY key LIMIT ?",
+                (prefix, prefix + _MAX_CHAR, after, BLOB_PAGE_SIZE)
+            ).fetchall()
+            if not rows:
+                return
+            yield [
+                {"Key": key, "Size": size, "LastModified": datetime.fromtimestamp(last_modified, timezone.utc)}
+                for key, size, last_modified in rows
+            ]
+            if len(rows) < BLOB_PAGE_SIZE:
+                return
+            after = rows[-1][0]
+
+    def iter_prefixes(self) -> Iterator[str]:
+        rows = self.storage.connection.execute(
+            "SELECT DISTINCT substr(key, 1, instr(key, '/')) AS prefix FROM blobs WHERE instr(key, '/') > 0 ORDER BY prefix"
+        ).fetchall()
+        for (prefix,) in rows:
+            yield prefix
+
+
+class SqliteStorage(Storage):
+    """
+    Tables in one SQLite database in WAL mode, so reads don't wait for writes, and
+    images in a directory. Each thread gets its own connection; writes that read
+    first (conditional updates, device registration) run in IMMEDIATE transactions.
+    Meant for a single API process: SQLite serializes writers.
+    """
+
+    def __init__(self, database_path: str, blob_dir: str):
+        self.database_path = database_path
+        self.tables = {name: SqliteTable(schema, self) for name, schema in table_schemas().items()}
+        self.blobs = FileBlobStore(blob_dir, self)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._created = False
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.database_path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit: transactions are started explicitly by transaction()
+        connection = sqlite3.connect(self.database_path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at each WAL checkpoint rather than at each commit; a power loss can drop the last commits
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._connections.append(connection)
+            if not self._created:
+                for table in self.tables.values():
+                    for statement in table.create_statements():
+                        connection.execute(statement)
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, content_type TEXT, size INTEGER, last_modified REAL)"
+                )
+                self._created = True
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def table(self, name: str) -> Table:
+        return self.tables[name]
+
+    def warm_up(self):
+        self.connection
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def batch_put_items(self, items_by_table: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        with self.transaction() as connection:
+            for table_name, items in items_by_table.items():
+                for item in items:
+                    self.tables[table_name]._write(connection, item)
+        return {}
+
+    def register_device(self, device_data: dict, activation_code: str, registered_at: int):
+        codes = self.tables[settings.DYNAMODB_ACTIVATION_CODES_TABLE]
+        devices = self.tables[settings.DYNAMODB_DEVICES_TABLE]
+        with self.transaction() as connection:
+            code_item = codes._read(connection, {"code": activation_code})
+            if not code_is_claimable(code_item, registered_at):
+                raise ActivationCodeUnavailableError(activation_code, code_item)
+            if not device_can_register(devices._read(connection, {"device_id": device_data["device_id"]})):
+                raise DeviceAlreadyRegisteredError(device_data["device_id"])
+            codes._write(connection, used_code(code_item, device_data["device_id"], registered_at))
+            devices._write(connection, device_data)
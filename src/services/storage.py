@@ -0,0 +1,445 @@
+"""
+Storage engines behind AWSService.
+
+AWSService keeps the caches, change feeds, roster versions and background jobs;
+an engine only stores items and blobs. Items live in tables laid out like the
+DynamoDB ones (spec §8.3): a hash key, an optional range key and secondary
+indexes, each a partition attribute and an optional sort attribute. Blobs are
+the worker images, keyed "<worker_id>/...".
+
+STORAGE_BACKEND picks the engine:
+- "dynamodb": DynamoDB and S3 (dynamodb_storage), the production setup.
+- "memory": MemoryStorage, for tests and benchmarks. Nothing is persisted.
+- "sqlite": SQLite in WAL mode with blobs on the local filesystem (sqlite_storage),
+  for a single-node gateway without AWS.
+"""
+import bisect
+import copy
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from src.core.config import settings
+
+# Objects listed per page, as S3 does
+BLOB_PAGE_SIZE = 1000
+
+
+class ActivationCodeUnavailableError(Exception):
+    """The activation code does not exist, was already used or has expired."""
+    def __init__(self, code: str, code_item: Optional[dict]):
+        super().__init__(f"Activation code {code} is not available")
+        self.code_item = code_item
+
+
+class DeviceAlreadyRegisteredError(Exception):
+    """A device with the same device_id is already registered and active."""
+
+
+class StorageBusyError(Exception):
+    """A table or bucket is saturated; the call was not made, or gave up, and may be retried after retry_after seconds."""
+    def __init__(self, resource: str, retry_after: float):
+        super().__init__(f"{resource} is saturated, retry in {retry_after:.1f}s")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+def project(item: dict, projection: Optional[List[str]]) -> dict:
+    """The attributes of item named in projection (all of them without one), like a ProjectionExpression."""
+    if not projection:
+        return item
+    return {attr: item[attr] for attr in projection if attr in item}
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    name: str
+    hash_key: str
+    range_key: Optional[str] = None
+    # index name -> (partition attribute, sort attribute or None)
+    indexes: Dict[str, Tuple[str, Optional[str]]] = field(default_factory=dict)
+
+    def key_of(self, item: dict) -> dict:
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        return key
+
+    def index_keys(self, index_name: Optional[str]) -> Tuple[str, Optional[str]]:
+        if index_name is None:
+            return self.hash_key, self.range_key
+        return self.indexes[index_name]
+
+
+def table_schemas() -> Dict[str, TableSchema]:
+    """Every table the service uses, by table name, with the keys of its table and indexes."""
+    schemas = [
+        TableSchema(settings.DYNAMODB_WORKERS_TABLE, "id"),
+        TableSchema(settings.DYNAMODB_TIMESTAMPS_TABLE, "id", indexes={
+            "worker_id-index": ("worker_id", None),
+            "worker_month-timestamp_ms-index": ("worker_month", "timestamp_ms"),
+            "tenant_month-timestamp_ms-index": ("tenant_month", "timestamp_ms"),
+        }),
+        TableSchema(settings.DYNAMODB_DEVICES_TABLE, "device_id"),
+        TableSchema(settings.DYNAMODB_ACTIVATION_CODES_TABLE, "code"),
+        TableSchema(settings.DYNAMODB_ATTENDANCE_TABLE, "tenant_id#employee_id", "timestamp", indexes={
+            "tenant_month-timestamp-index": ("tenant_month", "timestamp"),
+            "device_month-timestamp-index": ("device_month", "timestamp"),
+        }),
+        TableSchema(settings.DYNAMODB_TIMESHEET_ROLLUPS_TABLE, "scope", "day"),
+        TableSchema(settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE, "tenant_id", "change_key"),
+        TableSchema(settings.DYNAMODB_ROSTER_TABLE, "tenant_id", "version"),
+        TableSchema(settings.DYNAMODB_AUDIT_LOGS_TABLE, "tenant_id#attendance_id", "timestamp#audit_id"),
+    ]
+    return {schema.name: schema for schema in schemas}
+
+
+def blob_not_found(key: str) -> ClientError:
+    """The error S3's GetObject raises for a missing key, so every engine fails alike."""
+    return ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist.", "Key": key}}, "GetObject"
+    )
+
+
+def code_is_claimable(code_item: Optional[dict], now_ms: int) -> bool:
+    """Whether a device can register with an activation code: pending and not expired."""
+    if not code_item or code_item.get("status") != "pending":
+        return False
+    return code_item.get("expires_at") is None or code_item["expires_at"] >= now_ms
+
+
+def device_can_register(device_item: Optional[dict]) -> bool:
+    """Whether a device_id can be registered: it is new, or its device was deactivated."""
+    return device_item is None or device_item.get("is_active") is False
+
+
+class Table:
+    """
+    Items of one table. Keys are dicts of the hash key (and range key) attributes.
+
+    Pages work like DynamoDB's: a page ends with the key to pass as start_key for
+    the next one, or None after the last page. Queries return items in sort key
+    order within a partition. Reads take an optional projection, the attributes
+    to return; it doesn't change which items a page holds.
+    """
+
+    def __init__(self, schema: TableSchema):
+        self.schema = schema
+
+    def get(self, key: dict, projection: Optional[List[str]] = None) -> Optional[dict]:
+        raise NotImplementedError
+
+    def put(self, item: dict):
+        raise NotImplementedError
+
+    def update(self, key: dict, changes: dict, unless_set: Optional[str] = None) -> Optional[dict]:
+        """
+        Sets attributes of an existing item and returns it updated. Returns None
+        without writing if the item doesn't exist, or if unless_set names an
+        attribute the item already has a non-null value for.
+        """
+        raise NotImplementedError
+
+    def increment(self, key: dict, attribute: str, amount: int = 1) -> int:
+        """Adds amount to a numeric attribute, creating the item at 0 first if needed. Returns the new value."""
+        raise NotImplementedError
+
+    def delete(self, key: dict) -> Optional[dict]:
+        """Deletes an item and returns it, or None if it did not exist."""
+        raise NotImplementedError
+
+    def delete_many(self, keys: List[dict]):
+        raise NotImplementedError
+
+    def query_page(self, partition, start=None, end=None, index_name: Optional[str] = None,
+                   limit: Optional[int] = None, start_key: Optional[dict] = None,
+                   projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        """Items of a partition of the table or of an index, with start <= sort key <= end when given."""
+        raise NotImplementedError
+
+    def scan_page(self, limit: Optional[int] = None, start_key: Optional[dict] = None,
+                  projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        raise NotImplementedError
+
+    def page_key(self, item: dict) -> dict:
+        """The key to resume after item, like DynamoDB's LastEvaluatedKey: its key plus the keys of its indexes."""
+        index_attrs = {attr for keys in self.schema.indexes.values() for attr in keys if attr and attr in item}
+        return {**{attr: item[attr] for attr in index_attrs}, **self.schema.key_of(item)}
+
+
+class BlobStore:
+    """
+    Images by key. head() returns {"ContentLength", "ContentType", "LastModified"}
+    and listed objects are {"Key", "LastModified", "Size"}, as S3 returns them.
+    """
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def put(self, key: str, body: bytes, content_type: str):
+        raise NotImplementedError
+
+    def upload_fileobj(self, key: str, fileobj, content_type: str):
+        self.put(key, fileobj.read(), content_type)
+
+    def get(self, key: str) -> bytes:
+        """The blob's body. Raises ClientError (NoSuchKey, see blob_not_found) if there is none."""
+        raise NotImplementedError
+
+    def head(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def delete_many(self, keys: List[str]):
+        raise NotImplementedError
+
+    def iter_key_pages(self, prefix: str) -> Iterator[List[dict]]:
+        raise NotImplementedError
+
+    def iter_prefixes(self) -> Iterator[str]:
+        """The top-level "folders": one "<worker_id>/" per worker."""
+        raise NotImplementedError
+
+    def presigned_post(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+        """A policy (url and form fields) letting clients upload straight to the store."""
+        raise NotImplementedError(f"{type(self).__name__} does not support direct uploads")
+
+
+class Storage:
+    """A storage engine: the service's tables plus a blob store."""
+
+    blobs: BlobStore
+
+    def table(self, name: str) -> Table:
+        raise NotImplementedError
+
+    def batch_put_items(self, items_by_table: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        """Puts items in several tables. Returns the items, per table, that could not be written."""
+        raise NotImplementedError
+
+    def register_device(self, device_data: dict, activation_code: str, registered_at: int):
+        """
+        Marks the activation code used by the device and inserts the device, both
+        or neither. A deactivated device is replaced. Raises ActivationCodeUnavailableError
+        if the code is missing, not pending or expired, and DeviceAlreadyRegisteredError
+        if the device exists and is active.
+        """
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Builds clients and connections ahead of the first request."""
+
+    def close(self):
+        pass
+
+
+def create_storage(backend: str) -> Storage:
+    if backend == "dynamodb":
+        from src.services.dynamodb_storage import DynamoDBStorage
+        return DynamoDBStorage()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        from src.services.sqlite_storage import SqliteStorage
+        return SqliteStorage(settings.SQLITE_DATABASE_PATH, settings.SQLITE_BLOB_DIR)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
+
+
+def used_code(code_item: dict, device_id: str, now_ms: int) -> dict:
+    return {**code_item, "status": "used", "used_at": now_ms, "used_by_device_id": device_id}
+
+
+class MemoryTable(Table):
+    """
+    Items in a dict, with every index kept as sorted lists of (sort value, item key)
+    per partition, so queries are a bisect and a slice. Items are copied in and out,
+    so callers can't change stored items by mutating what they were given.
+    """
+
+    def __init__(self, schema: TableSchema, lock: threading.RLock):
+        super().__init__(schema)
+        self.lock = lock
+        self._items: Dict[tuple, dict] = {}
+        # index name (None for the table) -> partition value -> sorted [(sort value, item key)]
+        self._indexes: Dict[Optional[str], Dict[object, list]] = {None: {}, **{name: {} for name in schema.indexes}}
+        # Item keys in order, for scans
+        self._keys: List[tuple] = []
+
+    def _key(self, key: dict) -> tuple:
+        return key[self.schema.hash_key], key[self.schema.range_key] if self.schema.range_key else None
+
+    def _entries(self, item: dict, item_key: tuple):
+        for index_name in self._indexes:
+            partition_attr, sort_attr = self.schema.index_keys(index_name)
+            if item.get(partition_attr) is None or (sort_attr and item.get(sort_attr) is None):
+                # Like a GSI, an index only holds the items that have its keys
+                continue
+            yield index_name, item[partition_attr], (item[sort_attr] if sort_attr else None, item_key)
+
+    def _store(self, item: dict):
+        item_key = self._key(item)
+        if item_key in self._items:
+            self._remove(item_key)
+        else:
+            bisect.insort(self._keys, item_key)
+        self._items[item_key] = item
+        for index_name, partition, entry in self._entries(item, item_key):
+            bisect.insort(self._indexes[index_name].setdefault(partition, []), entry)
+
+    def _remove(self, item_key: tuple) -> dict:
+        item = self._items.pop(item_key)
+        for index_name, partition, entry in self._entries(item, item_key):
+            entries = self._indexes[index_name][partition]
+            del entries[bisect.bisect_left(entries, entry)]
+            if not entries:
+                del self._indexes[index_name][partition]
+        return item
+
+    def get(self, key: dict, projection: Optional[List[str]] = None) -> Optional[dict]:
+        with self.lock:
+            item = self._items.get(self._key(key))
+            return None if item is None else copy.deepcopy(project(item, projection))
+
+    def put(self, item: dict):
+        with self.lock:
+            self._store(copy.deepcopy(item))
+
+    def update(self, key: dict, changes: dict, unless_set: Optional[str] = None) -> Optional[dict]:
+        with self.lock:
+            item = self._items.get(self._key(key))
+            if item is None or (unless_set and item.get(unless_set) is not None):
+                return None
+            updated = {**item, **copy.deepcopy(changes)}
+            self._store(updated)
+            return copy.deepcopy(updated)
+
+    def increment(self, key: dict, attribute: str, amount: int = 1) -> int:
+        with self.lock:
+            item = self._items.get(self._key(key)) or dict(key)
+            value = item.get(attribute, 0) + amount
+            self._store({**item, attribute: value})
+            return value
+
+    def delete(self, key: dict) -> Optional[dict]:
+        with self.lock:
+            item_key = self._key(key)
+            if item_key not in self._items:
+                return None
+            self._keys.pop(bisect.bisect_left(self._keys, item_key))
+            return self._remove(item_key)
+
+    def delete_many(self, keys: List[dict]):
+        for key in keys:
+            self.delete(key)
+
+    def _page(self, item_keys: List[tuple], limit: Optional[int],
+              projection: Optional[List[str]]) -> Tuple[List[dict], Optional[dict]]:
+        more = bool(limit) and len(item_keys) > limit
+        if more:
+            item_keys = item_keys[:limit]
+        items = [copy.deepcopy(project(self._items[item_key], projection)) for item_key in item_keys]
+        return items, (self.page_key(self._items[item_keys[-1]]) if more else None)
+
+    def query_page(self, partition, start=None, end=None, index_name: Optional[str] = None,
+                   limit: Optional[int] = None, start_key: Optional[dict] = None,
+                   projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        _, sort_attr = self.schema.index_keys(index_name)
+        with self.lock:
+            entries = self._indexes[index_name].get(partition, [])
+            position, stop = 0, len(entries)
+            if sort_attr and start is not None:
+                position = bisect.bisect_left(entries, start, key=lambda entry: entry[0])
+            if sort_attr and end is not None:
+                stop = bisect.bisect_right(entries, end, key=lambda entry: entry[0])
+            if start_key:
+                after = (start_key[sort_attr] if sort_attr else None, self._key(start_key))
+                position = max(position, bisect.bisect_right(entries, after))
+            # One more than the page, to tell whether another page follows
+            stop = min(stop, position + limit + 1) if limit else stop
+            return self._page([item_key for _, item_key in entries[position:stop]], limit, projection)
+
+    def scan_page(self, limit: Optional[int] = None, start_key: Optional[dict] = None,
+                  projection: Optional[List[str]] = None) -> Tuple[List[dict], Optional[dict]]:
+        with self.lock:
+            position = bisect.bisect_right(self._keys, self._key(start_key)) if start_key else 0
+            item_keys = self._keys[position:position + limit + 1] if limit else self._keys[position:]
+            return self._page(item_keys, limit, projection)
+
+
+class MemoryBlobStore(BlobStore):
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (body, content type, last modified)
+        self._objects: Dict[str, Tuple[bytes, str, datetime]] = {}
+
+    def url(self, key: str) -> str:
+        return f"memory://{settings.S3_BUCKET_NAME}/{key}"
+
+    def put(self, key: str, body: bytes, content_type: str):
+        with self.lock:
+            self._objects[key] = (bytes(body), content_type, datetime.now(timezone.utc))
+
+    def get(self, key: str) -> bytes:
+        with self.lock:
+            if key not in self._objects:
+                raise blob_not_found(key)
+            return self._objects[key][0]
+
+    def head(self, key: str) -> Optional[dict]:
+        with self.lock:
+            if key not in self._objects:
+                return None
+            body, content_type, last_modified = self._objects[key]
+        return {"ContentLength": len(body), "ContentType": content_type, "LastModified": last_modified}
+
+    def delete_many(self, keys: List[str]):
+        with self.lock:
+            for key in keys:
+                self._objects.pop(key, None)
+
+    def iter_key_pages(self, prefix: str) -> Iterator[List[dict]]:
+        with self.lock:
+            objects = [
+                {"Key": key, "LastModified": last_modified, "Size": len(body)}
+                for key, (body, _, last_modified) in sorted(self._objects.items()) if key.startswith(prefix)
+            ]
+        for start in range(0, len(objects), BLOB_PAGE_SIZE):
+            yield objects[start:start + BLOB_PAGE_SIZE]
+
+    def iter_prefixes(self) -> Iterator[str]:
+        with self.lock:
+            prefixes = sorted({key.split("/", 1)[0] + "/" for key in self._objects if "/" in key})
+        yield from prefixes
+
+
+class MemoryStorage(Storage):
+    """Tables and blobs in process memory, guarded by a single lock."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {name: MemoryTable(schema, self.lock) for name, schema in table_schemas().items()}
+        self.blobs = MemoryBlobStore()
+
+    def table(self, name: str) -> Table:
+        return self.tables[name]
+
+    def batch_put_items(self, items_by_table: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        with self.lock:
+            for table_name, items in items_by_table.items():
+                for item in items:
+                    self.tables[table_name].put(item)
+        return {}
+
+    def register_device(self, device_data: dict, activation_code: str, registered_at: int):
+        codes = self.tables[settings.DYNAMODB_ACTIVATION_CODES_TABLE]
+        devices = self.tables[settings.DYNAMODB_DEVICES_TABLE]
+        with self.lock:
+            code_item = codes.get({"code": activation_code})
+            if not code_is_claimable(code_item, registered_at):
+                raise ActivationCodeUnavailableError(activation_code, code_item)
+            if not device_can_register(devices.get({"device_id": device_data["device_id"]})):
+                raise DeviceAlreadyRegisteredError(device_data["device_id"])
+            codes.put(used_code(code_item, device_data["device_id"], registered_at))
+            devices.put(device_data)
@@ -0,0 +1,213 @@
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.core.config import settings
+from src.models.timesheet import TimesheetDay, TimesheetResponse
+from src.services.aws_service import AWSService
+from src.services.partitions import time_log_epoch_ms
+
+DAY_MS = 86_400_000
+MS_PER_HOUR = 3_600_000
+
+WORKER_SCOPE = "worker"
+TENANT_SCOPE = "tenant"
+
+
+def day_start_ms(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def rollup_scope(scope_type: str, scope_id: str) -> str:
+    return f"{scope_type}#{scope_id}"
+
+
+def pair_events(worker_ids: Sequence[str], timestamps_ms: Sequence[int], is_entry: Sequence[bool], max_shift_ms: int) -> dict:
+    """
+    Pairs entry and exit events and sums worked time per worker and UTC day.
+
+    Events are sorted by (worker, time) and every entry that is immediately
+    followed by an exit of the same worker within max_shift_ms forms a pair.
+    Worked time is credited to the day of the entry, so night shifts are not
+    split at midnight. Entries without such an exit and exits without such an
+    entry are counted as unmatched on their own day.
+
+    Returns parallel arrays with one row per (worker, day) that has events:
+    worker, day (days since epoch), worked_ms, pairs, unmatched_entries and
+    unmatched_exits.
+    """
+    # numpy is only needed to build timesheets; keep it out of app start-up
+    import numpy as np
+
+    ts = np.asarray(timestamps_ms, dtype=np.int64)
+    if ts.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {"worker": np.zeros(0, dtype=str), "day": empty, "worked_ms": empty,
+                "pairs": empty, "unmatched_entries": empty, "unmatched_exits": empty}
+
+    workers, codes = np.unique(np.asarray(worker_ids), return_inverse=True)
+    entry = np.asarray(is_entry, dtype=bool)
+    order = np.lexsort((ts, codes))
+    codes, ts, entry = codes[order], ts[order], entry[order]
+
+    gaps = ts[1:] - ts[:-1]
+    opens = np.zeros(ts.size, dtype=bool)
+    opens[:-1] = entry[:-1] & ~entry[1:] & (codes[:-1] == codes[1:]) & (gaps <= max_shift_ms)
+    closes = np.zeros(ts.size, dtype=bool)
+    closes[1:] = opens[:-1]
+    worked = np.zeros(ts.size, dtype=np.int64)
+    worked[:-1] = np.where(opens[:-1], gaps, 0)
+
+    days = ts // DAY_MS
+    groups, group_index = np.unique(np.stack([codes, days], axis=1), axis=0, return_inverse=True)
+    group_index = group_index.reshape(-1)
+    count = lambda mask: np.bincount(group_index, weights=mask, minlength=len(groups)).astype(np.int64)
+
+    return {
+        "worker": workers[groups[:, 0]],
+        "day": groups[:, 1],
+        "worked_ms": count(worked),
+        "pairs": count(opens),
+        "unmatched_entries": count(entry & ~opens),
+        "unmatched_exits": count(~entry & ~closes),
+    }
+
+
+def _load_events(aws: AWSService, scope_type: str, scope_id: str, start_ms: int, end_ms: int) -> Tuple[List[str], List[int], List[bool]]:
+    """Reads a worker's time logs or a tenant's attendance records as (worker, epoch ms, is_entry) columns."""
+    if scope_type == WORKER_SCOPE:
+        items = aws.get_time_logs_in_range(start_ms, end_ms, worker_id=scope_id)
+        return (
+            [item["worker_id"] for item in items],
+            [int(item["timestamp_ms"]) for item in items],
+            [item["event_type"].lower() == "entry" for item in items]
+        )
+
+    items = [
+        item for item in aws.get_tenant_attendance_in_range(scope_id, start_ms, end_ms)
+        if not item.get("deleted_at")
+    ]
+    return (
+        [item["employee_id"] for item in items],
+        [int(item["timestamp"]) for item in items],
+        [item["type"] == "ENTRY" for item in items]
+    )
+
+
+def compute_daily_rollups(aws: AWSService, scope_type: str, scope_id: str, start_ms: int, end_ms: int) -> Dict[str, dict]:
+    """Aggregates the raw events in [start_ms, end_ms] into rollup items keyed by ISO day."""
+    max_shift_ms = settings.TIMESHEET_MAX_SHIFT_HOURS * MS_PER_HOUR
+    totals = pair_events(*_load_events(aws, scope_type, scope_id, start_ms, end_ms), max_shift_ms)
+
+    rollups: Dict[str, dict] = {}
+    scope = rollup_scope(scope_type, scope_id)
+    for row in range(len(totals["day"])):
+        day = (date(1970, 1, 1) + timedelta(days=int(totals["day"][row]))).isoformat()
+        rollup = rollups.setdefault(day, empty_rollup(scope, day, scope_type))
+        worked_seconds = int(totals["worked_ms"][row]) // 1000
+        rollup["worked_seconds"] += worked_seconds
+        rollup["pairs"] += int(totals["pairs"][row])
+        rollup["unmatched_entries"] += int(totals["unmatched_entries"][row])
+        rollup["unmatched_exits"] += int(totals["unmatched_exits"][row])
+        if scope_type == TENANT_SCOPE and worked_seconds:
+            rollup["by_worker"][str(totals["worker"][row])] = worked_seconds
+    return rollups
+
+
+def empty_rollup(scope: str, day: str, scope_type: str) -> dict:
+    rollup = {"scope": scope, "day": day, "worked_seconds": 0, "pairs": 0, "unmatched_entries": 0, "unmatched_exits": 0}
+    if scope_type == TENANT_SCOPE:
+        rollup["by_worker"] = {}
+    return rollup
+
+
+def build_timesheet(
+    aws: AWSService,
+    scope_type: str,
+    scope_id: str,
+    from_day: date,
+    to_day: date,
+    now_ms: Optional[int] = None
+) -> TimesheetResponse:
+    """
+    Returns per-day and per-period hours for a worker or a tenant.
+
+    Materialized daily rollups are read with a single query. Only days without a
+    rollup are recomputed from raw events (with a margin of one maximum shift on
+    each side so pairs crossing the range edges are complete), and those that can
+    no longer change are stored for the next request. Days still open to new
+    events are computed but not stored.
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    max_shift_ms = settings.TIMESHEET_MAX_SHIFT_HOURS * MS_PER_HOUR
+    scope = rollup_scope(scope_type, scope_id)
+
+    rollups = {item["day"]: item for item in aws.get_timesheet_rollups(scope, from_day.isoformat(), to_day.isoformat())}
+    days = [from_day + timedelta(days=n) for n in range((to_day - from_day).days + 1)]
+    missing = [day for day in days if day.isoformat() not in rollups]
+
+    if missing:
+        computed = compute_daily_rollups(
+            aws, scope_type, scope_id,
+            day_start_ms(missing[0]) - max_shift_ms,
+            day_start_ms(missing[-1]) + DAY_MS + max_shift_ms - 1
+        )
+        closed = []
+        for day in missing:
+            rollup = computed.get(day.isoformat()) or empty_rollup(scope, day.isoformat(), scope_type)
+            rollups[day.isoformat()] = rollup
+            if day_start_ms(day) + DAY_MS + max_shift_ms <= now_ms:
+                closed.append(dict(rollup, computed_at=now_ms))
+        if closed:
+            aws.save_timesheet_rollups(closed)
+
+    period_workers: Dict[str, int] = defaultdict(int)
+    timesheet_days = []
+    for day in days:
+        rollup = rollups[day.isoformat()]
+        by_worker = {worker: int(seconds) for worker, seconds in (rollup.get("by_worker") or {}).items()}
+        for worker, seconds in by_worker.items():
+            period_workers[worker] += seconds
+        timesheet_days.append(TimesheetDay(
+            date=day,
+            hours=round(int(rollup["worked_seconds"]) / 3600, 2),
+            pairs=int(rollup["pairs"]),
+            unmatched_entries=int(rollup["unmatched_entries"]),
+            unmatched_exits=int(rollup["unmatched_exits"]),
+            workers={w: round(s / 3600, 2) for w, s in by_worker.items()} if scope_type == TENANT_SCOPE else None
+        ))
+
+    return TimesheetResponse(
+        scope=scope,
+        from_date=from_day,
+        to_date=to_day,
+        total_hours=round(sum(int(rollups[d.isoformat()]["worked_seconds"]) for d in days) / 3600, 2),
+        workers={w: round(s / 3600, 2) for w, s in period_workers.items()} if scope_type == TENANT_SCOPE else None,
+        days=timesheet_days
+    )
+
+
+def time_log_rollup_keys(time_log: dict) -> List[Tuple[str, str]]:
+    """Stored worker rollups made stale by a changed or deleted time log."""
+    if not time_log.get("timestamp"):
+        return []
+    return stale_rollup_keys(WORKER_SCOPE, [(time_log["worker_id"], time_log_epoch_ms(time_log["timestamp"]))])
+
+
+def stale_rollup_keys(scope_type: str, events: List[Tuple[str, int]], now_ms: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Lists the stored (scope, day) rollups invalidated by changed events, given as
+    (scope_id, epoch ms) pairs. Worked time is credited to the entry's day, so
+    the previous day is included too in case the event closes a night shift.
+    Days that are still open are skipped, since their rollups are never stored.
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    max_shift_ms = settings.TIMESHEET_MAX_SHIFT_HOURS * MS_PER_HOUR
+    keys = set()
+    for scope_id, timestamp_ms in events:
+        day = date(1970, 1, 1) + timedelta(days=timestamp_ms // DAY_MS)
+        for affected in (day, day - timedelta(days=1)):
+            if day_start_ms(affected) + DAY_MS + max_shift_ms <= now_ms:
+                keys.add((rollup_scope(scope_type, scope_id), affected.isoformat()))
+    return sorted(keys)
@@ -0,0 +1,94 @@
+"""
+Set-up of each worker process of the pre-fork server (gunicorn.conf.py), run
+right after the fork and before the worker serves anything.
+
+The app is imported once, in the master, and shared by every worker through
+the fork. The AWS layer (clients, table resources, caches, executors, the
+write-behind buffer and background job threads) is built on first use, so the
+master has none of it; each worker builds its own in its lifespan start-up.
+Threads, sockets and connections don't survive a fork, so anything the master
+did build is dropped here rather than used by several processes at once.
+
+Each worker also claims a slot, 0 to N-1, and gets its own write-behind and
+background job journals for it: a journal is replayed by the process that owns
+it, and a worker that replaces a dead one takes over its slot and replays what
+that one left unwritten. Slot 0 is always held by a live worker, so periodic
+jobs that must run once per server, like the orphaned image sweep, run there.
+"""
+import fcntl
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from src.core.config import get_settings, settings
+from src.core.lazy import locked_cached_property
+from src.core.shared_state import shared
+
+logger = logging.getLogger(__name__)
+
+# Journals whose path gets the worker slot
+JOURNAL_SETTINGS = ("WRITE_BEHIND_JOURNAL_PATH", "BACKGROUND_JOBS_JOURNAL_PATH")
+
+# Lock file of the slot held by this process; open for as long as the process lives
+_slot_lock = None
+# This worker's slot; None outside a pre-fork server
+_slot: Optional[int] = None
+
+
+def reset_lazy_attributes(instance):
+    """Drops the locked_cached_property values built on `instance`, so they are built again in this process."""
+    for name, attribute in vars(type(instance)).items():
+        if isinstance(attribute, locked_cached_property):
+            instance.__dict__.pop(name, None)
+
+
+def slot_path(path: str, slot: int) -> str:
+    """data/background-jobs.jsonl -> data/background-jobs.worker-0.jsonl"""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.worker-{slot}{path.suffix}"))
+
+
+def claim_slot(directory: str) -> int:
+    """
+    Takes the lowest slot no other live process holds, with a lock file per slot
+    in `directory`. The kernel releases the lock when the process exits, however it exits.
+    """
+    global _slot_lock
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    slot = 0
+    while True:
+        lock = open(os.path.join(directory, f".worker-{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            slot += 1
+            continue
+        _slot_lock = lock
+        return slot
+
+
+def runs_periodic_jobs() -> bool:
+    """Whether this process schedules the server's periodic jobs: the worker in slot 0, or the only process."""
+    return _slot in (None, 0)
+
+
+def init_worker_process(slot: Optional[int] = None) -> int:
+    """Prepares this freshly forked worker; returns its slot."""
+    global _slot
+    from src.core.rate_limit import rate_limits
+    from src.core.security import device_tokens
+    from src.services.async_aws_service import async_aws_service
+    from src.services.aws_service import aws_service
+
+    for instance in (aws_service, async_aws_service, shared, rate_limits, device_tokens):
+        reset_lazy_attributes(instance)
+
+    if slot is None:
+        slot = claim_slot(str(Path(settings.WRITE_BEHIND_JOURNAL_PATH).parent))
+    _slot = slot
+    for name in JOURNAL_SETTINGS:
+        setattr(get_settings(), name, slot_path(getattr(settings, name), slot))
+    logger.info(f"Worker process {os.getpid()} serving as slot {slot}")
+    return slot
@@ -0,0 +1,260 @@
+import collections
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.core.metrics import write_behind_batch_size, write_behind_rejected
+from src.core.pagination import json_default
+
+logger = logging.getLogger(__name__)
+
+# The journal is truncated once every entry in it is written and it has grown past this size
+JOURNAL_COMPACT_BYTES = 1 << 20
+RETRY_BASE_SECONDS = 0.1
+RETRY_MAX_SECONDS = 10.0
+
+
+class WriteBehindFullError(Exception):
+    """The buffer holds as many unwritten entries as it allows; the caller should retry later."""
+
+
+class Journal:
+    """
+    Append-only JSON-lines file that makes buffered entries survive a crash.
+
+    append(..., sync=True) returns once the line is on disk. Threads appending
+    at the same time share one fsync: while one thread syncs, the others wait,
+    and most find their line already covered when it is their turn.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+
+    def append(self, record: dict, sync: bool = True):
+        line = json.dumps(record, default=json_default, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._written += 1
+            sequence = self._written
+            if not sync:
+                self._file.flush()
+                return
+        with self._sync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                self._file.flush()
+                target = self._written
+            os.fsync(self._file.fileno())
+            self._synced = target
+
+    def size(self) -> int:
+        with self._lock:
+            return self._file.tell()
+
+    def rewrite(self, records: List[dict]):
+        """Replaces the journal's content with records, durably."""
+        with self._sync_lock, self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+            for record in records:
+                self._file.write(json.dumps(record, default=json_default, separators=(",", ":")) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._synced = self._written
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    @staticmethod
+    def read(path: str) -> List[dict]:
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A line torn by a crash was never acknowledged
+                    logger.warning(f"Skipping unreadable line in write-behind journal {path}")
+        return records
+
+
+class WriteBehindBuffer:
+    """
+    Acknowledges writes once they are journaled and writes them in batches.
+
+    submit() appends an entry ({"id", "writes": {table: [items]}}) to the journal
+    and queues it. A background thread flushes the queue with one `write` call
+    (AWSService.batch_put_items) as soon as max_batch entries are waiting or the
+    oldest has waited max_delay_ms. Entries whose items come back unprocessed,
+    or whose batch failed, are retried with jittered exponential backoff, and
+    entries still in the journal when the process starts are queued again.
+
+    Writes are at-least-once: an entry can be written twice after a crash, so its
+    items must be idempotent puts. `stamp(table, item)`, if given, is applied to
+    each item every time it is written, retries and replays included, e.g. to
+    date change-feed entries by when they are stored rather than journaled. When max_pending entries are waiting,
+    submit() raises WriteBehindFullError instead of growing the queue.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Dict[str, List[dict]]], Dict[str, List[dict]]],
+        entry_id: Callable[[str, dict], str],
+        journal_path: str,
+        max_batch: int,
+        max_delay_ms: int,
+        max_pending: int,
+        stamp: Optional[Callable[[str, dict], dict]] = None
+    ):
+        self.write = write
+        self.entry_id = entry_id
+        self.journal_path = journal_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self.stamp = stamp
+        self.journal: Optional[Journal] = None
+        # (queued at, attempt, entry); retried and replayed entries are queued at 0 so they go out first
+        self._queue = collections.deque()
+        # (due at, sequence, attempt, entry)
+        self._retries = []
+        self._retry_sequence = 0
+        self._outstanding = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Opens the journal, queues the entries it still holds and starts the flush thread."""
+        completed, pending = set(), {}
+        for record in Journal.read(self.journal_path):
+            if "done" in record:
+                completed.update(record["done"])
+            else:
+                pending[record["id"]] = record
+        pending = [entry for entry_id, entry in pending.items() if entry_id not in completed]
+
+        self.journal = Journal(self.journal_path)
+        self.journal.rewrite(pending)
+        if pending:
+            logger.info(f"Replaying {len(pending)} write-behind entries from {self.journal_path}")
+        with self._cond:
+            self._stopping = False
+            self._outstanding += len(pending)
+            self._queue.extend((0, 0, entry) for entry in pending)
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flushes the queued entries and stops. Entries waiting for a retry stay in the journal."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still writing; whatever it doesn't finish is replayed from the journal on the next start
+                return
+            self._thread = None
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def submit(self, entry_id: str, writes: Dict[str, List[dict]]):
+        """Journals an entry and queues it. Returns once it is durable; raises WriteBehindFullError if full."""
+        with self._cond:
+            if self._outstanding >= self.max_pending:
+                write_behind_rejected.inc()
+                raise WriteBehindFullError(f"{self._outstanding} entries are waiting to be written")
+            self._outstanding += 1
+
+        entry = {"id": entry_id, "writes": writes}
+        try:
+            self.journal.append(entry)
+        except Exception:
+            with self._cond:
+                self._outstanding -= 1
+            raise
+
+        with self._cond:
+            self._queue.append((time.monotonic(), 0, entry))
+            # The first entry starts the max_delay timer, a full batch is flushed right away
+            if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+                self._cond.notify()
+
+    def pending(self) -> int:
+        """Entries acknowledged but not written yet."""
+        with self._cond:
+            return self._outstanding
+
+    def _next_batch(self) -> Optional[List[tuple]]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._retries and self._retries[0][0] <= now:
+                    _, _, attempt, entry = heapq.heappop(self._retries)
+                    self._queue.appendleft((0, attempt, entry))
+                if self._queue and (self._stopping or len(self._queue) >= self.max_batch
+                                    or now - self._queue[0][0] >= self.max_delay):
+                    return [self._queue.popleft()[1:] for _ in range(min(self.max_batch, len(self._queue)))]
+                if self._stopping:
+                    return None
+                deadlines = [self._queue[0][0] + self.max_delay] if self._queue else []
+                deadlines += [self._retries[0][0]] if self._retries else []
+                self._cond.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch: List[tuple]):
+        writes: Dict[str, List[dict]] = {}
+        for _, entry in batch:
+            for table_name, items in entry["writes"].items():
+                if self.stamp is not None:
+                    items = [self.stamp(table_name, item) for item in items]
+                writes.setdefault(table_name, []).extend(items)
+
+        write_behind_batch_size.observe(len(batch))
+        try:
+            unprocessed = self.write(writes)
+            failed = {self.entry_id(table_name, item) for table_name, items in unprocessed.items() for item in items}
+        except Exception as e:
+            logger.error(f"Write-behind batch of {len(batch)} entries failed: {e}")
+            failed = {entry["id"] for _, entry in batch}
+
+        done = [entry["id"] for _, entry in batch if entry["id"] not in failed]
+        if done:
+            # Not synced: losing this line only means the entries are written again after a crash
+            self.journal.append({"done": done}, sync=False)
+
+        with self._cond:
+            self._outstanding -= len(done)
+            for attempt, entry in batch:
+                if entry["id"] in failed:
+                    delay = random.uniform(0, min(RETRY_BASE_SECONDS * 2 ** attempt, RETRY_MAX_SECONDS))
+                    self._retry_sequence += 1
+                    heapq.heappush(self._retries, (time.monotonic() + delay, self._retry_sequence, attempt + 1, entry))
+            # The journal only holds finished entries; start it over before it grows unbounded
+            if self._outstanding == 0 and self.journal.size() > JOURNAL_COMPACT_BYTES:
+                self.journal.rewrite([])
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+# moto must be imported before any boto3 client is created so its request hooks apply
+from moto import mock_aws
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("S3_BUCKET_NAME", "test-bucket")
+os.environ.setdefault("DYNAMODB_WORKERS_TABLE", "test-workers")
+os.environ.setdefault("DYNAMODB_TIMESTAMPS_TABLE", "test-timestamps")
+
+
+@pytest.fixture
+def mocked_aws(tmp_path, monkeypatch):
+    """Starts moto and creates the bucket and tables the service expects."""
+    with mock_aws():
+        import boto3
+        from src.core.config import get_settings, settings
+
+        monkeypatch.setattr(get_settings(), "BACKGROUND_JOBS_JOURNAL_PATH", str(tmp_path / "background-jobs.jsonl"))
+
+        boto3.client("s3", region_name=settings.AWS_REGION).create_bucket(Bucket=settings.S3_BUCKET_NAME)
+        dynamodb = boto3.client("dynamodb", region_name=settings.AWS_REGION)
+        for table_name, hash_key, range_key, indexes in [
+            (settings.DYNAMODB_WORKERS_TABLE, ("id", "S"), None, {}),
+            (settings.DYNAMODB_TIMESTAMPS_TABLE, ("id", "S"), None, {
+                "worker_id-index": (("worker_id", "S"), None),
+                "worker_month-timestamp_ms-index": (("worker_month", "S"), ("timestamp_ms", "N")),
+                "tenant_month-timestamp_ms-index": (("tenant_month", "S"), ("timestamp_ms", "N")),
+            }),
+            (settings.DYNAMODB_DEVICES_TABLE, ("device_id", "S"), None, {}),
+            (settings.DYNAMODB_ACTIVATION_CODES_TABLE, ("code", "S"), None, {}),
+            (settings.DYNAMODB_ATTENDANCE_TABLE, ("tenant_id#employee_id", "S"), ("timestamp", "N"),
+             {"tenant_month-timestamp-index": (("tenant_month", "S"), ("timestamp", "N")),
+              "device_month-timestamp-index": (("device_month", "S"), ("timestamp", "N"))}),
+            (settings.DYNAMODB_TIMESHEET_ROLLUPS_TABLE, ("scope", "S"), ("day", "S"), {}),
+            (settings.DYNAMODB_ATTENDANCE_CHANGES_TABLE, ("tenant_id", "S"), ("change_key", "S"), {}),
+            (settings.DYNAMODB_ROSTER_TABLE, ("tenant_id", "S"), ("version", "N"), {}),
+            (settings.DYNAMODB_AUDIT_LOGS_TABLE, ("tenant_id#attendance_id", "S"), ("timestamp#audit_id", "S"), {}),
+        ]:
+            key_schema = lambda hash_key, range_key: [{"AttributeName": hash_key[0], "KeyType": "HASH"}] + (
+                [{"AttributeName": range_key[0], "KeyType": "RANGE"}] if range_key else [])
+            attributes = {hash_key, range_key} | {key for keys in indexes.values() for key in keys}
+            extra = {}
+            if indexes:
+                extra["GlobalSecondaryIndexes"] = [
+                    {"IndexName": name, "KeySchema": key_schema(*keys), "Projection": {"ProjectionType": "ALL"}}
+                    for name, keys in indexes.items()
+                ]
+            dynamodb.create_table(
+                TableName=table_name,
+                KeySchema=key_schema(hash_key, range_key),
+                AttributeDefinitions=[{"AttributeName": name, "AttributeType": attr_type} for name, attr_type in attributes - {None}],
+                BillingMode="PAY_PER_REQUEST",
+                **extra
+            )
+        yield
+
+        # The service is a process-wide singleton; drop cached items from this test's tables
+        from src.services.aws_service import aws_service
+        aws_service.stop_background_jobs()
+        from src.core.rate_limit import rate_limits
+        rate_limits.store.clear()
+        from src.core.security import device_tokens
+        device_tokens.cache.clear()
+        for cache in (
+            aws_service.worker_cache, aws_service.device_cache, aws_service.activation_code_cache,
+            aws_service.roster_version_cache, aws_service.roster_cache
+        ):
+            cache.clear()
+
+
+@pytest.fixture
+def client(mocked_aws):
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def device_headers(mocked_aws):
+    """Returns a function giving the headers of a registered, active device of a tenant."""
+    def headers(tenant_id="ACME", device_id="device-1"):
+        from src.core.security import create_device_token
+        from src.services.aws_service import aws_service
+
+        aws_service.save_device_registration({"device_id": device_id, "tenant_id": tenant_id, "is_active": True})
+        token = create_device_token({"tenant_id": tenant_id, "device_id": device_id})
+        return {"X-Tenant-ID": tenant_id, "Authorization": f"Bearer {token}"}
+
+    return headers
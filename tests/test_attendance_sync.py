@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+
+def record(local_id, employee_id, timestamp, device_id="device-1", type_="ENTRY"):
+    return {
+        "local_id": local_id,
+        "employee_id": employee_id,
+        "type": type_,
+        "timestamp": timestamp,
+        "confidence": 0.95,
+        "liveness_passed": True,
+        "device_id": device_id,
+        "created_at": timestamp
+    }
+
+
+@pytest.fixture
+def now_ms():
+    return int(time.time() * 1000) - 12 * 3_600_000
+
+
+def test_sync_stores_records_and_reports_duplicates(client, now_ms, device_headers):
+    records = [
+        record(1, "EMP001", now_ms),
+        record(2, "EMP001", now_ms + 10_000),  # within 30 s of record 1
+        record(3, "EMP001", now_ms + 8 * 3_600_000, type_="EXIT"),
+        record(4, "EMP002", now_ms),
+    ]
+
+    response = client.post("/api/attendance/sync", json={"records": records}, headers=device_headers())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["local_id"] for r in body["synced_records"]] == [1, 3, 4]
+    assert [c["local_id"] for c in body["conflicts"]] == [2]
+    assert body["conflicts"][0]["reason"] == "DUPLICATE_TIMESTAMP"
+    assert body["conflicts"][0]["existing_record"]["server_id"] == body["synced_records"][0]["server_id"]
+
+    # Another device clocking the same employee 20 s later is rejected against the stored record
+    retry = client.post(
+        "/api/attendance/sync",
+        json={"records": [record(9, "EMP002", now_ms + 20_000, device_id="device-2")]},
+        headers=device_headers(device_id="device-2")
+    )
+    assert retry.json()["synced_count"] == 0
+    assert retry.json()["conflicts"][0]["existing_record"]["device_id"] == "device-1"
+
+
+def test_replayed_batch_is_idempotent(client, now_ms, device_headers):
+    payload = {"records": [record(1, "EMP001", now_ms), record(2, "EMP002", now_ms)]}
+
+    first = client.post("/api/attendance/sync", json=payload, headers=device_headers()).json()
+    second = client.post("/api/attendance/sync", json=payload, headers=device_headers()).json()
+
+    assert second["conflicts"] == []
+    assert [r["server_id"] for r in second["synced_records"]] == [r["server_id"] for r in first["synced_records"]]
+
+
+def test_replay_of_a_deleted_record_keeps_the_deletion(client, now_ms, device_headers):
+    from src.services.aws_service import aws_service
+
+    payload = {"records": [record(1, "EMP001", now_ms)]}
+    first = client.post("/api/attendance/sync", json=payload, headers=device_headers()).json()
+    client.request(
+        "DELETE", f"/api/attendance/records/EMP001/{now_ms}",
+        json={"deleted_by_admin_id": 42, "deletion_reason": "Registro erróneo"}, headers={"X-Tenant-ID": "ACME"}
+    )
+
+    replay = client.post("/api/attendance/sync", json=payload, headers=device_headers()).json()
+    assert replay["synced_records"][0]["server_id"] == first["synced_records"][0]["server_id"]
+    # Another record can't take the deleted record's timestamp either
+    other = client.post(
+        "/api/attendance/sync", json={"records": [record(7, "EMP001", now_ms, device_id="device-2")]},
+        headers=device_headers(device_id="device-2")
+    ).json()
+    assert [c["existing_record"]["server_id"] for c in other["conflicts"]] == [first["synced_records"][0]["server_id"]]
+
+    stored = aws_service.get_attendance_records_in_range("ACME", "EMP001", now_ms, now_ms)
+    assert [(item["record_id"], item["deletion_reason"]) for item in stored] == [
+        (first["synced_records"][0]["server_id"], "Registro erróneo")
+    ]
+
+
+def test_large_batch_is_written_in_chunks(client, now_ms, device_headers):
+    records = [record(i, f"EMP{i:03d}", now_ms) for i in range(60)]
+
+    response = client.post("/api/attendance/sync", json={"records": records}, headers=device_headers())
+
+    assert response.json()["synced_count"] == 60
+
+
+def test_future_timestamps_are_rejected(client, device_headers):
+    future = int(time.time() * 1000) + 3_600_000
+
+    response = client.post("/api/attendance/sync", json={"records": [record(1, "EMP001", future)]}, headers=device_headers())
+
+    assert response.json()["errors"][0]["reason"] == "INVALID_TIMESTAMP"
+
+
+def test_records_of_another_device_are_rejected(client, now_ms, device_headers):
+    records = [record(1, "EMP001", now_ms), record(2, "EMP002", now_ms, device_id="device-2")]
+
+    response = client.post("/api/attendance/sync", json={"records": records}, headers=device_headers())
+
+    body = response.json()
+    assert [r["local_id"] for r in body["synced_records"]] == [1]
+    assert [(e["local_id"], e["reason"]) for e in body["errors"]] == [(2, "DEVICE_MISMATCH")]
+
+
+def test_too_many_records(client, now_ms, device_headers):
+    records = [record(i, "EMP001", now_ms + i * 60_000) for i in range(101)]
+
+    response = client.post("/api/attendance/sync", json={"records": records}, headers=device_headers())
+
+    assert response.status_code == 413
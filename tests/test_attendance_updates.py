@@ -0,0 +1,79 @@
+import time
+
+from src.services.attendance_service import get_attendance_updates
+
+TENANT_HEADERS = {"X-Tenant-ID": "ACME"}
+
+
+def record(local_id, employee_id, timestamp, device_id="device-1"):
+    return {
+        "local_id": local_id, "employee_id": employee_id, "type": "ENTRY", "timestamp": timestamp,
+        "confidence": 0.95, "liveness_passed": True, "device_id": device_id, "created_at": timestamp
+    }
+
+
+def test_updates_page_through_creations_and_deletions(client, mocked_aws, device_headers):
+    from src.services.aws_service import aws_service
+
+    now_ms = int(time.time() * 1000)
+    started = now_ms - 60_000
+    records = [record(i, f"EMP{i:03d}", now_ms - 3_600_000 + i * 60_000) for i in range(5)]
+    client.post("/api/attendance/sync", json={"records": records}, headers=device_headers())
+    deleted = client.request(
+        "DELETE", f"/api/attendance/records/EMP002/{records[2]['timestamp']}",
+        json={"deleted_by_admin_id": 42, "deletion_reason": "Registro erróneo"}, headers=TENANT_HEADERS
+    )
+    assert deleted.status_code == 204
+
+    # Poll as if the settle window had passed, two changes per page
+    polled_at = int(time.time() * 1000) + 10_000
+    first = get_attendance_updates(aws_service, "ACME", started, 2, now_ms=polled_at)
+    pages = [first]
+    while pages[-1].next_cursor:
+        pages.append(get_attendance_updates(aws_service, "ACME", started, 2, pages[-1].next_cursor))
+
+    updates = [update for page in pages for update in page.updates]
+    # Changes of one sync share a timestamp, so only the order across writes is fixed
+    assert sorted((u.employee_id, u.action) for u in updates[:5]) == [(f"EMP{i:03d}", "CREATED") for i in range(5)]
+    assert (updates[5].employee_id, updates[5].action) == ("EMP002", "DELETED")
+    assert updates[-1].deletion_reason == "Registro erróneo"
+    assert {page.last_sync_timestamp for page in pages} == {polled_at - 5000}
+
+    # Polling again from the returned watermark only sees what changed since
+    again = get_attendance_updates(aws_service, "ACME", first.last_sync_timestamp, 100, now_ms=polled_at + 60_000)
+    assert again.updates == []
+    assert again.last_sync_timestamp == polled_at + 55_000
+
+
+def test_updates_hold_back_recent_changes_and_isolate_tenants(client, device_headers):
+    now_ms = int(time.time() * 1000)
+    client.post("/api/attendance/sync", json={"records": [record(1, "EMP001", now_ms - 60_000)]}, headers=device_headers())
+    client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry", "tenant_id": "ACME"})
+
+    # Changes younger than the settle window are not returned yet
+    response = client.get("/api/attendance/updates", params={"since": now_ms - 120_000}, headers=device_headers())
+    assert response.status_code == 200
+    assert response.json()["updates"] == []
+    assert response.json()["last_sync_timestamp"] < now_ms
+
+    other = client.get("/api/attendance/updates", params={"since": 0}, headers=device_headers("OTHER", "device-9"))
+    assert other.json()["updates"] == []
+    bad_cursor = client.get("/api/attendance/updates", params={"since": 0, "cursor": "bm9wZQ"}, headers=device_headers())
+    assert bad_cursor.status_code == 400
+
+
+def test_time_log_changes_reach_the_feed(client, mocked_aws):
+    from src.services.aws_service import aws_service
+
+    started = int(time.time() * 1000) - 1000
+    log = client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry", "tenant_id": "ACME"}).json()
+    client.put(f"/api/timestamps/{log['id']}", json={"event_type": "exit"})
+    client.delete(f"/api/timestamps/{log['id']}")
+
+    updates = get_attendance_updates(aws_service, "ACME", started, 100, now_ms=started + 60_000).updates
+
+    assert [(u.source, u.server_id, u.type, u.action) for u in updates] == [
+        ("timestamp", log["id"], "ENTRY", "CREATED"),
+        ("timestamp", log["id"], "EXIT", "UPDATED"),
+        ("timestamp", log["id"], "EXIT", "DELETED"),
+    ]
@@ -0,0 +1,119 @@
+import gzip
+import json
+
+import pytest
+
+
+def audit(local_id, attendance_id=123, timestamp=1706140900000, **fields):
+    return {
+        "local_id": local_id, "attendance_id": attendance_id, "action": "CANCELLED_BY_USER",
+        "employee_id_detected": "EMP001", "employee_id_actual": None, "performed_by_user_id": None,
+        "reason": "Usuario rechazó identificación", "metadata": json.dumps({"confidence": 0.82, "frame": "[]{}"}),
+        "timestamp": timestamp, **fields
+    }
+
+
+def test_array_items_are_parsed_as_they_arrive():
+    from src.core.request_body import JSONArrayStream
+
+    body = json.dumps({"device": {"model": "Tab [A7]"}, "audits": [audit(1), audit(2, metadata="\"}]")], "count": 2})
+    parser = JSONArrayStream("audits")
+    items = []
+    # One character at a time: items are returned as soon as they are complete, no sooner
+    for position, char in enumerate(body):
+        for item in parser.feed(char):
+            items.append((position, item))
+    items += [(len(body), item) for item in parser.close()]
+
+    assert [item["local_id"] for _, item in items] == [1, 2]
+    assert items[1][1]["metadata"] == "\"}]"
+    assert items[0][0] < body.index('"local_id": 2')
+
+    for malformed in ('{"audits": [1, 2', '{"audits": [1 2]}', '[{"local_id": 1}]', '{"audits": []} {}'):
+        parser = JSONArrayStream("audits")
+        with pytest.raises(ValueError):
+            parser.feed(malformed)
+            parser.close()
+
+
+def test_compressed_audits_are_stored_by_attendance(client, device_headers):
+    import zstandard
+    from src.services.audit_service import audit_id, audit_sort_key
+    from src.services.aws_service import aws_service
+
+    headers = device_headers()
+    body = json.dumps({"audits": [audit(501), audit(502, attendance_id="att-9", timestamp=1706140950000)]}).encode()
+
+    response = client.post("/api/audit/sync", content=gzip.compress(body), headers={**headers, "Content-Encoding": "gzip"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["synced_count"] == 2 and result["errors"] == []
+    assert [synced["server_id"] for synced in result["synced_audits"]] == [
+        audit_id("ACME", "device-1", 501), audit_id("ACME", "device-1", 502)
+    ]
+    sort_key = audit_sort_key(1706140950000, audit_id("ACME", "device-1", 502))
+    stored = aws_service.audit_logs_table.get({"tenant_id#attendance_id": "ACME#att-9", "timestamp#audit_id": sort_key})
+    assert stored["device_id"] == "device-1" and stored["metadata"] == audit(502)["metadata"]
+
+    # A replay of the same audits, zstd-compressed this time, is stored once with the same ids
+    replay = client.post(
+        "/api/audit/sync", content=zstandard.ZstdCompressor().compress(body), headers={**headers, "Content-Encoding": "zstd"}
+    )
+    assert [s["server_id"] for s in replay.json()["synced_audits"]] == [s["server_id"] for s in result["synced_audits"]]
+    items, _ = aws_service.audit_logs_table.query_page("ACME#123")
+    assert len(items) == 1
+
+
+def test_audits_of_a_record_at_the_same_time_are_all_kept(client, device_headers):
+    from src.services.aws_service import aws_service
+
+    # Other devices' audits of the same record and millisecond, in separate requests
+    first = client.post("/api/audit/sync", json={"audits": [audit(1)]}, headers=device_headers()).json()
+    second = client.post(
+        "/api/audit/sync", json={"audits": [audit(2)]}, headers=device_headers(device_id="device-2")
+    ).json()
+    assert first["synced_count"] == second["synced_count"] == 1
+
+    items, _ = aws_service.audit_logs_table.query_page("ACME#123")
+    assert sorted((item["device_id"], item["local_id"]) for item in items) == [("device-1", 1), ("device-2", 2)]
+    assert {item["audit_id"] for item in items} == {
+        first["synced_audits"][0]["server_id"], second["synced_audits"][0]["server_id"]
+    }
+
+
+def test_audits_are_written_in_batches_while_parsing(client, device_headers, monkeypatch):
+    from src.services.aws_service import aws_service
+
+    batches = []
+    batch_put_items = aws_service.batch_put_items
+
+    def spy(items_by_table):
+        batches.append(sum(len(items) for items in items_by_table.values()))
+        return batch_put_items(items_by_table)
+
+    monkeypatch.setattr(aws_service, "batch_put_items", spy)
+    audits = [audit(local_id, attendance_id=local_id) for local_id in range(60)]
+    # The same audit twice in a batch is written once; another audit of the same record and time is kept too
+    audits += [audit(55, attendance_id=55), audit(99, attendance_id=55), {"local_id": 100, "timestamp": "soon"}]
+
+    response = client.post("/api/audit/sync", json={"audits": audits}, headers=device_headers())
+    result = response.json()
+    assert batches == [25, 25, 11]
+    assert result["synced_count"] == 62
+    assert [(error["local_id"], error["reason"]) for error in result["errors"]] == [(100, "INVALID_RECORD")]
+
+
+def test_rejected_bodies(client, device_headers, monkeypatch):
+    from src.core.config import get_settings
+
+    headers = device_headers()
+    body = json.dumps({"audits": [audit(1)]}).encode()
+    assert client.post("/api/audit/sync", content=body, headers={"X-Tenant-ID": "ACME"}).status_code == 401
+    assert client.post("/api/audit/sync", content=body, headers={**headers, "Content-Encoding": "br"}).status_code == 415
+    assert client.post("/api/audit/sync", content=body, headers={**headers, "Content-Encoding": "gzip"}).status_code == 400
+    assert client.post("/api/audit/sync", content=b'{"records": []}', headers=headers).status_code == 422
+
+    monkeypatch.setattr(get_settings(), "AUDIT_SYNC_MAX_BODY_BYTES", 1024 * 1024)
+    bomb = gzip.compress(b'{"audits": [' + b" " * (8 * 1024 * 1024) + b"]}")
+    response = client.post("/api/audit/sync", content=bomb, headers={**headers, "Content-Encoding": "gzip"})
+    assert response.status_code == 413
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+
+def throttled(operation="GetItem"):
+    return ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Slow down"}}, operation)
+
+
+@pytest.fixture
+def guard_settings(monkeypatch):
+    from src.core.config import get_settings
+
+    def configure(**values):
+        values = {
+            "AWS_THROTTLE_BACKOFF_BASE_SECONDS": 0.001, "AWS_THROTTLE_BACKOFF_MAX_SECONDS": 0.001,
+            "AWS_ADAPTIVE_RATE_MIN": 100, **values
+        }
+        for name, value in values.items():
+            monkeypatch.setattr(get_settings(), name, value)
+
+    return configure
+
+
+def flaky(failures):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise throttled()
+        return "ok"
+
+    return call, calls
+
+
+def test_throttled_calls_are_retried_and_then_paced(guard_settings):
+    from src.core.metrics import aws_throttle_retries
+    from src.services.aws_resilience import ResilienceGuard
+
+    guard_settings()
+    guard = ResilienceGuard("table-retried")
+    call, calls = flaky(failures=2)
+
+    assert guard.call(call) == "ok" and len(calls) == 3
+    assert aws_throttle_retries.value("table-retried", "retried") == 2
+    # Throttled while unlimited, so calls are now paced, and pacing recovers as calls succeed
+    assert guard.limiter.rate is not None
+
+    guard.limiter._adjusted_at -= 3600
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.limiter.rate is None
+
+
+def test_retries_stop_when_the_budget_is_spent(guard_settings):
+    from src.core.metrics import aws_throttle_retries
+    from src.services.aws_resilience import ResilienceGuard
+    from src.services.storage import StorageBusyError
+
+    guard_settings(AWS_RETRY_BUDGET_MIN_PER_SECOND=0, AWS_RETRY_BUDGET_RATIO=1, AWS_CIRCUIT_FAILURE_THRESHOLD=100)
+    guard = ResilienceGuard("table-budget")
+    guard.call(lambda: "ok")
+    call, calls = flaky(failures=10)
+
+    with pytest.raises(StorageBusyError):
+        guard.call(call)
+    # One retry was saved up by the successful call
+    assert len(calls) == 2
+    assert aws_throttle_retries.value("table-budget", "budget_exhausted") == 1
+
+
+def test_circuit_fails_fast_then_closes_after_a_successful_probe(guard_settings):
+    from src.core.metrics import aws_circuit_state, aws_requests_rejected
+    from src.services.aws_resilience import CLOSED, OPEN, ResilienceGuard
+    from src.services.storage import StorageBusyError
+
+    guard_settings(AWS_THROTTLE_MAX_ATTEMPTS=1, AWS_CIRCUIT_FAILURE_THRESHOLD=2, AWS_CIRCUIT_OPEN_SECONDS=0.05)
+    guard = ResilienceGuard("table-circuit")
+    call, calls = flaky(failures=2)
+
+    for _ in range(2):
+        with pytest.raises(StorageBusyError):
+            guard.call(call)
+    assert guard.breaker.state == OPEN and aws_circuit_state.value("table-circuit") == OPEN
+
+    with pytest.raises(StorageBusyError) as rejected:
+        guard.call(call)
+    assert len(calls) == 2 and 0 < rejected.value.retry_after <= 0.05
+    assert aws_requests_rejected.value("table-circuit", "circuit_open") == 1
+
+    time.sleep(0.06)
+    assert guard.call(call) == "ok"
+    assert guard.breaker.state == CLOSED and aws_circuit_state.value("table-circuit") == CLOSED
+
+
+def test_other_errors_are_raised_unchanged(guard_settings):
+    from src.services.aws_resilience import CLOSED, ResilienceGuard
+
+    guard_settings()
+    guard = ResilienceGuard("table-errors")
+
+    def missing():
+        raise ClientError({"Error": {"Code": "ResourceNotFoundException", "Message": "No table"}}, "GetItem")
+
+    with pytest.raises(ClientError):
+        guard.call(missing)
+    assert guard.breaker.state == CLOSED and guard.limiter.rate is None
+
+
+def test_saturated_table_is_answered_with_503_and_retry_after(client, guard_settings, monkeypatch):
+    from src.services.aws_resilience import ResilienceGuard
+    from src.services.aws_service import aws_service
+
+    guard_settings(AWS_THROTTLE_MAX_ATTEMPTS=2, AWS_CIRCUIT_FAILURE_THRESHOLD=1, AWS_CIRCUIT_OPEN_SECONDS=30)
+    table = aws_service.workers_table
+    monkeypatch.setattr(table, "guard", ResilienceGuard(table.schema.name))
+
+    class SaturatedTable:
+        def get_item(self, **kwargs):
+            raise throttled()
+
+    monkeypatch.setattr(table, "resource", SaturatedTable())
+
+    saturated = client.get("/api/workers/worker-1")
+    assert saturated.status_code == 503 and saturated.headers["Retry-After"] == "30"
+    assert client.get("/api/workers/worker-2").headers["Retry-After"] in ("29", "30")
+
+    metrics = client.get("/metrics").text
+    assert f'aws_circuit_state{{resource="{table.schema.name}"}} 1' in metrics
+    assert f'aws_requests_rejected_total{{resource="{table.schema.name}",reason="circuit_open"}} 1' in metrics
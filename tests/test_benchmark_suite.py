@@ -0,0 +1,24 @@
+from benchmarks.suite import compare
+
+
+def result(rps, p50, p95, requests=1000, errors=0):
+    return {"requests_per_second": rps, "p50_ms": p50, "p95_ms": p95, "requests": requests, "errors": errors}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"scenarios": {
+        "workers.get": result(200, 40, 80),
+        "workers.list_page": result(5, 2000, 2500, requests=20),
+        "devices.register": result(20, 450, 600),
+    }}
+    current = {"scenarios": {
+        "workers.get": result(190, 45, 85),                      # within 25%
+        "workers.list_page": result(5, 2100, 4000, requests=20),  # p95 too noisy to compare
+        "devices.register": result(12, 700, 600, errors=3),
+        "timestamps.get": result(100, 50, 90),                   # not in the baseline
+    }}
+
+    regressions = compare(current, baseline, tolerance=0.25)
+
+    assert len(regressions) == 3
+    assert all(r.startswith("devices.register") for r in regressions)
@@ -0,0 +1,81 @@
+from src.core.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache("test", maxsize=10, ttl=30, clock=clock)
+    cache.set("a", {"id": "a"})
+
+    clock.now = 29
+    assert cache.lookup("a") == (True, {"id": "a"})
+    clock.now = 31
+    assert cache.lookup("a") == (False, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test", maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.lookup("a")
+    cache.set("c", 3)
+
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_missing_items_are_negatively_cached():
+    clock = FakeClock()
+    cache = TTLCache("test", maxsize=10, ttl=30, negative_ttl=5, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_load("missing", loader) is None
+    assert cache.get_or_load("missing", loader) is None
+    clock.now = 6
+    cache.get_or_load("missing", loader)
+
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_load_overtaken_by_an_invalidation_is_not_cached():
+    cache = TTLCache("test", maxsize=10, ttl=30)
+
+    def stale_loader():
+        # The record changes, and its key is invalidated, while it is being read
+        cache.invalidate("a")
+        return {"id": "a", "name": "old"}
+
+    assert cache.get_or_load("a", stale_loader) == {"id": "a", "name": "old"}
+    assert cache.lookup("a") == (False, None)
+    assert cache.get_or_load("a", lambda: {"id": "a", "name": "new"}) == {"id": "a", "name": "new"}
+    assert cache.lookup("a") == (True, {"id": "a", "name": "new"})
+
+
+def test_worker_lookups_are_served_from_cache_until_updated(client):
+    from src.services.aws_service import aws_service
+
+    aws_service.save_worker_data({"id": "worker-1", "first_name": "Ana"})
+    aws_service.get_worker_by_id("worker-1")
+    misses = aws_service.worker_cache.stats()["misses"]
+
+    assert aws_service.get_worker_by_id("worker-1")["first_name"] == "Ana"
+    assert aws_service.worker_cache.stats()["misses"] == misses
+
+    aws_service.update_worker("worker-1", {"first_name": "Eva"})
+    assert aws_service.get_worker_by_id("worker-1")["first_name"] == "Eva"
+
+    stats = client.get("/health/cache").json()
+    assert stats["workers"]["hits"] >= 1
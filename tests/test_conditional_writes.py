@@ -0,0 +1,81 @@
+import time
+
+import boto3
+
+
+def table(name):
+    return boto3.resource("dynamodb", region_name="us-east-1").Table(name)
+
+
+def device_payload(device_id, code="ACME-ABC123"):
+    return {
+        "activation_code": code,
+        "device_id": device_id,
+        "device_name": "Tablet Entrada Principal",
+        "device_model": "Samsung Galaxy Tab A7",
+        "device_manufacturer": "Samsung",
+        "android_version": "13"
+    }
+
+
+def seed_code(code, **attributes):
+    from src.core.config import settings
+
+    table(settings.DYNAMODB_ACTIVATION_CODES_TABLE).put_item(
+        Item={"code": code, "tenant_id": code.split("-")[0], "status": "pending", **attributes}
+    )
+
+
+def test_update_of_unknown_worker_does_not_create_it(client):
+    from src.core.config import settings
+
+    response = client.put("/api/workers/worker-missing", json={"first_name": "Ana"})
+
+    assert response.status_code == 404
+    assert "Item" not in table(settings.DYNAMODB_WORKERS_TABLE).get_item(Key={"id": "worker-missing"})
+
+
+def test_delete_returns_404_then_204(client):
+    from src.core.config import settings
+
+    assert client.delete("/api/timestamps/log-missing").status_code == 404
+
+    table(settings.DYNAMODB_TIMESTAMPS_TABLE).put_item(Item={"id": "log-1", "worker_id": "w", "event_type": "entry"})
+    assert client.delete("/api/timestamps/log-1").status_code == 204
+    assert "Item" not in table(settings.DYNAMODB_TIMESTAMPS_TABLE).get_item(Key={"id": "log-1"})
+
+
+def test_device_registration_claims_the_code(client):
+    from src.core.config import settings
+
+    seed_code("ACME-ABC123", expires_at=int(time.time() * 1000) + 60_000)
+
+    response = client.post("/api/devices/register", json=device_payload("device-1"))
+
+    assert response.status_code == 201
+    assert response.json()["data"]["tenant_id"] == "ACME"
+    code = table(settings.DYNAMODB_ACTIVATION_CODES_TABLE).get_item(Key={"code": "ACME-ABC123"})["Item"]
+    assert code["status"] == "used"
+    assert code["used_by_device_id"] == "device-1"
+
+    second = client.post("/api/devices/register", json=device_payload("device-2"))
+    assert second.status_code == 400
+    assert second.json()["detail"] == "Activation code has already been used."
+    assert "Item" not in table(settings.DYNAMODB_DEVICES_TABLE).get_item(Key={"device_id": "device-2"})
+
+
+def test_device_registration_conflicts(client):
+    from src.core.config import settings
+
+    seed_code("ACME-ONE")
+    seed_code("ACME-TWO")
+    seed_code("ACME-OLD", expires_at=int(time.time() * 1000) - 1)
+
+    assert client.post("/api/devices/register", json=device_payload("device-1", "ACME-ONE")).status_code == 201
+    assert client.post("/api/devices/register", json=device_payload("device-1", "ACME-TWO")).status_code == 409
+    # The failed transaction must not consume the second code
+    code = table(settings.DYNAMODB_ACTIVATION_CODES_TABLE).get_item(Key={"code": "ACME-TWO"})["Item"]
+    assert code["status"] == "pending"
+
+    assert client.post("/api/devices/register", json=device_payload("device-3", "ACME-NOPE")).json()["detail"] == "Invalid activation code."
+    assert client.post("/api/devices/register", json=device_payload("device-3", "ACME-OLD")).json()["detail"] == "Activation code has expired."
@@ -0,0 +1,69 @@
+def sync(client, headers):
+    return client.post("/api/attendance/sync", json={"records": []}, headers=headers)
+
+
+def test_requests_without_a_valid_token_or_for_another_tenant_are_refused(client, device_headers):
+    headers = device_headers()
+
+    missing = sync(client, {"X-Tenant-ID": "ACME"})
+    assert missing.status_code == 401 and missing.headers["WWW-Authenticate"] == "Bearer"
+    assert sync(client, {"X-Tenant-ID": "ACME", "Authorization": "Bearer not-a-token"}).status_code == 401
+    assert sync(client, {**headers, "X-Tenant-ID": "OTHER"}).status_code == 403
+    assert sync(client, headers).status_code == 200
+
+
+def test_unregistered_devices_are_refused(client):
+    from src.core.security import create_device_token
+
+    token = create_device_token({"tenant_id": "ACME", "device_id": "device-unknown"})
+    assert sync(client, {"X-Tenant-ID": "ACME", "Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_deactivated_device_is_refused_at_once(client, device_headers):
+    headers = device_headers()
+    assert sync(client, headers).status_code == 200
+
+    deactivated = client.put("/api/admin/devices/device-1/deactivate", json={"reason": "Stolen"})
+    assert deactivated.status_code == 200
+    assert deactivated.json()["is_active"] is False and deactivated.json()["deactivation_reason"] == "Stolen"
+    assert sync(client, headers).status_code == 403
+    assert client.put("/api/admin/devices/device-9/deactivate", json={}).status_code == 404
+
+
+def test_known_device_is_authenticated_without_reading_dynamodb(client, device_headers, monkeypatch):
+    from src.services.aws_service import aws_service
+
+    headers = device_headers()
+    misses = aws_service.device_cache.stats()["misses"]
+    assert sync(client, headers).status_code == 200
+    # The first request missed the cache once
+    assert aws_service.device_cache.stats()["misses"] == misses + 1
+
+    def unavailable(*args, **kwargs):
+        raise AssertionError("device read from DynamoDB")
+
+    monkeypatch.setattr(aws_service, "_get_device_by_id", unavailable)
+    assert sync(client, headers).status_code == 200
+    assert aws_service.device_cache.stats()["misses"] == misses + 1
+
+
+def test_deactivated_device_registers_again_with_a_new_code(client):
+    from src.services.aws_service import aws_service
+
+    def register(code):
+        aws_service.activation_codes_table.put({"code": code, "status": "pending", "expires_at": None})
+        return client.post("/api/devices/register", json={
+            "activation_code": code, "device_id": "device-1", "device_name": "Tablet", "device_model": "Tab A7",
+            "device_manufacturer": "Samsung", "android_version": "13"
+        })
+
+    first = register("ACME-CODE1")
+    old_headers = {"X-Tenant-ID": "ACME", "Authorization": f"Bearer {first.json()['data']['device_token']}"}
+    assert register("ACME-CODE2").status_code == 409
+
+    client.put("/api/admin/devices/device-1/deactivate", json={"reason": "Reset"})
+    again = register("ACME-CODE3")
+    assert again.status_code == 201
+    new_headers = {**old_headers, "Authorization": f"Bearer {again.json()['data']['device_token']}"}
+    assert sync(client, new_headers).status_code == 200
+    assert sync(client, old_headers).status_code == 401
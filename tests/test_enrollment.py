@@ -0,0 +1,84 @@
+import base64
+import io
+import json
+
+import requests
+from PIL import Image
+
+PERSONAL_DATA = {"document_id": "1234", "first_name": "Ana", "last_name": "Diaz", "email": "ana@example.com"}
+
+
+def jpeg(size=(640, 800)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, (200, 150, 120)).save(output, format="JPEG")
+    return output.getvalue()
+
+
+def upload(presigned, content=None, content_type="image/jpeg"):
+    content = jpeg() if content is None else content
+    fields = dict(presigned["fields"], **{"Content-Type": content_type})
+    return requests.post(presigned["url"], data=fields, files={"file": ("face.jpg", content, content_type)})
+
+
+def test_enrollment_uploads_go_straight_to_s3_and_finalize_registers_the_worker(client):
+    started = client.post("/api/workers/enrollments", json={"personal_data": PERSONAL_DATA})
+    assert started.status_code == 201
+    body = started.json()
+    worker_id = body["worker_id"]
+    assert [u["key"] for u in body["uploads"]] == [f"{worker_id}/face_{n}.jpg" for n in range(1, 8)]
+
+    for presigned in body["uploads"][:6]:
+        assert upload(presigned).status_code == 204
+    incomplete = client.post("/api/workers/enrollments/finalize", json={"enrollment_token": body["enrollment_token"]})
+    assert incomplete.status_code == 409
+    assert incomplete.json()["detail"] == [f"{worker_id}/face_7.jpg was not uploaded"]
+
+    assert upload(body["uploads"][6]).status_code == 204
+    finalized = client.post("/api/workers/enrollments/finalize", json={"enrollment_token": body["enrollment_token"]})
+    assert finalized.status_code == 201
+    assert finalized.json()["id"] == worker_id
+    assert finalized.json()["image_urls"][0].endswith(f"{worker_id}/faces/face_1.jpg")
+    assert finalized.json()["thumbnail_urls"][6].endswith(f"{worker_id}/thumbnails/face_7.jpg")
+    assert client.get(f"/api/workers/{worker_id}").json()["email"] == PERSONAL_DATA["email"]
+
+
+def test_upload_policy_limits_size_and_type_and_finalize_checks_them(client):
+    body = client.post("/api/workers/enrollments", json={"personal_data": PERSONAL_DATA}).json()
+
+    policy = json.loads(base64.b64decode(body["uploads"][0]["fields"]["policy"]))
+    assert ["content-length-range", 1, 5 * 1024 * 1024] in policy["conditions"]
+    assert {"Content-Type": "image/jpeg"} in policy["conditions"]
+
+    # S3 enforces the policy; objects that bypassed it are still caught by the finalize check
+    for presigned in body["uploads"]:
+        upload(presigned, content_type="text/html")
+    response = client.post("/api/workers/enrollments/finalize", json={"enrollment_token": body["enrollment_token"]})
+    assert response.status_code == 409
+    assert len(response.json()["detail"]) == 7
+
+
+def test_finalize_stores_normalized_variants_and_rejects_undecodable_images(client):
+    from src.services.aws_service import aws_service
+
+    body = client.post("/api/workers/enrollments", json={"personal_data": PERSONAL_DATA}).json()
+    for presigned in body["uploads"][:6]:
+        upload(presigned)
+    upload(body["uploads"][6], content=b"\xff\xd8 not really a jpeg")
+    rejected = client.post("/api/workers/enrollments/finalize", json={"enrollment_token": body["enrollment_token"]})
+    assert rejected.status_code == 409
+    assert rejected.json()["detail"][0].startswith("Image 7:")
+
+    upload(body["uploads"][6])
+    assert client.post("/api/workers/enrollments/finalize", json={"enrollment_token": body["enrollment_token"]}).status_code == 201
+    face = Image.open(io.BytesIO(aws_service.get_s3_object(f"{body['worker_id']}/faces/face_1.jpg")))
+    thumbnail = Image.open(io.BytesIO(aws_service.get_s3_object(f"{body['worker_id']}/thumbnails/face_1.jpg")))
+    assert (face.size, thumbnail.size) == ((480, 480), (96, 96))
+
+
+def test_finalize_rejects_invalid_tokens(client):
+    from src.core.security import create_device_token
+
+    device_token = create_device_token({"tenant_id": "ACME", "device_id": "device-1"})
+    for token in ["not-a-token", device_token]:
+        response = client.post("/api/workers/enrollments/finalize", json={"enrollment_token": token})
+        assert response.status_code == 400
@@ -0,0 +1,110 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+import boto3
+import pytest
+
+
+def seed_timestamps(count):
+    from src.core.config import settings
+
+    table = boto3.resource("dynamodb", region_name=settings.AWS_REGION).Table(settings.DYNAMODB_TIMESTAMPS_TABLE)
+    with table.batch_writer() as batch:
+        for i in range(count):
+            batch.put_item(Item={
+                "id": f"log-{i:04d}",
+                "worker_id": f"worker-{i % 10}",
+                "event_type": "entry" if i % 2 else "exit",
+                "timestamp": "2025-01-24T08:00:00"
+            })
+
+
+def read_jsonl_parts(output_dir):
+    rows = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(".jsonl.gz"):
+            with gzip.open(os.path.join(output_dir, name), "rt") as f:
+                rows.extend(json.loads(line) for line in f)
+    return rows
+
+
+def test_parallel_export_writes_every_item(mocked_aws, tmp_path):
+    from src.core.config import settings
+    from src.services.export_service import TableExporter
+
+    seed_timestamps(300)
+
+    checkpoint = TableExporter(settings.DYNAMODB_TIMESTAMPS_TABLE, str(tmp_path), total_segments=4, page_size=40).run()
+
+    rows = read_jsonl_parts(tmp_path)
+    assert sorted(row["id"] for row in rows) == [f"log-{i:04d}" for i in range(300)]
+    assert checkpoint["completed"]
+    assert all(segment["done"] for segment in checkpoint["segments"].values())
+
+
+def test_interrupted_export_resumes_without_duplicates(mocked_aws, tmp_path):
+    from src.core.config import settings
+    from src.services.export_service import TableExporter
+
+    seed_timestamps(300)
+
+    def interrupt(snapshot):
+        if snapshot["items"] >= 80:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        TableExporter(
+            settings.DYNAMODB_TIMESTAMPS_TABLE, str(tmp_path), total_segments=1, page_size=40, progress=interrupt
+        ).run()
+
+    TableExporter(settings.DYNAMODB_TIMESTAMPS_TABLE, str(tmp_path), total_segments=1, page_size=40).run()
+
+    rows = read_jsonl_parts(tmp_path)
+    assert sorted(row["id"] for row in rows) == [f"log-{i:04d}" for i in range(300)]
+
+
+def test_csv_export(mocked_aws, tmp_path):
+    from src.core.config import settings
+    from src.services.export_service import TableExporter
+
+    seed_timestamps(50)
+
+    TableExporter(settings.DYNAMODB_TIMESTAMPS_TABLE, str(tmp_path), total_segments=2, export_format="csv").run()
+
+    rows = read_csv_export(tmp_path, settings.DYNAMODB_TIMESTAMPS_TABLE)
+    assert len(rows) == 50
+    assert set(rows[0]) == {"id", "worker_id", "event_type", "timestamp"}
+
+
+def read_csv_export(output_dir, table_name):
+    """The header file and the part files, concatenated as documented."""
+    names = sorted(name for name in os.listdir(output_dir) if name.startswith(table_name) and name.endswith(".csv.gz"))
+    data = b"".join((output_dir / name).read_bytes() for name in names)
+    return list(csv.DictReader(io.StringIO(gzip.decompress(data).decode())))
+
+
+def test_csv_columns_first_seen_on_a_later_page_are_kept(mocked_aws, tmp_path):
+    from src.core.config import settings
+    from src.services.export_service import TableExporter
+
+    seed_timestamps(30)
+    table = boto3.resource("dynamodb", region_name=settings.AWS_REGION).Table(settings.DYNAMODB_TIMESTAMPS_TABLE)
+    # Written last, it is scanned on the last page: the page its columns are first seen on
+    table.put_item(Item={"id": "log-9999", "worker_id": "worker-1", "event_type": "entry",
+                         "timestamp": "2025-01-24T08:00:00", "tenant_id": "ACME", "tenant_month": "ACME#2025-01"})
+    pages = []
+
+    exporter = TableExporter(settings.DYNAMODB_TIMESTAMPS_TABLE, str(tmp_path), total_segments=1, export_format="csv",
+                             page_size=10, progress=pages.append)
+    checkpoint = exporter.run()
+
+    assert len(pages) > 1
+    assert checkpoint["columns"][-2:] == ["tenant_id", "tenant_month"]
+    rows = {row["id"]: row for row in read_csv_export(tmp_path, settings.DYNAMODB_TIMESTAMPS_TABLE)}
+    assert len(rows) == 31
+    assert (rows["log-9999"]["tenant_id"], rows["log-9999"]["tenant_month"]) == ("ACME", "ACME#2025-01")
+    # Rows written before the columns were seen have none
+    assert rows["log-0000"]["tenant_id"] is None
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+from PIL import Image
+
+from src.services.image_processing import InvalidImageError, normalize_face_image
+
+# EXIF orientation 6: the camera was rotated, the image must be turned 90° clockwise to display upright
+ROTATED_90 = 6
+
+
+def encode(image, format="JPEG", **params) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=format, **params)
+    return output.getvalue()
+
+
+def test_face_crop_and_thumbnail_are_square_jpegs_without_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "Phone maker"
+    data = encode(Image.new("RGB", (1200, 1600), "white"), exif=exif.tobytes())
+
+    result = normalize_face_image(data, face_size=480, thumbnail_size=96, quality=85)
+
+    face = Image.open(io.BytesIO(result["face"]))
+    thumbnail = Image.open(io.BytesIO(result["thumbnail"]))
+    assert result["content_type"] == "image/jpeg"
+    assert (face.format, face.size, thumbnail.size) == ("JPEG", (480, 480), (96, 96))
+    assert not face.getexif()
+
+
+def test_exif_orientation_is_applied():
+    # Wide as stored, left half black: upright it is tall and its top half is black
+    image = Image.new("RGB", (400, 200), "white")
+    image.paste((0, 0, 0), (0, 0, 200, 200))
+    exif = Image.Exif()
+    exif[0x0112] = ROTATED_90
+    data = encode(image, format="PNG", exif=exif.tobytes())
+
+    result = normalize_face_image(data, face_size=100, thumbnail_size=20, quality=95)
+
+    face = Image.open(io.BytesIO(result["face"])).convert("L")
+    assert result["content_type"] == "image/png"
+    assert face.getpixel((50, 5)) < 50 and face.getpixel((50, 95)) > 200
+
+
+@pytest.mark.parametrize("data", [b"not an image", encode(Image.new("RGB", (10, 10)), format="GIF")])
+def test_invalid_and_unsupported_images_are_rejected(data):
+    with pytest.raises(InvalidImageError):
+        normalize_face_image(data, face_size=100, thumbnail_size=20, quality=85)
@@ -0,0 +1,33 @@
+from src.core.metrics import Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, "/a")
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+
+
+def test_metrics_endpoint_reports_routes_aws_calls_and_consumed_capacity(client):
+    from src.core.metrics import dynamodb_consumed_capacity, http_requests
+    from src.core.config import settings
+
+    before = http_requests.value("GET", "/api/timestamps/{timestamp_id}", "404")
+    assert client.get("/api/timestamps/log-missing").status_code == 404
+    client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry"})
+
+    body = client.get("/metrics").text
+
+    assert http_requests.value("GET", "/api/timestamps/{timestamp_id}", "404") == before + 1
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/timestamps/{timestamp_id}"}' in body
+    assert 'aws_requests_total{service="dynamodb",operation="GetItem",outcome="ok"}' in body
+    assert dynamodb_consumed_capacity.value(settings.DYNAMODB_TIMESTAMPS_TABLE, "BatchWriteItem", "/api/timestamps", "write") > 0
+    assert "aws_executor_wait_seconds_count" in body
@@ -0,0 +1,84 @@
+import json
+
+import boto3
+
+
+def seed_workers(count):
+    from src.core.config import settings
+
+    table = boto3.resource("dynamodb", region_name=settings.AWS_REGION).Table(settings.DYNAMODB_WORKERS_TABLE)
+    with table.batch_writer() as batch:
+        for i in range(count):
+            batch.put_item(Item={
+                "id": f"worker-{i:03d}",
+                "document_id": str(i),
+                "first_name": "Ana",
+                "last_name": "Diaz",
+                "email": f"ana{i}@example.com",
+                "image_urls": [],
+                "created_at": "2025-01-24T00:00:00"
+            })
+
+
+def test_cursor_pagination_returns_every_worker_once(client):
+    seed_workers(25)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/workers", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 10
+        seen.extend(worker["id"] for worker in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert sorted(seen) == [f"worker-{i:03d}" for i in range(25)]
+
+
+def test_unpaginated_list_reads_every_page(client):
+    seed_workers(25)
+
+    response = client.get("/api/workers")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 25
+
+
+def test_ndjson_streaming(client):
+    seed_workers(12)
+
+    response = client.get("/api/workers", headers={"Accept": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 12
+    assert lines[0]["first_name"] == "Ana"
+
+
+def test_ndjson_lines_match_the_json_items(client):
+    seed_workers(3)
+    logged_at = client.post(
+        "/api/timestamps", json={"worker_id": "worker-001", "event_type": "entry", "tenant_id": "ACME"}
+    ).json()["timestamp"]
+    ndjson = {"Accept": "application/x-ndjson"}
+
+    for path, params in [
+        ("/api/workers", {}),
+        ("/api/workers", {"fields": "id,first_name"}),
+        ("/api/timestamps", {}),
+        ("/api/timestamps", {"fields": "id,event_type"}),
+        ("/api/timestamps", {"tenant_id": "ACME", "from": logged_at, "to": logged_at}),
+    ]:
+        items = client.get(path, params=params).json()
+        lines = [json.loads(line) for line in client.get(path, params=params, headers=ndjson).text.splitlines()]
+        # Storage-only attributes, e.g. the month partitions of time logs, are left out of both
+        assert items and lines == items
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/timestamps", params={"limit": 5, "cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
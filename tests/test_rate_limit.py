@@ -0,0 +1,75 @@
+from src.core.rate_limit import InMemoryTokenBucketStore, parse_rate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_the_period_and_evicts_idle_keys():
+    clock = FakeClock()
+    store = InMemoryTokenBucketStore(shards=1, clock=clock)
+    capacity, period = parse_rate("5/hour")
+
+    assert [store.acquire("ip:1", capacity, period) for _ in range(5)] == [0.0] * 5
+    assert store.acquire("ip:1", capacity, period) == 720.0
+    assert store.acquire("ip:2", capacity, period) == 0.0
+
+    clock.now += 720
+    assert store.acquire("ip:1", capacity, period) == 0.0
+    assert store.acquire("ip:1", capacity, period) == 720.0
+
+    # Once their buckets are full again, keys hold no state
+    clock.now += period
+    store.acquire("ip:3", capacity, period)
+    assert len(store) == 1
+
+
+def test_buckets_are_evicted_behind_one_that_is_still_refilling():
+    clock = FakeClock()
+    store = InMemoryTokenBucketStore(shards=1, clock=clock, max_buckets=50)
+
+    # A daily bucket, drained first, stays ahead of hourly buckets that refill much sooner
+    store.acquire("device:slow", *parse_rate("1/day"))
+    for n in range(20):
+        store.acquire(f"ip:{n}", *parse_rate("5/hour"))
+    clock.now += 3600
+    for n in range(20):
+        store.acquire("ip:active", *parse_rate("1000/hour"))
+    assert len(store) == 2
+
+    # Past the cap, the oldest buckets go even if they are still refilling
+    for n in range(100):
+        store.acquire(f"ip:burst-{n}", *parse_rate("5/hour"))
+    assert len(store) == 50
+
+
+def test_device_registration_is_limited_per_ip(client, monkeypatch):
+    from src.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "RATE_LIMIT_DEVICE_REGISTER", "2/hour")
+    body = {
+        "activation_code": "ACME-000000", "device_id": "device-1", "device_name": "Tablet",
+        "device_model": "Tab A7", "device_manufacturer": "Samsung", "android_version": "13"
+    }
+
+    statuses = [client.post("/api/devices/register", json=body).status_code for _ in range(3)]
+
+    assert 429 not in statuses[:2] and statuses[2] == 429
+    limited = client.post("/api/devices/register", json=body)
+    assert limited.headers["Retry-After"] == "1800"
+
+
+def test_attendance_sync_is_limited_per_device(client, monkeypatch, device_headers):
+    from src.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "RATE_LIMIT_ATTENDANCE_SYNC", "1/minute")
+    first_device, second_device = device_headers(device_id="device-1"), device_headers(device_id="device-2")
+
+    def sync(headers):
+        return client.post("/api/attendance/sync", json={"records": []}, headers=headers)
+
+    assert sync(first_device).status_code == 200
+    assert sync(first_device).status_code == 429
+    assert sync(second_device).status_code == 200
@@ -0,0 +1,83 @@
+import json
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+from src.core.pagination import dumps
+from src.core.responses import item_converter, parse_fields
+from src.models.worker import TimeLogResponse, WorkerResponse
+
+
+def save_worker(worker_id):
+    from src.services.aws_service import aws_service
+    aws_service.save_worker_data({
+        "id": worker_id, "tenant_id": "ACME", "document_id": "1", "first_name": "Ana", "last_name": "Diaz",
+        "email": "ana@example.com", "image_urls": [f"https://s3/{worker_id}/face_1.jpg"], "created_at": "2024-01-02T03:04:05"
+    })
+
+
+def test_converted_items_match_the_response_model():
+    worker = {
+        "id": "worker-1", "document_id": "1", "first_name": "Ana", "last_name": "Diaz", "email": "ana@example.com",
+        "image_urls": ["https://s3/worker-1/face_1.jpg"], "created_at": "2024-01-02T03:04:05.123456",
+        # Attributes of the item that aren't part of the response
+        "enrollment_token": "secret", "version": Decimal("3")
+    }
+    time_log = {
+        "id": "log-1", "worker_id": "worker-1", "event_type": "entry", "timestamp": "2024-01-02T03:04:05",
+        "worker_month": "worker-1#2024-01", "timestamp_ms": Decimal("1704164645000")
+    }
+    for model, item in ((WorkerResponse, worker), (TimeLogResponse, time_log)):
+        expected = json.loads(model.model_validate(item).model_dump_json())
+        assert json.loads(dumps(item_converter(model)(item))) == expected
+
+
+def test_number_fields_are_cast_from_decimal():
+    class Reading(BaseModel):
+        count: int
+        ratio: float | None = None
+
+    assert item_converter(Reading)({"count": Decimal("2"), "ratio": Decimal("0.5")}) == {"count": 2, "ratio": 0.5}
+    assert item_converter(Reading, ("count",))({"count": Decimal("2"), "ratio": Decimal("0.5")}) == {"count": 2}
+
+
+def test_unknown_fields_are_rejected(client):
+    assert parse_fields(" id, first_name ,id", WorkerResponse) == ["id", "first_name"]
+    response = client.get("/api/workers", params={"fields": "id,password"})
+    assert response.status_code == 400 and "password" in response.json()["detail"]
+
+
+def test_fields_are_projected_when_reading(client, monkeypatch):
+    from src.services.aws_service import aws_service
+
+    save_worker("worker-1")
+    save_worker("worker-2")
+    table = aws_service.workers_table
+    scans = []
+    scan = table.resource.scan
+
+    def spy(**kwargs):
+        scans.append(kwargs)
+        return scan(**kwargs)
+
+    monkeypatch.setattr(table.resource, "scan", spy)
+
+    first = client.get("/api/workers", params={"fields": "id,first_name", "limit": 1})
+    second = client.get("/api/workers", params={"fields": "id,first_name", "cursor": first.headers["X-Next-Cursor"]})
+    assert sorted(first.json() + second.json(), key=lambda w: w["id"]) == [
+        {"id": "worker-1", "first_name": "Ana"}, {"id": "worker-2", "first_name": "Ana"}
+    ]
+    assert scans[0]["ProjectionExpression"] == "#p0, #p1"
+    assert scans[0]["ExpressionAttributeNames"] == {"#p0": "id", "#p1": "first_name"}
+
+    assert client.get("/api/workers/worker-1", params={"fields": "last_name"}).json() == {"last_name": "Diaz"}
+    full = client.get("/api/workers/worker-1").json()
+    assert full["created_at"] == "2024-01-02T03:04:05" and full["thumbnail_urls"] == []
+
+
+def test_time_log_fields(client):
+    log = client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry"}).json()
+
+    assert client.get(f"/api/timestamps/{log['id']}", params={"fields": "event_type"}).json() == {"event_type": "entry"}
+    listed = client.get("/api/timestamps", params={"worker_id": "worker-1", "fields": "id,timestamp"}).json()
+    assert listed == [{"id": log["id"], "timestamp": log["timestamp"]}]
@@ -0,0 +1,65 @@
+TENANT_HEADERS = {"X-Tenant-ID": "ACME"}
+
+
+def save_worker(worker_id, tenant_id="ACME", **fields):
+    from src.services.aws_service import aws_service
+    aws_service.save_worker_data({
+        "id": worker_id, "tenant_id": tenant_id, "document_id": worker_id[-1], "first_name": "Ana",
+        "last_name": "Diaz", "email": "ana@example.com", "image_urls": [f"https://s3/{worker_id}/faces/face_1.jpg"], **fields
+    })
+
+
+def rows(roster):
+    return {row[0]: dict(zip(roster["fields"], row)) for row in roster["workers"]}
+
+
+def test_full_snapshot_then_delta_then_not_modified(client):
+    save_worker("worker-1")
+    save_worker("worker-2")
+    save_worker("worker-9", tenant_id="OTHER")
+
+    full = client.get("/api/workers/roster", headers=TENANT_HEADERS)
+    assert full.status_code == 200
+    assert full.headers["Content-Encoding"] == "gzip" and full.headers["ETag"] == '"2"'
+    roster = full.json()
+    assert (roster["version"], roster["full"]) == (2, True)
+    assert sorted(rows(roster)) == ["worker-1", "worker-2"]
+
+    client.put("/api/workers/worker-1", json={"last_name": "Gomez"})
+    client.put("/api/workers/worker-1", json={"first_name": "Ana Maria"})
+    client.delete("/api/workers/worker-2")
+    save_worker("worker-3")
+
+    delta = client.get("/api/workers/roster", params={"since": 2}, headers=TENANT_HEADERS).json()
+    assert (delta["version"], delta["full"], delta["deleted"]) == (6, False, ["worker-2"])
+    assert rows(delta)["worker-1"]["first_name"] == "Ana Maria" and rows(delta)["worker-1"]["last_name"] == "Gomez"
+    assert sorted(rows(delta)) == ["worker-1", "worker-3"]
+
+    unchanged = client.get("/api/workers/roster", params={"since": 6}, headers={**TENANT_HEADERS, "If-None-Match": '"6"'})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+
+
+def test_devices_too_far_behind_get_a_snapshot(client, monkeypatch):
+    from src.core.config import get_settings
+    save_worker("worker-1")
+    save_worker("worker-2")
+    save_worker("worker-3")
+
+    monkeypatch.setattr(get_settings(), "ROSTER_DELTA_MAX_CHANGES", 1)
+    behind = client.get("/api/workers/roster", params={"since": 1}, headers=TENANT_HEADERS).json()
+    assert behind["full"] and sorted(rows(behind)) == ["worker-1", "worker-2", "worker-3"]
+    assert not client.get("/api/workers/roster", params={"since": 2}, headers=TENANT_HEADERS).json()["full"]
+
+
+def test_cached_versions_answer_without_dynamodb_reads(client, monkeypatch):
+    from src.services.aws_service import aws_service
+    save_worker("worker-1")
+    etag = client.get("/api/workers/roster", headers=TENANT_HEADERS).headers["ETag"]
+    full = client.get("/api/workers/roster", headers={**TENANT_HEADERS, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in full.headers and full.json()["version"] == 1
+
+    monkeypatch.setattr(aws_service, "roster_table", None)
+    monkeypatch.setattr(aws_service, "workers_table", None)
+
+    assert client.get("/api/workers/roster", headers={**TENANT_HEADERS, "If-None-Match": etag}).status_code == 304
+    assert client.get("/api/workers/roster", headers=TENANT_HEADERS).json()["version"] == 1
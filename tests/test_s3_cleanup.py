@@ -0,0 +1,97 @@
+import threading
+import time
+
+import boto3
+
+from src.services.background_jobs import JobQueue
+
+
+def wait_for_jobs(jobs, timeout=5):
+    deadline = time.monotonic() + timeout
+    while jobs.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert jobs.pending() == 0
+
+
+def put_images(worker_id, count):
+    from src.core.config import settings
+    s3 = boto3.client("s3", region_name=settings.AWS_REGION)
+    for n in range(count):
+        s3.put_object(Bucket=settings.S3_BUCKET_NAME, Key=f"{worker_id}/face_{n}.jpg", Body=b"jpeg")
+
+
+def keys_of(worker_id):
+    from src.services.aws_service import aws_service
+    return [obj["Key"] for page in aws_service.iter_s3_key_pages(f"{worker_id}/") for obj in page]
+
+
+def test_failed_jobs_are_retried_and_journaled_jobs_resumed(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.services.background_jobs.RETRY_BASE_SECONDS", 0.01)
+    journal_path = str(tmp_path / "jobs.jsonl")
+    attempts = []
+
+    def flaky(payload):
+        attempts.append(payload["n"])
+        if len(attempts) == 1:
+            raise RuntimeError("S3 unavailable")
+
+    jobs = JobQueue({"flaky": flaky}, journal_path, max_attempts=3)
+    jobs.start()
+    jobs.submit("flaky", {"n": 1})
+    wait_for_jobs(jobs)
+    jobs.stop(timeout=5)
+    assert attempts == [1, 1]
+
+    # A job queued when the process stops runs after the restart
+    blocked = threading.Event()
+    stalled = JobQueue({"flaky": lambda payload: blocked.wait()}, journal_path, max_attempts=3)
+    stalled.start()
+    stalled.submit("flaky", {"n": 2})
+    stalled.submit("flaky", {"n": 3})
+    stalled.stop(timeout=0.1)
+    blocked.set()
+
+    ran = []
+    restarted = JobQueue({"flaky": lambda payload: ran.append(payload["n"])}, journal_path, max_attempts=3)
+    restarted.start()
+    wait_for_jobs(restarted)
+    restarted.stop(timeout=5)
+    assert 3 in ran and 1 not in ran
+
+
+def test_deleting_a_worker_removes_its_images_in_the_background(client):
+    from src.services.aws_service import aws_service
+    aws_service.save_worker_data({"id": "worker-1", "first_name": "Ana"})
+    put_images("worker-1", 1001)
+    put_images("worker-10", 1)
+
+    assert client.delete("/api/workers/worker-1").status_code == 204
+    wait_for_jobs(aws_service.background_jobs, timeout=30)
+
+    assert keys_of("worker-1") == []
+    assert keys_of("worker-10") == ["worker-10/face_0.jpg"]
+
+
+def test_images_of_existing_workers_are_kept(mocked_aws):
+    from src.services.aws_service import aws_service
+    aws_service.save_worker_data({"id": "worker-1", "first_name": "Ana"})
+    put_images("worker-1", 2)
+
+    assert aws_service.delete_worker_images("worker-1") == 0
+    assert len(keys_of("worker-1")) == 2
+
+
+def test_sweep_removes_only_old_orphaned_prefixes(mocked_aws, monkeypatch):
+    from src.core.config import get_settings
+    from src.services.aws_service import aws_service
+    aws_service.save_worker_data({"id": "worker-1", "first_name": "Ana"})
+    put_images("worker-1", 2)
+    put_images("worker-abandoned", 2)
+
+    # Just uploaded: could be an enrollment in progress
+    assert aws_service.sweep_orphaned_images() == []
+
+    monkeypatch.setattr(get_settings(), "S3_ORPHAN_MIN_AGE_HOURS", 0)
+    assert aws_service.sweep_orphaned_images() == ["worker-abandoned"]
+    assert keys_of("worker-abandoned") == []
+    assert len(keys_of("worker-1")) == 2
@@ -0,0 +1,48 @@
+import asyncio
+import io
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import UploadFile
+
+
+def make_images(count=7):
+    return [
+        UploadFile(file=io.BytesIO(f"face{i}".encode()), filename=f"face_{i}.jpg", headers={"content-type": "image/jpeg"})
+        for i in range(count)
+    ]
+
+
+def list_keys(bucket):
+    response = boto3.client("s3", region_name="us-east-1").list_objects_v2(Bucket=bucket)
+    return sorted(obj["Key"] for obj in response.get("Contents", []))
+
+
+def test_concurrent_upload_stores_all_images(mocked_aws):
+    from src.core.config import settings
+    from src.services.aws_service import aws_service
+
+    urls = asyncio.run(aws_service.upload_images_to_s3_concurrently("worker-1", make_images()))
+
+    assert urls == [aws_service.get_s3_url(f"worker-1/face_{i}.jpg") for i in range(1, 8)]
+    assert list_keys(settings.S3_BUCKET_NAME) == [f"worker-1/face_{i}.jpg" for i in range(1, 8)]
+
+
+def test_concurrent_upload_rolls_back_on_failure(mocked_aws, monkeypatch):
+    from src.core.config import settings
+    from src.services.aws_service import aws_service
+
+    upload = aws_service.upload_image_to_s3
+
+    def flaky_upload(file_key, image):
+        if file_key.endswith("face_4.jpg"):
+            raise ClientError({"Error": {"Code": "InternalError", "Message": "boom"}}, "PutObject")
+        return upload(file_key, image)
+
+    monkeypatch.setattr(aws_service, "upload_image_to_s3", flaky_upload)
+
+    with pytest.raises(ClientError):
+        asyncio.run(aws_service.upload_images_to_s3_concurrently("worker-2", make_images()))
+
+    assert list_keys(settings.S3_BUCKET_NAME) == []
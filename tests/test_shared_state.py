@@ -0,0 +1,127 @@
+import json
+import os
+import runpy
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def state(tmp_path):
+    from src.core.shared_state import SharedState
+
+    return SharedState(str(tmp_path / "shared.db"))
+
+
+def test_token_buckets_are_shared_across_processes(state):
+    from src.core.rate_limit import SharedTokenBucketStore
+
+    first, second = SharedTokenBucketStore(state), SharedTokenBucketStore(state)
+    assert first.acquire("register:ip:1", 3, 3600) == 0
+    assert second.acquire("register:ip:1", 3, 3600) == 0
+
+    pid = os.fork()
+    if pid == 0:
+        # The child opens its own connection to the same database
+        os._exit(0 if SharedTokenBucketStore(state).acquire("register:ip:1", 3, 3600) == 0 else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    assert 1199 < first.acquire("register:ip:1", 3, 3600) <= 1200
+    assert second.acquire("register:ip:2", 3, 3600) == 0
+
+
+def test_invalidations_reach_the_caches_of_other_processes(state):
+    from src.core.cache import TTLCache
+    from src.core.shared_state import CacheInvalidations
+
+    caches = []
+    for _ in range(2):
+        invalidations = CacheInvalidations(state, interval=0)
+        caches.append(TTLCache("workers", 10, 60, invalidations=invalidations))
+    first, second = caches
+    for cache in caches:
+        cache.lookup("worker-0")
+        cache.set("worker-1", {"first_name": "Ana"})
+        cache.set("worker-2", {"first_name": "Luis"})
+
+    first.invalidate("worker-1")
+    assert first.lookup("worker-2") == (True, {"first_name": "Luis"})
+    assert second.lookup("worker-1") == (False, None)
+    assert second.lookup("worker-2") == (True, {"first_name": "Luis"})
+    # A process doesn't apply its own invalidations again
+    first.set("worker-1", {"first_name": "Ana María"})
+    assert first.lookup("worker-1") == (True, {"first_name": "Ana María"})
+
+
+def test_metrics_are_merged_across_processes(state, monkeypatch):
+    from src.core.config import get_settings
+    from src.core.metrics import Registry
+
+    monkeypatch.setattr(get_settings(), "SHARED_METRICS_INTERVAL_SECONDS", 5)
+    registries = [Registry() for _ in range(3)]
+    for number, registry in enumerate(registries):
+        registry.counter("requests_total", "Requests.", ["route"]).inc("/health", amount=number + 1)
+        registry.gauge("circuit_state", "Circuit state.", ["resource"]).set(number, "workers")
+        registry.histogram("duration_seconds", "Duration.", buckets=(0.1, 1)).observe(0.05 * (number + 1))
+
+    snapshots = [registry.snapshot() for registry in registries[1:]]
+    state.publish_metrics(snapshots[0])
+    state.connection.execute(
+        "INSERT INTO metrics (pid, snapshot, updated_at) VALUES (?, ?, ?)",
+        (-1, json.dumps(snapshots[1]), time.time() - 60)
+    )
+
+    rendered = registries[0].render(state.metric_snapshots()).splitlines()
+    assert 'requests_total{route="/health"} 6' in rendered
+    # The gauge of the process that stopped publishing is left out
+    assert 'circuit_state{resource="workers"} 1' in rendered
+    assert 'duration_seconds_bucket{le="0.1"} 2' in rendered
+    assert 'duration_seconds_count 3' in rendered
+    assert registries[0].render(state.metric_snapshots(exclude_pid=os.getpid())).count("requests_total{") == 1
+
+
+def test_production_server_config(monkeypatch, tmp_path):
+    from src.core.config import get_settings
+    from src.services import worker_process
+
+    # Set and then deleted, so that monkeypatch restores what the config file sets
+    for name in ("SHARED_STATE_PATH", "RATE_LIMIT_BACKEND"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    config = runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+
+    assert config["workers"] == 3 and config["preload_app"] is True
+    assert config["worker_class"] == "uvicorn.workers.UvicornWorker"
+    assert os.path.basename(os.environ["SHARED_STATE_PATH"]) == f"sioma-shared-{os.getpid()}.db"
+    assert os.environ["RATE_LIMIT_BACKEND"] == "shared"
+
+    for name in worker_process.JOURNAL_SETTINGS:
+        monkeypatch.setattr(get_settings(), name, str(tmp_path / f"{name.lower()}.jsonl"))
+    monkeypatch.setattr(worker_process, "_slot_lock", None)
+    monkeypatch.setattr(worker_process, "_slot", None)
+    assert worker_process.init_worker_process() == 0
+    assert get_settings().WRITE_BEHIND_JOURNAL_PATH == str(tmp_path / "write_behind_journal_path.worker-0.jsonl")
+    # The slot is held until this process exits
+    assert worker_process.claim_slot(str(tmp_path)) == 1
+
+
+def test_only_the_first_worker_sweeps_orphaned_images(monkeypatch, tmp_path):
+    from src.core.config import get_settings
+    from src.services import worker_process
+    from src.services.aws_service import SWEEP_ORPHANED_IMAGES_JOB, AWSService
+
+    monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "memory")
+    schedules = {}
+    for slot in (0, 1):
+        monkeypatch.setattr(worker_process, "_slot", slot)
+        monkeypatch.setattr(get_settings(), "BACKGROUND_JOBS_JOURNAL_PATH", str(tmp_path / f"jobs-{slot}.jsonl"))
+        service = AWSService()
+        schedules[slot] = service.background_jobs.schedules
+        service.stop_background_jobs()
+
+    assert list(schedules[0]) == [SWEEP_ORPHANED_IMAGES_JOB]
+    assert schedules[1] == {}
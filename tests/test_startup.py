@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+
+def test_importing_the_app_does_not_build_aws_clients():
+    # A fresh interpreter, since the test session has already imported boto3
+    code = (
+        "import sys, src.main\n"
+        "from src.services.aws_service import aws_service\n"
+        "assert 'boto3' not in sys.modules, 'boto3 imported'\n"
+        "assert 'storage' not in vars(aws_service), 'storage engine built'\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_startup_warms_up_the_aws_layer(client):
+    from src.services.aws_service import aws_service
+
+    assert {"storage", "workers_table", "timestamps_table"} <= vars(aws_service).keys()
+    assert {"s3_client", "dynamodb", "tables"} <= vars(aws_service.storage).keys()
+    assert client.get("/health/cache").json()["workers"]["size"] == 0
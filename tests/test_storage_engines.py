@@ -0,0 +1,157 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def engine(request, tmp_path, monkeypatch):
+    """Swaps the service for one on the memory or SQLite engine; no AWS is involved."""
+    from src.core.config import get_settings
+    from src.services.async_aws_service import async_aws_service
+    from src.services.aws_service import AWSService
+
+    for name, value in {
+        "STORAGE_BACKEND": request.param,
+        "SQLITE_DATABASE_PATH": str(tmp_path / "sioma.db"),
+        "SQLITE_BLOB_DIR": str(tmp_path / "blobs"),
+        "BACKGROUND_JOBS_JOURNAL_PATH": str(tmp_path / "background-jobs.jsonl"),
+    }.items():
+        monkeypatch.setattr(get_settings(), name, value)
+    service = AWSService()
+    monkeypatch.setattr(async_aws_service, "service", service)
+    yield service
+
+    service.stop_background_jobs()
+    service.storage.close()
+    from src.core.rate_limit import rate_limits
+    rate_limits.store.clear()
+    from src.core.security import device_tokens
+    device_tokens.cache.clear()
+
+
+@pytest.fixture
+def engine_client(engine):
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def save_worker(service, worker_id, tenant_id="ACME"):
+    service.save_worker_data({
+        "id": worker_id, "tenant_id": tenant_id, "document_id": worker_id[-1], "first_name": "Ana",
+        "last_name": "Diaz", "email": "ana@example.com", "image_urls": [service.get_s3_url(f"{worker_id}/face_1.jpg")]
+    })
+
+
+def test_workers_and_roster(engine, engine_client):
+    for worker_id in ("worker-1", "worker-2", "worker-3"):
+        save_worker(engine, worker_id)
+
+    first = engine_client.get("/api/workers", params={"limit": 2})
+    second = engine_client.get("/api/workers", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert "X-Next-Cursor" not in second.headers
+    assert sorted(w["id"] for w in first.json() + second.json()) == ["worker-1", "worker-2", "worker-3"]
+    projected = engine_client.get("/api/workers", params={"limit": 2, "fields": "id", "cursor": first.headers["X-Next-Cursor"]})
+    assert projected.json() == [{"id": worker["id"]} for worker in second.json()]
+
+    assert engine_client.put("/api/workers/worker-1", json={"last_name": "Gomez"}).json()["last_name"] == "Gomez"
+    assert engine_client.delete("/api/workers/worker-2").status_code == 204
+    assert engine_client.get("/api/workers/worker-2").status_code == 404
+    assert engine_client.put("/api/workers/worker-2", json={"last_name": "Gomez"}).status_code == 404
+
+    delta = engine_client.get("/api/workers/roster", params={"since": 3}, headers={"X-Tenant-ID": "ACME"}).json()
+    assert (delta["version"], delta["deleted"]) == (5, ["worker-2"])
+    assert [row[0] for row in delta["workers"]] == ["worker-1"]
+
+
+def test_time_logs_by_range_in_pages(engine, engine_client):
+    base_ms = int(time.time() * 1000)
+    for n in range(5):
+        engine.save_timestamp_data({
+            "id": f"log-{n}", "worker_id": "worker-1", "tenant_id": "ACME", "event_type": "entry",
+            # Two logs share each millisecond, so pages must break ties on the key
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime((base_ms + n // 2 * 1000) / 1000))
+        })
+
+    params = {"worker_id": "worker-1", "from": base_ms // 1000 - 1, "to": base_ms // 1000 + 10, "limit": 2}
+    logs, cursor = [], None
+    while True:
+        response = engine_client.get("/api/timestamps", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        logs += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(logs) == 5 and len({log["timestamp"] for log in logs}) == 3
+    assert [log["timestamp"] for log in logs] == sorted(log["timestamp"] for log in logs)
+
+    assert engine_client.get("/api/timestamps", params={"worker_id": "worker-1", "limit": 4}).headers["X-Next-Cursor"]
+    assert engine_client.delete("/api/timestamps/log-0").status_code == 204
+    assert len(engine_client.get("/api/timestamps", params={"worker_id": "worker-1"}).json()) == 4
+
+
+def register(client, device_id, code):
+    return client.post("/api/devices/register", json={
+        "activation_code": code, "device_id": device_id, "device_name": "Tablet", "device_model": "Tab A7",
+        "device_manufacturer": "Samsung", "android_version": "13"
+    })
+
+
+def test_device_registration_claims_the_code_once(engine, engine_client):
+    expires_at = int(time.time() * 1000) + 60_000
+    engine.activation_codes_table.put({"code": "ACME-CODE1", "status": "pending", "expires_at": expires_at})
+
+    registered = register(engine_client, "device-1", "ACME-CODE1")
+    assert registered.status_code == 201
+    again = register(engine_client, "device-2", "ACME-CODE1")
+    assert again.status_code == 400
+    assert engine.get_device_by_id("device-2") is None
+
+    headers = {"X-Tenant-ID": "ACME", "Authorization": f"Bearer {registered.json()['data']['device_token']}"}
+    assert engine_client.post("/api/attendance/sync", json={"records": []}, headers=headers).status_code == 200
+    assert engine_client.put("/api/admin/devices/device-1/deactivate", json={}).status_code == 200
+    assert engine_client.post("/api/attendance/sync", json={"records": []}, headers=headers).status_code == 403
+
+    # A deactivated device registers again with a new code; only its new token is accepted
+    engine.activation_codes_table.put({"code": "ACME-CODE2", "status": "pending", "expires_at": expires_at})
+    engine.activation_codes_table.put({"code": "ACME-CODE3", "status": "pending", "expires_at": expires_at})
+    again = register(engine_client, "device-1", "ACME-CODE2")
+    assert again.status_code == 201
+    assert register(engine_client, "device-1", "ACME-CODE3").status_code == 409
+    new_headers = {**headers, "Authorization": f"Bearer {again.json()['data']['device_token']}"}
+    assert engine_client.post("/api/attendance/sync", json={"records": []}, headers=new_headers).status_code == 200
+    assert engine_client.post("/api/attendance/sync", json={"records": []}, headers=headers).status_code == 401
+
+
+def test_orphaned_blobs_are_swept(engine, monkeypatch):
+    from src.core.config import get_settings
+
+    save_worker(engine, "worker-1")
+    engine.put_s3_objects({"worker-1/face_1.jpg": (b"jpeg", "image/jpeg"), "worker-9/face_1.jpg": (b"jpeg", "image/jpeg")})
+    assert sorted(engine.iter_s3_prefixes()) == ["worker-1/", "worker-9/"]
+
+    monkeypatch.setattr(get_settings(), "S3_ORPHAN_MIN_AGE_HOURS", 0)
+    assert engine.sweep_orphaned_images() == ["worker-9"]
+    assert [obj["Key"] for page in engine.iter_s3_key_pages("") for obj in page] == ["worker-1/face_1.jpg"]
+    assert engine.storage.blobs.get("worker-1/face_1.jpg") == b"jpeg"
+    # A missing blob fails as it does on S3
+    with pytest.raises(ClientError) as missing:
+        engine.get_s3_object("worker-9/face_1.jpg")
+    assert missing.value.response["Error"]["Code"] == "NoSuchKey"
+
+
+def test_sqlite_data_outlives_the_process(tmp_path):
+    from src.services.sqlite_storage import SqliteStorage
+
+    storage = SqliteStorage(str(tmp_path / "sioma.db"), str(tmp_path / "blobs"))
+    storage.table("test-workers").put({"id": "worker-1", "first_name": "Ana"})
+    storage.blobs.put("worker-1/face_1.jpg", b"jpeg", "image/jpeg")
+    storage.close()
+
+    reopened = SqliteStorage(str(tmp_path / "sioma.db"), str(tmp_path / "blobs"))
+    assert reopened.table("test-workers").get({"id": "worker-1"})["first_name"] == "Ana"
+    assert reopened.blobs.head("worker-1/face_1.jpg")["ContentLength"] == 4
+    reopened.close()
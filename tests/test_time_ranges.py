@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+
+from src.services.partitions import month_shards, sharded_key
+
+
+def epoch_ms(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def save_time_log(log_id, worker_id, tenant_id, *args):
+    from src.services.aws_service import aws_service
+    aws_service.save_timestamp_data({
+        "id": log_id, "worker_id": worker_id, "tenant_id": tenant_id, "event_type": "entry",
+        "timestamp": datetime(*args).isoformat()
+    })
+
+
+def test_month_shards_cover_the_range_across_years():
+    assert month_shards(epoch_ms(2024, 11, 30), epoch_ms(2025, 2, 1)) == ["2024-11", "2024-12", "2025-01", "2025-02"]
+    assert sharded_key("ACME#EMP001", epoch_ms(2025, 1, 31, 23, 59)) == "ACME#EMP001#2025-01"
+
+
+def test_time_logs_in_range_are_read_across_months_in_order(client):
+    save_time_log("log-mar", "worker-1", "ACME", 2025, 3, 2, 8)
+    save_time_log("log-jan", "worker-1", "ACME", 2025, 1, 31, 23)
+    save_time_log("log-feb", "worker-1", "ACME", 2025, 2, 1, 7)
+    save_time_log("log-apr", "worker-1", "ACME", 2025, 4, 1, 8)
+    save_time_log("log-other", "worker-2", "OTHER", 2025, 2, 3, 8)
+    params = {"from": "2025-01-15T00:00:00", "to": "2025-03-31T23:59:59"}
+
+    by_worker = client.get("/api/timestamps", params={"worker_id": "worker-1", **params})
+    by_tenant = client.get("/api/timestamps", params={"tenant_id": "ACME", **params})
+
+    assert by_worker.status_code == 200
+    assert [log["id"] for log in by_worker.json()] == ["log-jan", "log-feb", "log-mar"]
+    assert [log["id"] for log in by_tenant.json()] == ["log-jan", "log-feb", "log-mar"]
+
+
+def test_time_range_pages_continue_across_months(client):
+    for day in range(1, 6):
+        save_time_log(f"log-{day}", "worker-1", "ACME", 2025, 1 + day % 2, day, 8)
+
+    seen, cursor = [], None
+    while True:
+        params = {"worker_id": "worker-1", "from": epoch_ms(2025, 1, 1), "to": epoch_ms(2025, 3, 1), "limit": 2}
+        response = client.get("/api/timestamps", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(log["id"] for log in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # January (even days) first, then February
+    assert seen == ["log-2", "log-4", "log-1", "log-3", "log-5"]
+
+
+def test_time_range_requires_both_bounds_and_a_scope(client):
+    assert client.get("/api/timestamps", params={"worker_id": "w", "from": "2025-01-01T00:00:00"}).status_code == 400
+    assert client.get("/api/timestamps", params={"from": "2025-01-01T00:00:00", "to": "2025-01-02T00:00:00"}).status_code == 400
+    assert client.get("/api/timestamps", params={"tenant_id": "ACME"}).status_code == 400
+
+
+def test_duplicates_are_detected_across_a_month_boundary(client, device_headers):
+    from src.services.aws_service import aws_service
+    end_of_january = epoch_ms(2025, 1, 31, 23, 59, 50)
+    first = {
+        "local_id": 1, "employee_id": "EMP001", "type": "ENTRY", "timestamp": end_of_january,
+        "confidence": 0.9, "liveness_passed": True, "device_id": "device-1", "created_at": end_of_january
+    }
+    second = dict(first, local_id=2, timestamp=end_of_january + 20_000, device_id="device-2")
+
+    client.post("/api/attendance/sync", json={"records": [first]}, headers=device_headers())
+    body = client.post("/api/attendance/sync", json={"records": [second]}, headers=device_headers(device_id="device-2")).json()
+
+    assert [conflict["local_id"] for conflict in body["conflicts"]] == [2]
+    stored = aws_service.get_device_attendance_in_range("device-1", epoch_ms(2025, 1, 1), epoch_ms(2025, 2, 28))
+    assert [item["tenant_id#employee_id"] for item in stored] == ["ACME#EMP001#2025-01"]
+
+
+def test_migration_moves_rows_written_before_month_sharding(mocked_aws):
+    import boto3
+    from src.services.partition_migration import migrate_attendance_records, migrate_time_logs
+    from src.core.config import settings
+    from src.services.aws_service import aws_service
+
+    dynamodb = boto3.resource("dynamodb", region_name=settings.AWS_REGION)
+    dynamodb.Table(settings.DYNAMODB_TIMESTAMPS_TABLE).put_item(Item={
+        "id": "log-old", "worker_id": "worker-1", "event_type": "entry", "timestamp": "2025-01-10T08:00:00"
+    })
+    dynamodb.Table(settings.DYNAMODB_ATTENDANCE_TABLE).put_item(Item={
+        "tenant_id#employee_id": "ACME#EMP001", "timestamp": epoch_ms(2025, 1, 10, 8), "record_id": "record-old",
+        "tenant_id": "ACME", "employee_id": "EMP001", "device_id": "device-1", "type": "ENTRY"
+    })
+
+    assert (migrate_time_logs(aws_service), migrate_attendance_records(aws_service)) == (1, 1)
+    assert (migrate_time_logs(aws_service), migrate_attendance_records(aws_service)) == (0, 0)
+    january = (epoch_ms(2025, 1, 1), epoch_ms(2025, 1, 31))
+    assert [log["id"] for log in aws_service.get_time_logs_in_range(*january, worker_id="worker-1")] == ["log-old"]
+    records = aws_service.get_tenant_attendance_in_range("ACME", *january)
+    assert [item["tenant_id#employee_id"] for item in records] == ["ACME#EMP001#2025-01"]
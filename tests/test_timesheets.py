@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from src.services.timesheet_service import DAY_MS, pair_events
+
+HOUR_MS = 3_600_000
+# A closed day far enough in the past for its rollups to be stored
+DAY = date.today() - timedelta(days=10)
+DAY_START = int(datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def attendance(local_id, employee_id, timestamp, type_):
+    return {
+        "local_id": local_id, "employee_id": employee_id, "type": type_, "timestamp": timestamp,
+        "confidence": 0.9, "liveness_passed": True, "device_id": "device-1", "created_at": timestamp
+    }
+
+
+def test_pair_events_credits_night_shift_to_entry_day_and_counts_unmatched():
+    totals = pair_events(
+        ["a", "a", "a", "b", "b"],
+        [DAY_MS + 22 * HOUR_MS, DAY_MS + 30 * HOUR_MS, DAY_MS + 40 * HOUR_MS, 9 * HOUR_MS, 8 * HOUR_MS],
+        [True, False, False, False, True],
+        16 * HOUR_MS
+    )
+
+    rows = {(w, int(d)): i for i, (w, d) in enumerate(zip(totals["worker"], totals["day"]))}
+    night = rows[("a", 1)]
+    assert totals["worked_ms"][night] == 8 * HOUR_MS and totals["pairs"][night] == 1
+    assert totals["unmatched_exits"][rows[("a", 2)]] == 1
+    # Events are sorted per worker before pairing
+    assert totals["worked_ms"][rows[("b", 0)]] == HOUR_MS
+    assert np.sum(totals["unmatched_entries"]) == 0
+
+
+def test_tenant_timesheet_is_materialized_and_invalidated_by_late_records(client, device_headers):
+    records = [
+        attendance(1, "EMP001", DAY_START + 8 * HOUR_MS, "ENTRY"),
+        attendance(2, "EMP001", DAY_START + 16 * HOUR_MS, "EXIT"),
+        attendance(3, "EMP002", DAY_START + 9 * HOUR_MS, "ENTRY"),
+    ]
+    client.post("/api/attendance/sync", json={"records": records}, headers=device_headers())
+    params = {"from": DAY.isoformat(), "to": (DAY + timedelta(days=1)).isoformat()}
+
+    body = client.get("/api/timesheets/tenants/ACME", params=params).json()
+    assert body["total_hours"] == 8.0
+    assert body["workers"] == {"EMP001": 8.0}
+    assert body["days"][0]["unmatched_entries"] == 1
+
+    from src.services.aws_service import aws_service
+    stored = aws_service.get_timesheet_rollups("tenant#ACME", params["from"], params["to"])
+    assert [item["day"] for item in stored] == [params["from"], params["to"]]
+
+    # A late exit replaces the stale rollup instead of being hidden by it
+    late = attendance(4, "EMP002", DAY_START + 13 * HOUR_MS, "EXIT")
+    client.post("/api/attendance/sync", json={"records": [late]}, headers=device_headers())
+    body = client.get("/api/timesheets/tenants/ACME", params=params).json()
+    assert body["workers"] == {"EMP001": 8.0, "EMP002": 4.0}
+
+    # So does an administrator's deletion
+    deleted = client.request(
+        "DELETE", f"/api/attendance/records/EMP002/{late['timestamp']}",
+        json={"deleted_by_admin_id": 42, "deletion_reason": "Registro erróneo"}, headers={"X-Tenant-ID": "ACME"}
+    )
+    assert deleted.status_code == 204
+    body = client.get("/api/timesheets/tenants/ACME", params=params).json()
+    assert body["workers"] == {"EMP001": 8.0}
+
+
+def test_worker_timesheet_pairs_time_logs(client, mocked_aws):
+    from src.services.aws_service import aws_service
+    for log_id, hour, event_type in [("log-1", 7, "entry"), ("log-2", 15, "exit")]:
+        aws_service.save_timestamp_data({
+            "id": log_id, "worker_id": "worker-1", "event_type": event_type,
+            "timestamp": datetime.fromtimestamp((DAY_START + hour * HOUR_MS) / 1000, tz=timezone.utc).replace(tzinfo=None).isoformat()
+        })
+
+    response = client.get("/api/timesheets/workers/worker-1", params={"from": DAY.isoformat(), "to": DAY.isoformat()})
+
+    assert response.status_code == 200
+    assert response.json()["days"][0]["hours"] == 8.0
+    assert client.delete("/api/timestamps/log-2").status_code == 204
+    assert client.get("/api/timesheets/workers/worker-1", params={"from": DAY.isoformat(), "to": DAY.isoformat()}).json()["total_hours"] == 0
+
+
+def test_timesheet_rejects_inverted_range(client):
+    response = client.get("/api/timesheets/workers/worker-1", params={"from": "2024-02-01", "to": "2024-01-01"})
+    assert response.status_code == 400
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from src.services.write_behind import WriteBehindBuffer, WriteBehindFullError
+
+
+def entry_id(table_name, item):
+    return item["id"]
+
+
+class RecordingWriter:
+    """Stands in for batch_put_items; can leave items unprocessed or fail whole batches."""
+
+    def __init__(self, unprocessed_once=(), fail=False):
+        self.batches = []
+        self.unprocessed_once = set(unprocessed_once)
+        self.fail = fail
+        self.written = threading.Event()
+
+    def __call__(self, writes):
+        if self.fail:
+            raise RuntimeError("DynamoDB unavailable")
+        items = writes["logs"]
+        self.batches.append([item["id"] for item in items])
+        unprocessed = [item for item in items if item["id"] in self.unprocessed_once]
+        self.unprocessed_once -= {item["id"] for item in unprocessed}
+        self.written.set()
+        return {"logs": unprocessed} if unprocessed else {}
+
+
+def buffer(tmp_path, write, max_batch=12, max_delay_ms=10_000, max_pending=100):
+    return WriteBehindBuffer(write, entry_id, str(tmp_path / "journal.jsonl"), max_batch, max_delay_ms, max_pending)
+
+
+def submit(buf, *ids):
+    for id_ in ids:
+        buf.submit(id_, {"logs": [{"id": id_}]})
+
+
+def test_events_are_coalesced_into_batches_and_unprocessed_ones_retried(tmp_path):
+    write = RecordingWriter(unprocessed_once={"log-3"})
+    buf = buffer(tmp_path, write, max_batch=5, max_delay_ms=50)
+    buf.start()
+
+    submit(buf, *[f"log-{n}" for n in range(12)])
+    deadline = time.monotonic() + 5
+    while buf.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    buf.stop(timeout=5)
+
+    assert write.batches[0] == [f"log-{n}" for n in range(5)]
+    assert sorted(id_ for batch in write.batches for id_ in batch) == sorted([f"log-{n}" for n in range(12)] + ["log-3"])
+    assert all(len(batch) <= 5 for batch in write.batches)
+
+
+def test_time_trigger_flushes_a_partial_batch(tmp_path):
+    write = RecordingWriter()
+    buf = buffer(tmp_path, write, max_delay_ms=20)
+    buf.start()
+
+    submit(buf, "log-1")
+
+    assert write.written.wait(2)
+    assert write.batches == [["log-1"]]
+    buf.stop(timeout=5)
+
+
+def test_journaled_events_are_replayed_after_a_crash(tmp_path):
+    crashed = buffer(tmp_path, RecordingWriter(fail=True))
+    crashed.start()
+    submit(crashed, "log-1", "log-2")
+    crashed.stop(timeout=5)
+
+    write = RecordingWriter()
+    restarted = buffer(tmp_path, write)
+    restarted.start()
+    restarted.stop(timeout=5)
+
+    assert write.batches == [["log-1", "log-2"]]
+    # Written entries are not replayed again
+    again = RecordingWriter()
+    buffer(tmp_path, again).start()
+    assert again.batches == []
+
+
+def test_full_buffer_sheds_load(tmp_path):
+    buf = buffer(tmp_path, RecordingWriter(fail=True), max_pending=2)
+    buf.start()
+    submit(buf, "log-1", "log-2")
+
+    with pytest.raises(WriteBehindFullError):
+        submit(buf, "log-3")
+    buf.stop(timeout=5)
+
+
+def test_post_timestamp_with_write_behind(client, tmp_path, monkeypatch):
+    from src.core.config import get_settings
+    from src.services.aws_service import aws_service
+
+    monkeypatch.setattr(get_settings(), "TIMESTAMP_WRITE_BEHIND", True)
+    monkeypatch.setattr(get_settings(), "WRITE_BEHIND_JOURNAL_PATH", str(tmp_path / "timestamps.jsonl"))
+    monkeypatch.setattr(get_settings(), "WRITE_BEHIND_MAX_PENDING", 3)
+    aws_service.start_write_behind()
+    monkeypatch.setattr(aws_service.timestamp_buffer, "write", RecordingWriter(fail=True))
+
+    ids = [client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry"}).json()["id"] for _ in range(3)]
+    shed = client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry"})
+
+    assert shed.status_code == 503 and shed.headers["Retry-After"] == "1"
+    # Once DynamoDB accepts writes again, the acknowledged events are stored
+    aws_service.timestamp_buffer.write = aws_service.batch_put_items
+    aws_service.stop_write_behind()
+    assert all(aws_service.get_timestamp_by_id(id_) for id_ in ids)
+
+
+def test_replayed_time_logs_reach_devices_that_already_polled(client, tmp_path, monkeypatch):
+    from src.core.config import get_settings
+    from src.services.attendance_service import get_attendance_updates
+    from src.services.aws_service import aws_service
+
+    monkeypatch.setattr(get_settings(), "TIMESTAMP_WRITE_BEHIND", True)
+    monkeypatch.setattr(get_settings(), "WRITE_BEHIND_JOURNAL_PATH", str(tmp_path / "timestamps.jsonl"))
+    aws_service.start_write_behind()
+    monkeypatch.setattr(aws_service.timestamp_buffer, "write", RecordingWriter(fail=True))
+    log = client.post("/api/timestamps", json={"worker_id": "worker-1", "event_type": "entry", "tenant_id": "ACME"}).json()
+    # The entry stays in the journal, waiting for a retry
+    aws_service.stop_write_behind()
+
+    # A device polls past the time the event was acknowledged, as after the settle window
+    settle_ms = get_settings().CHANGE_FEED_SETTLE_MS
+    polled = get_attendance_updates(aws_service, "ACME", 0, 100, now_ms=int(time.time() * 1000) + settle_ms)
+    assert polled.updates == []
+    time.sleep(0.01)
+
+    # Replayed on the next start, the change is dated when it is written
+    aws_service.start_write_behind()
+    aws_service.stop_write_behind()
+    polled_again = get_attendance_updates(
+        aws_service, "ACME", polled.last_sync_timestamp, 100, now_ms=int(time.time() * 1000) + settle_ms
+    )
+    assert [(u.server_id, u.action) for u in polled_again.updates] == [(log["id"], "CREATED")]